@@ -0,0 +1,69 @@
+"""
+Compares figure payload size and build + serialization time of GraphCreator
+with and without GraphOptions on a long synthetic history.
+
+    python benchmarks/bench_downsampling.py --years 3 --sets-per-day 20
+
+Browser render time is not measured here; it grows with the number of points,
+which is what the payload size reflects.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from exercise_sheet_to_graph.district_exercise_mapper import DistrictExerciseMapper
+from exercise_sheet_to_graph.graph_creator import GraphCreator
+from exercise_sheet_to_graph.models import GraphOptions
+from exercise_sheet_to_graph.series import ExerciseSeries, datetime_to_epoch_us
+
+
+def build_series(years: int, sets_per_day: int) -> ExerciseSeries:
+    rng = random.Random(0)
+    start = datetime(2020, 1, 1, 18)
+    days = 365 * years
+    ts, weights, reps = [], [], []
+    for day in range(days):
+        for index in range(sets_per_day):
+            ts.append(datetime_to_epoch_us(start + timedelta(days=day, minutes=3 * index)))
+            weights.append(40 + day * 0.05 + rng.randrange(0, 20))
+            reps.append(rng.choice((5, 8, 10, 12)))
+    return ExerciseSeries(name="panca piana con bilanciere", ts=ts, weights=weights, reps=reps)
+
+
+def measure(build, repeat: int = 3):
+    best = float("inf")
+    payload = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payload = build().to_json()
+        best = min(best, time.perf_counter() - start)
+    return len(payload), best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--sets-per-day", type=int, default=20)
+    args = parser.parse_args()
+
+    series = build_series(args.years, args.sets_per_day)
+    graph_creator = GraphCreator(DistrictExerciseMapper("./config/district_and_exercise_italian.yaml"))
+    cases = {
+        "raw": None,
+        "max_points=1000": GraphOptions(max_points=1000),
+        "bucket=week": GraphOptions(bucket="week"),
+        "bucket=month": GraphOptions(bucket="month"),
+        "last 90 days": GraphOptions(start=datetime(2020, 1, 1) + timedelta(days=365 * args.years - 90)),
+    }
+
+    print(f"{len(series)} sets")
+    for graph_type, build in (
+            ("volume", lambda options: graph_creator.create_volume_graph(series, options)),
+            ("weight_per_reps", lambda options: graph_creator.create_weight_per_reps_graph(series, 10, options))):
+        for case, options in cases.items():
+            size, elapsed = measure(lambda: build(options))
+            print(f"{graph_type:16} {case:16} {size / 1024:10.1f} KiB {elapsed * 1000:10.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
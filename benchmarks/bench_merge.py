@@ -0,0 +1,74 @@
+"""
+Compares the linear exercise lookup of the old merge with the name index of InfoSaver._merge_exercises.
+
+    python benchmarks/bench_merge.py --exercises 500 --sets 10000
+"""
+import argparse
+import copy
+import random
+import time
+from datetime import datetime, timedelta
+from exercise_sheet_to_graph.infosaver import InfoSaver, find_exercise_by_name
+from exercise_sheet_to_graph.models import SheetPerson, Exercise, Volume
+
+
+def build_person(exercises: int, sets_per_exercise: int) -> SheetPerson:
+    start = datetime(2020, 1, 1)
+    return SheetPerson(name="bench", exercises=[
+        Exercise(name=f"Exercise {index}", volumes=[
+            Volume(ts=str(start + timedelta(days=day)), weight=50 + day % 20, reps=8)
+            for day in range(sets_per_exercise)
+        ])
+        for index in range(exercises)
+    ])
+
+
+def build_incoming(exercises: int, sets: int):
+    start = datetime(2024, 1, 1)
+    rng = random.Random(0)
+    return [Exercise(name=f"exercise {rng.randrange(exercises)}",
+                     volumes=[Volume(ts=str(start + timedelta(minutes=index)), weight=rng.randrange(20, 120), reps=5)])
+            for index in range(sets)]
+
+
+def linear_merge(saved_person: SheetPerson, exercises) -> None:
+    not_founded = []
+    for exercise in exercises:
+        matching_exercise = find_exercise_by_name(saved_person, exercise.name)
+        if matching_exercise:
+            matching_exercise.volumes.extend(exercise.volumes)
+        else:
+            not_founded.append(exercise)
+    saved_person.exercises.extend(not_founded)
+
+
+def timed(merge, person: SheetPerson, incoming, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        target = copy.deepcopy(person)
+        start = time.perf_counter()
+        merge(target, incoming)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--exercises", type=int, default=500)
+    parser.add_argument("--sets", type=int, default=10_000)
+    parser.add_argument("--history", type=int, default=20, help="Sets already saved per exercise")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    person = build_person(args.exercises, args.history)
+    incoming = build_incoming(args.exercises, args.sets)
+
+    linear = timed(linear_merge, person, incoming, args.repeat)
+    indexed = timed(InfoSaver._merge_exercises, person, incoming, args.repeat)
+    print(f"merge {args.sets} sets into {args.exercises} exercises")
+    print(f"  linear scan : {linear * 1000:8.1f} ms")
+    print(f"  name index  : {indexed * 1000:8.1f} ms ({linear / indexed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
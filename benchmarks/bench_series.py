@@ -0,0 +1,71 @@
+"""
+Compares List[Volume] with the columnar ExerciseSeries on a synthetic history.
+
+    python benchmarks/bench_series.py --sets 1000000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from exercise_sheet_to_graph.models import Exercise, Volume
+from exercise_sheet_to_graph.series import ExerciseSeries, np
+
+
+def build_exercise(sets: int) -> Exercise:
+    start = datetime(2015, 1, 1)
+    rng = random.Random(0)
+    return Exercise(name="panca piana con bilanciere", volumes=[
+        Volume(ts=str(start + timedelta(minutes=30 * index)), weight=rng.randrange(20, 200) / 2,
+               reps=rng.randrange(1, 16))
+        for index in range(sets)
+    ])
+
+
+def measure_memory(build):
+    tracemalloc.start()
+    value = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, current
+
+
+def timed(function, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sets", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    exercise, exercise_bytes = measure_memory(lambda: build_exercise(args.sets))
+    series, series_bytes = measure_memory(lambda: ExerciseSeries.from_exercise(exercise))
+
+    def list_path():
+        _ = [volume.weight for volume in exercise.volumes if volume.reps == 10]
+        _ = [volume.reps for volume in exercise.volumes if volume.weight == 80]
+        _ = [volume.weight * volume.reps for volume in exercise.volumes]
+
+    def series_path():
+        _ = series.filter_reps(10).weights
+        _ = series.filter_weight(80).reps
+        _ = series.volumes()
+
+    list_time = timed(list_path)
+    series_time = timed(series_path)
+
+    print(f"sets: {args.sets}, backend: {'numpy' if np is not None else 'array'}")
+    print(f"memory  List[Volume]: {exercise_bytes / 2 ** 20:8.1f} MiB   "
+          f"ExerciseSeries: {series_bytes / 2 ** 20:8.1f} MiB   ({exercise_bytes / series_bytes:.0f}x)")
+    print(f"filter + volume  List[Volume]: {list_time * 1000:8.1f} ms   "
+          f"ExerciseSeries: {series_time * 1000:8.1f} ms   ({list_time / series_time:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Compares the JSON and binary snapshots of InfoSaver: file size, load_person and a windowed load_exercise.
+
+    python benchmarks/bench_snapshot_format.py --exercises 50 --sets 200000
+"""
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from exercise_sheet_to_graph.infosaver import InfoSaver
+from exercise_sheet_to_graph.models import SheetPerson, Exercise, Volume
+
+
+def build_person(exercises: int, sets: int) -> SheetPerson:
+    # Four sets per session, one session a day, microsecond timestamps as datetime.now() gives them
+    start = datetime(2015, 1, 1, 18)
+    rng = random.Random(0)
+    sets_per_exercise = sets // exercises
+    return SheetPerson(name="bench", exercises=[
+        Exercise(name=f"Exercise {index}", district=f"District {index % 6}", volumes=[
+            Volume(ts=start + timedelta(days=number // 4, minutes=3 * (number % 4),
+                                        microseconds=rng.randrange(10 ** 6)),
+                   weight=rng.randrange(40, 240) / 2, reps=rng.randrange(1, 16))
+            for number in range(sets_per_exercise)
+        ])
+        for index in range(exercises)
+    ])
+
+
+def timed(function, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--exercises", type=int, default=50)
+    parser.add_argument("--sets", type=int, default=200_000, help="Total sets of the history")
+    parser.add_argument("--window-days", type=int, default=90, help="Days loaded by load_exercise")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    person = build_person(args.exercises, args.sets)
+    last = max(volume.ts for exercise in person.exercises for volume in exercise.volumes)
+    window_start = last - timedelta(days=args.window_days)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = {}
+        for snapshot_format in ("json", "binary"):
+            saver = InfoSaver(Path(tmp_dir) / snapshot_format, cache_size=0, snapshot_format=snapshot_format)
+            saver.save_person(person)
+            size = saver._snapshot_path(person.name).stat().st_size
+            load = timed(lambda: saver.load_person(person.name), args.repeat)
+            window = timed(lambda: saver.load_exercise(person.name, "Exercise 0", start=window_start), args.repeat)
+            results[snapshot_format] = (size, load, window)
+
+    json_size, json_load, json_window = results["json"]
+    print(f"{args.sets} sets in {args.exercises} exercises")
+    print(f"  {'':8} {'size':>12} {'load_person':>12} {'load_exercise':>14}")
+    for snapshot_format, (size, load, window) in results.items():
+        print(f"  {snapshot_format:8} {size / 1e6:9.2f} MB {load * 1000:9.1f} ms {window * 1000:11.2f} ms")
+    binary_size, binary_load, binary_window = results["binary"]
+    print(f"  {'ratio':8} {json_size / binary_size:11.1f}x {json_load / binary_load:11.1f}x "
+          f"{json_window / binary_window:13.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Startup time of the app: imports the app module and creates the app in fresh interpreters under
+python -X importtime, then reports the median import and create_app times with the slowest modules as JSON.
+Exits with status 1 when a budget is exceeded or a module meant to be loaded lazily is imported at startup,
+so that it can guard against regressions.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 9 --max-ms 800 --forbid plotly yaml numpy
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional
+
+TARGET = "exercise_sheet_to_graph.app"
+DEFAULT_FORBIDDEN = ["plotly", "yaml", "numpy", "exercise_sheet_to_graph.graph_creator",
+                     "exercise_sheet_to_graph.infosaver", "exercise_sheet_to_graph.district_exercise_mapper"]
+# Runs in the child: the import is timed by -X importtime, create_app and the loaded modules are printed as JSON
+CHILD = """
+import json, sys, time
+import exercise_sheet_to_graph.app as app_module
+start = time.perf_counter()
+app_module.create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"})
+print(json.dumps({"create_app_us": (time.perf_counter() - start) * 1e6, "modules": sorted(sys.modules)}))
+"""
+
+
+def parse_importtime(text: str) -> Dict[str, int]:
+    """
+    Parses the report of python -X importtime.
+
+    :param text: The standard error of the interpreter.
+    :return: The cumulative import time in microseconds of every module, by name.
+    """
+    cumulative = {}
+    for line in text.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line[len("import time:"):].split("|")
+        if total.strip().isdigit():
+            cumulative[name.strip()] = int(total)
+    return cumulative
+
+
+def run_once() -> Dict[str, Any]:
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD], capture_output=True, text=True,
+                             check=True)
+    # The app may log while it is created, the JSON is the last line
+    child = json.loads(process.stdout.strip().splitlines()[-1])
+    return {"cumulative": parse_importtime(process.stderr), **child}
+
+
+def forbidden_loaded(modules: List[str], forbidden: List[str]) -> List[str]:
+    return sorted({prefix for prefix in forbidden for module in modules
+                   if module == prefix or module.startswith(prefix + ".")})
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to start, the median is reported")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to report")
+    parser.add_argument("--max-ms", type=float, help="Budget of the import and create_app time, in milliseconds")
+    parser.add_argument("--forbid", nargs="*", default=DEFAULT_FORBIDDEN,
+                        help="Modules, with their submodules, that must not be loaded at startup")
+    args = parser.parse_args(argv)
+
+    runs = [run_once() for _ in range(args.runs)]
+    import_ms = statistics.median(run["cumulative"].get(TARGET, 0) for run in runs) / 1000
+    create_ms = statistics.median(run["create_app_us"] for run in runs) / 1000
+    modules = sorted({name for run in runs for name in run["cumulative"]})
+    slowest = sorted(((statistics.median(run["cumulative"].get(name, 0) for run in runs) / 1000, name)
+                      for name in modules), reverse=True)[:args.top]
+    loaded = forbidden_loaded(runs[-1]["modules"], args.forbid)
+
+    report = {
+        "runs": args.runs,
+        "import_ms": import_ms,
+        "create_app_ms": create_ms,
+        "total_ms": import_ms + create_ms,
+        "max_ms": args.max_ms,
+        "slowest_modules": [{"module": name, "cumulative_ms": ms} for ms, name in slowest],
+        "forbidden_loaded": loaded,
+    }
+    print(json.dumps(report, indent=2))
+
+    failed = False
+    if loaded:
+        print(f"Loaded at startup: {', '.join(loaded)}", file=sys.stderr)
+        failed = True
+    if args.max_ms is not None and report["total_ms"] > args.max_ms:
+        print(f"Startup took {report['total_ms']:.0f} ms, over the budget of {args.max_ms:.0f} ms", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""
+Benchmark suite of the save, load, merge, parsing, name lookup and graph paths on synthetic histories.
+Every case runs on each size tier and reports p50/p99 latency, throughput and peak memory as JSON,
+so that the reports of two runs can be compared.
+
+    python benchmarks/suite.py --output before.json
+    python benchmarks/suite.py --tiers large --repeat 3 --cases infosaver.load_person infosaver.merge_data
+"""
+import argparse
+import gc
+import json
+import logging
+import math
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from exercise_sheet_to_graph.district_exercise_mapper import DistrictExerciseMapper
+from exercise_sheet_to_graph.graph_creator import GraphCreator
+from exercise_sheet_to_graph.infogenerator import InfoGenerator
+from exercise_sheet_to_graph.infosaver import InfoSaver
+from exercise_sheet_to_graph.series import np
+from synthetic import CONFIG_DIR, generate_exercise, generate_person, write_sheet
+
+TIERS = {"small": 100, "medium": 10_000, "large": 1_000_000}
+DEFAULT_REPEAT = {"small": 50, "medium": 10, "large": 3}
+EXERCISES = 20
+
+
+class Benchmark(NamedTuple):
+    run: Callable[[], Any]
+    items: int
+    unit: str = "sets"
+    reset: Optional[Callable[[], Any]] = None
+
+
+class Context:
+    """
+    The data shared by the cases of a tier: a generated person, its exercises file and a mapper.
+    """
+
+    def __init__(self, tier: str, work_dir: Path):
+        self.tier = tier
+        self.sets = TIERS[tier]
+        self.work_dir = work_dir
+        self.mapper = DistrictExerciseMapper(str(CONFIG_DIR / "district_and_exercise_italian.yaml"),
+                                             [str(CONFIG_DIR / "district_and_exercise_english.yaml")])
+        self.person = generate_person("bench", self.sets, EXERCISES)
+        self.sheet_path = work_dir / "sheet.txt"
+        write_sheet(self.sheet_path, self.person)
+        # The graphs plot a single exercise holding the whole tier
+        self.exercise = generate_exercise("panca piana con bilanciere", "petto", self.sets)
+
+
+def _saver(context: Context, name: str) -> InfoSaver:
+    return InfoSaver(context.work_dir / name, cache_size=0)
+
+
+def bench_save_person(context: Context) -> Benchmark:
+    saver = _saver(context, "save")
+    snapshot = saver._snapshot_path(context.person.name)
+    return Benchmark(run=lambda: saver.save_person(context.person), items=context.sets,
+                     reset=lambda: snapshot.unlink(missing_ok=True))
+
+
+def bench_load_person(context: Context) -> Benchmark:
+    saver = _saver(context, "load")
+    saver.save_person(context.person)
+    return Benchmark(run=lambda: saver.load_person(context.person.name), items=context.sets)
+
+
+def bench_merge_data(context: Context) -> Benchmark:
+    # A new session of four sets per exercise merged into the whole saved history
+    saver = _saver(context, "merge")
+    saver.save_person(context.person)
+    last = max(exercise.volumes[-1].ts for exercise in context.person.exercises if exercise.volumes)
+    incoming = generate_person(context.person.name, 4 * EXERCISES, EXERCISES, start=last + timedelta(days=1))
+    return Benchmark(run=lambda: saver._merge_data(incoming), items=context.sets)
+
+
+def bench_parse_sheet(context: Context) -> Benchmark:
+    info_generator = InfoGenerator(context.mapper)
+    return Benchmark(run=lambda: info_generator.load_sheet_person_from_exercises_file("bench", context.sheet_path),
+                     items=context.sets)
+
+
+def _cycle(names: List[str], count: int) -> List[str]:
+    return [names[index % len(names)] for index in range(count)]
+
+
+def bench_mapper_exact(context: Context) -> Benchmark:
+    # Canonical names in another case, as typed in the forms
+    names = _cycle([name.upper() for name in context.mapper.exercises_to_district], context.sets)
+
+    def run():
+        for name in names:
+            context.mapper.get_district_by_exercise(name)
+
+    return Benchmark(run=run, items=len(names), unit="lookups")
+
+
+def bench_mapper_fuzzy(context: Context) -> Benchmark:
+    # Canonical and alias names of the sheet, followed by the weight and reps of a set
+    sheet_names = [exercise.name for exercise in context.person.exercises]
+    names = [f"{name} {index % 200}kgx{index % 15 + 1}"
+             for index, name in enumerate(_cycle(sheet_names, context.sets))]
+
+    def run():
+        for name in names:
+            context.mapper.get_district_by_exercise(name, fuzzy=True)
+
+    return Benchmark(run=run, items=len(names), unit="lookups")
+
+
+def _graph_creator(context: Context) -> GraphCreator:
+    return GraphCreator(context.mapper)
+
+
+def bench_weight_per_reps(context: Context) -> Benchmark:
+    target_reps = Counter(volume.reps for volume in context.exercise.volumes).most_common(1)[0][0]
+    graph_creator = _graph_creator(context)
+    return Benchmark(run=lambda: graph_creator.create_weight_per_reps_graph(context.exercise, target_reps),
+                     items=context.sets)
+
+
+def bench_reps_per_weight(context: Context) -> Benchmark:
+    target_weight = Counter(volume.weight for volume in context.exercise.volumes).most_common(1)[0][0]
+    graph_creator = _graph_creator(context)
+    return Benchmark(run=lambda: graph_creator.create_reps_per_weight_graph(context.exercise, target_weight),
+                     items=context.sets)
+
+
+def bench_volume(context: Context) -> Benchmark:
+    graph_creator = _graph_creator(context)
+    return Benchmark(run=lambda: graph_creator.create_volume_graph(context.exercise), items=context.sets)
+
+
+CASES: Dict[str, Callable[[Context], Benchmark]] = {
+    "infosaver.save_person": bench_save_person,
+    "infosaver.load_person": bench_load_person,
+    "infosaver.merge_data": bench_merge_data,
+    "infogenerator.parse_sheet": bench_parse_sheet,
+    "mapper.get_district": bench_mapper_exact,
+    "mapper.get_district_fuzzy": bench_mapper_fuzzy,
+    "graph.weight_per_reps": bench_weight_per_reps,
+    "graph.reps_per_weight": bench_reps_per_weight,
+    "graph.volume": bench_volume,
+}
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile; with few samples the p99 is the slowest run.
+
+    :param sorted_values: The samples, in increasing order.
+    :param fraction: The percentile, between 0 and 1.
+    :return: The smallest sample with at least that fraction of the samples at or below it.
+    """
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def measure(benchmark: Benchmark, repeat: int, warmup: int, memory: bool) -> Dict[str, Any]:
+    """
+    Runs a benchmark repeat times after the warm-up runs, then once more under tracemalloc for the peak memory.
+
+    :param benchmark: The benchmark to run.
+    :param repeat: The number of timed runs.
+    :param warmup: The number of untimed runs first, which pay for imports and caches filled on first use.
+    :param memory: If False, the peak memory is not measured.
+    :return: The latency percentiles, throughput and peak memory of the benchmark.
+    """
+    latencies = []
+    for index in range(warmup + repeat):
+        if benchmark.reset:
+            benchmark.reset()
+        gc.collect()
+        start = time.perf_counter()
+        benchmark.run()
+        if index >= warmup:
+            latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    peak_memory = None
+    if memory:
+        if benchmark.reset:
+            benchmark.reset()
+        gc.collect()
+        tracemalloc.start()
+        benchmark.run()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    p50 = percentile(latencies, 0.5)
+    return {
+        "items": benchmark.items,
+        "unit": benchmark.unit,
+        "repeat": repeat,
+        "warmup": warmup,
+        "p50_ms": p50 * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "throughput_per_s": benchmark.items / p50 if p50 else None,
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tiers", nargs="+", choices=list(TIERS), default=["small", "medium"],
+                        help="Size tiers to run: small (100 sets), medium (10k) and large (1M)")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--repeat", type=int, help="Timed runs per case, by default 50 / 10 / 3 by tier")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per case before the timed ones")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run of every case")
+    parser.add_argument("--output", type=Path, help="Write the JSON report there instead of standard output")
+    args = parser.parse_args(argv)
+
+    logging.getLogger("sheet_to_graph").setLevel(logging.WARNING)
+    report = {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__ if np is not None else None,
+        },
+        "results": [],
+    }
+
+    for tier in args.tiers:
+        with tempfile.TemporaryDirectory() as work_dir:
+            context = Context(tier, Path(work_dir))
+            for case in args.cases:
+                result = measure(CASES[case](context), args.repeat or DEFAULT_REPEAT[tier], args.warmup,
+                                 not args.no_memory)
+                report["results"].append({"case": case, "tier": tier, "sets": TIERS[tier], **result})
+                print(f"{tier:6} {case:28} p50 {result['p50_ms']:10.2f} ms  p99 {result['p99_ms']:10.2f} ms",
+                      file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Synthetic workout histories for the benchmarks, drawing district and exercise names from the configs.
+
+    python benchmarks/synthetic.py --sets 10000 --exercises 20 --output bench.json
+    python benchmarks/synthetic.py --sets 10000 --sheet --output bench.txt
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Tuple, Optional, Iterator, Union, Sequence
+from exercise_sheet_to_graph.district_exercise_mapper import DistrictExerciseMapper
+from exercise_sheet_to_graph.models import SheetPerson, Exercise, Volume
+
+CONFIG_DIR = Path(__file__).resolve().parent.parent / "config"
+CONFIG_PATHS = sorted(CONFIG_DIR.glob("district_and_exercise_*.yaml"))
+SETS_PER_SESSION = 4
+START = datetime(2015, 1, 1, 18)
+
+
+def load_exercise_names(config_paths: Sequence[Union[Path, str]] = CONFIG_PATHS) -> List[Tuple[str, str]]:
+    """
+    Reads the (district, exercise) pairs of the configs.
+
+    :param config_paths: The district/exercise configs to read.
+    :return: Every (district, exercise) pair, in config order.
+    """
+    names = []
+    for config_path in config_paths:
+        for district, exercises in DistrictExerciseMapper(str(config_path)).district_to_exercises.items():
+            names.extend((district, exercise) for exercise in exercises)
+    return names
+
+
+def _sets(count: int, rng: random.Random, start: datetime) -> Iterator[Tuple[datetime, float, int]]:
+    # One session every one to three days, a few sets a few minutes apart, weights drifting in whole
+    # kilograms, as the exercises files only hold integer weights
+    session = start
+    weight = rng.randrange(20, 80)
+    for index in range(count):
+        if index and index % SETS_PER_SESSION == 0:
+            session += timedelta(days=rng.randrange(1, 4), minutes=rng.randrange(-60, 60))
+            weight = max(2, weight + rng.choice((-2, 0, 0, 2)))
+        ts = session + timedelta(minutes=3 * (index % SETS_PER_SESSION), microseconds=rng.randrange(10 ** 6))
+        yield ts, weight, rng.randrange(1, 16)
+
+
+def generate_exercise(name: str, district: str, sets: int, seed: int = 0, start: datetime = START) -> Exercise:
+    """
+    Generates the history of a single exercise.
+
+    :param name: The name of the exercise.
+    :param district: The district of the exercise.
+    :param sets: The number of sets.
+    :param seed: The seed of the random generator.
+    :param start: The time of the first set.
+    :return: The Exercise, with its sets in chronological order.
+    """
+    rng = random.Random(seed)
+    return Exercise(name=name, district=district, volumes=[
+        Volume(ts=ts, weight=weight, reps=reps) for ts, weight, reps in _sets(sets, rng, start)
+    ])
+
+
+def generate_person(name: str, sets: int, exercises: int = 20, seed: int = 0,
+                    names: Optional[Sequence[Tuple[str, str]]] = None, start: datetime = START) -> SheetPerson:
+    """
+    Generates a person whose sets are spread evenly over randomly chosen exercises of the configs.
+
+    :param name: The name of the person.
+    :param sets: The total number of sets.
+    :param exercises: The number of exercises.
+    :param seed: The seed of the random generator.
+    :param names: The (district, exercise) pairs to choose from, by default those of the configs.
+    :param start: The time of the first set.
+    :return: The generated SheetPerson.
+    """
+    rng = random.Random(seed)
+    names = names or load_exercise_names()
+    chosen = rng.sample(list(names), min(exercises, len(names)))
+    per_exercise, remainder = divmod(sets, len(chosen))
+    return SheetPerson(name=name, exercises=[
+        generate_exercise(exercise, district, per_exercise + (index < remainder), seed=seed * 1_000_003 + index,
+                          start=start)
+        for index, (district, exercise) in enumerate(chosen)
+    ])
+
+
+def sheet_lines(person: SheetPerson) -> Iterator[str]:
+    """
+    Renders a person as the lines of an exercises file, in the "<exercise> <weight>kgx<reps>" format
+    read by InfoGenerator, interleaving the exercises in time order.
+
+    :param person: The person to render.
+    :return: An iterator over the lines, without line terminators.
+    """
+    rows = sorted(((volume.ts, exercise.name, volume) for exercise in person.exercises for volume in exercise.volumes),
+                  key=lambda row: row[:2])
+    for _, exercise_name, volume in rows:
+        yield f"{exercise_name} {volume.weight:g}kgx{volume.reps}"
+
+
+def write_sheet(path: Union[Path, str], person: SheetPerson) -> None:
+    """
+    Writes a person as an exercises file.
+
+    :param path: The file to write.
+    :param person: The person to render.
+    """
+    with open(path, "w") as to_write:
+        for line in sheet_lines(person):
+            to_write.write(line + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--name", default="bench")
+    parser.add_argument("--sets", type=int, default=10_000)
+    parser.add_argument("--exercises", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sheet", action="store_true", help="Write an exercises file instead of a JSON snapshot")
+    parser.add_argument("--output", type=Path, required=True)
+    args = parser.parse_args()
+
+    person = generate_person(args.name, args.sets, args.exercises, args.seed)
+    if args.sheet:
+        write_sheet(args.output, person)
+    else:
+        args.output.write_text(person.model_dump_json())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Union, Optional, List, Iterable
+from exercise_sheet_to_graph.cache import LRUCache
+from exercise_sheet_to_graph.district_exercise_mapper import DistrictExerciseMapper
+from exercise_sheet_to_graph.models import SheetPerson, Exercise, Volume, PersonAggregates, ExerciseAggregates
+from exercise_sheet_to_graph.utils import get_logger, file_lock, atomic_write_text, normalize_string
+
+logger = get_logger("sheet_to_graph")
+
+
+def estimated_one_rep_max(weight: float, reps: int) -> float:
+    """
+    Estimates the one-rep max of a set with the Epley formula.
+
+    :param weight: The weight lifted.
+    :param reps: The repetitions performed.
+    :return: The estimated one-rep max.
+    """
+    if reps <= 1:
+        return weight
+    return weight * (1 + reps / 30)
+
+
+def iso_week(ts: datetime) -> str:
+    year, week, _ = ts.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+class AggregateStore:
+    def __init__(self, base_dir: Union[Path, str], mapper: Optional[DistrictExerciseMapper] = None,
+                 cache_size: int = 256, load_person: Optional[Callable[[str], Optional[SheetPerson]]] = None,
+                 max_e1rm_days: int = 730):
+        """
+        Initializes the AggregateStore, which keeps per-person summaries (best set per rep count,
+        estimated one-rep max trend, weekly volume per district) under base_dir/aggregates.
+
+        :param base_dir: The directory of the person data, usually the InfoSaver base directory.
+        :param mapper: Used to find the district of exercises saved without one.
+        :param cache_size: Number of PersonAggregates kept in memory.
+        :param load_person: Loads the whole history of a person, e.g. InfoSaver.load_person. If given, a person
+            without aggregates yet is aggregated from its history on the next save, instead of from that save only.
+            The storage must notify its listeners under the lock of the person, as InfoSaver does, otherwise a
+            concurrent save may be counted both in the history and in its own notification.
+        :param max_e1rm_days: Number of days kept in the one-rep max trend of an exercise, the oldest are dropped.
+        """
+        self.aggregates_dir = Path(base_dir) / "aggregates"
+        self.aggregates_dir.mkdir(parents=True, exist_ok=True)
+        self.mapper = mapper
+        self.load_person = load_person
+        self.max_e1rm_days = max_e1rm_days
+        self.cache = LRUCache(max_entries=cache_size)
+
+    def _path(self, name: str) -> Path:
+        return self.aggregates_dir / f"{name.replace(' ', '_')}.json"
+
+    def _lock_path(self, name: str) -> Path:
+        return self.aggregates_dir / f"{name.replace(' ', '_')}.lock"
+
+    def _version(self, name: str) -> Optional[tuple]:
+        try:
+            stat = self._path(name).stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def get(self, name: str) -> Optional[PersonAggregates]:
+        """
+        Returns the stored aggregates of a person without touching its history.
+
+        :param name: The name of the person.
+        :return: The PersonAggregates object, or None if nothing was aggregated yet.
+        """
+        version = self._version(name)
+        if version is None:
+            return None
+        aggregates = self.cache.get(name, version=version)
+        if aggregates is None:
+            aggregates = PersonAggregates.model_validate_json(self._path(name).read_text())
+            self.cache.put(name, aggregates, version=version)
+        return aggregates
+
+    def on_save(self, name: str, exercises: List[Exercise]) -> None:
+        """
+        Storage listener folding the sets that were just saved into the aggregates of the person.
+
+        :param name: The name of the saved person.
+        :param exercises: The exercises that were saved, holding only the sets the storage actually added.
+        """
+        with file_lock(self._lock_path(name)):
+            aggregates = self.get(name)
+            if aggregates is not None and any(key != normalize_string(key) for key in aggregates.exercises):
+                # Written before the summaries were keyed by normalized name
+                aggregates = None
+            person = self.load_person(name) if aggregates is None and self.load_person else None
+            if person is not None:
+                # The history already holds the saved sets
+                self._write(self._build(person))
+                return
+            aggregates = (aggregates or PersonAggregates(name=name)).model_copy(deep=True)
+            for exercise in exercises:
+                self._add_sets(aggregates, exercise, exercise.volumes)
+            self._write(aggregates)
+
+    def rebuild(self, person: SheetPerson) -> PersonAggregates:
+        """
+        Recomputes the aggregates of a person from its whole history.
+
+        :param person: The SheetPerson with the whole history.
+        :return: The new PersonAggregates object.
+        """
+        aggregates = self._build(person)
+        with file_lock(self._lock_path(person.name)):
+            self._write(aggregates)
+        logger.info("Rebuilt aggregates for %s", person.name)
+        return aggregates
+
+    def _build(self, person: SheetPerson) -> PersonAggregates:
+        aggregates = PersonAggregates(name=person.name)
+        for exercise in person.exercises:
+            self._add_sets(aggregates, exercise, exercise.volumes)
+        return aggregates
+
+    def _write(self, aggregates: PersonAggregates) -> None:
+        atomic_write_text(self._path(aggregates.name), aggregates.model_dump_json())
+        self.cache.put(aggregates.name, aggregates, version=self._version(aggregates.name))
+
+    def _district(self, exercise: Exercise) -> str:
+        if exercise.district:
+            return exercise.district
+        if self.mapper:
+            return self.mapper.get_district_by_exercise(exercise.name) or ""
+        return ""
+
+    def _add_sets(self, aggregates: PersonAggregates, exercise: Exercise, volumes: Iterable[Volume]) -> None:
+        # Keyed like the merges of InfoSaver, so "Squat" and "squat " share a summary
+        key = normalize_string(exercise.name)
+        summary = aggregates.exercises.get(key)
+        if summary is None:
+            summary = aggregates.exercises[key] = ExerciseAggregates(name=exercise.name,
+                                                                     district=self._district(exercise))
+        weekly_volume = aggregates.weekly_volume.setdefault(summary.district, {})
+
+        for volume in volumes:
+            volume_kg = volume.weight * volume.reps
+            summary.sets += 1
+            summary.total_volume += volume_kg
+
+            if volume.weight > summary.best_weight_by_reps.get(volume.reps, 0):
+                summary.best_weight_by_reps[volume.reps] = volume.weight
+
+            e1rm = estimated_one_rep_max(volume.weight, volume.reps)
+            summary.best_e1rm = max(summary.best_e1rm, e1rm)
+            day = volume.ts.date().isoformat()
+            summary.e1rm_by_day[day] = max(summary.e1rm_by_day.get(day, 0), e1rm)
+
+            week = iso_week(volume.ts)
+            weekly_volume[week] = weekly_volume.get(week, 0) + volume_kg
+
+        if len(summary.e1rm_by_day) > self.max_e1rm_days:
+            # ISO dates sort chronologically
+            for day in sorted(summary.e1rm_by_day)[:-self.max_e1rm_days]:
+                del summary.e1rm_by_day[day]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the aggregates of every person of an InfoSaver directory.")
+    parser.add_argument("db_dir", type=Path, help="InfoSaver directory")
+    parser.add_argument("--config", type=Path, default=None, help="District and exercise YAML configuration")
+    args = parser.parse_args(argv)
+
+    # migrate pulls in the InfoGenerator and SQLite backends, which the app does not need to build aggregates
+    from exercise_sheet_to_graph.migrate import iter_people
+
+    store = AggregateStore(args.db_dir, mapper=DistrictExerciseMapper(args.config) if args.config else None)
+    for person in iter_people(args.db_dir):
+        store.rebuild(person)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,30 +1,41 @@
-from flask import Flask, request, render_template, redirect, url_for, session
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from flask import Flask, Blueprint, request, render_template, redirect, url_for, session, jsonify, Response, abort, \
+    g, current_app, has_app_context
 from flask_wtf import FlaskForm
 from flask_login import LoginManager, login_user, login_required, logout_user, UserMixin, current_user
 from wtforms import StringField, PasswordField, SubmitField
 from wtforms.validators import DataRequired, EqualTo, Length
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
 from pydantic import ValidationError
-from datetime import timedelta  # Importa timedelta per il timeout della sessione
-from exercise_sheet_to_graph.district_exercise_mapper import DistrictExerciseMapper
-from exercise_sheet_to_graph.infosaver import InfoSaver
-from exercise_sheet_to_graph.models import Exercise, Volume, SheetPerson
+from datetime import timedelta, datetime, timezone  # Importa timedelta per il timeout della sessione
+from exercise_sheet_to_graph.cache import LRUCache
+from exercise_sheet_to_graph.graph_cache import ALL_EXERCISES
+from exercise_sheet_to_graph.metrics import metrics, OutlierProfiler
+from exercise_sheet_to_graph.models import Exercise, Volume, SheetPerson, GraphOptions
+from exercise_sheet_to_graph.utils import get_logger, LOG_LEVEL_ENV
 
-app = Flask(__name__)
-app.secret_key = 'to_a_better_key'
+# The services below are imported and built on first use, so that importing the app and creating it stay cheap:
+# plotly, the mapper configs, numpy and the storage backends are only loaded by the requests needing them.
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+EXTENSION = 'sheet_to_graph'
 
-# Configura il database
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db'
-db = SQLAlchemy(app)
-
-# Configura il timeout della sessione (esempio: 30 minuti)
-app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(minutes=30)
+logger = get_logger("sheet_to_graph")
 
+db = SQLAlchemy()
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'main.login'
+bp = Blueprint('main', __name__)
 
 
 class User(UserMixin, db.Model):
@@ -38,21 +49,304 @@ class User(UserMixin, db.Model):
         return str(self.id)
 
 
-with app.app_context():
-    db.create_all()
+class SessionUser(UserMixin):
+    def __init__(self, user: User):
+        """
+        The profile of a logged-in user as kept by the user cache: a plain copy of the User row, without the
+        password hash, that stays usable outside the database session it was loaded in.
 
+        :param user: The User row.
+        """
+        self.id = user.id
+        self.username = user.username
+        self.name = user.name
+        self.surname = user.surname
 
-@login_manager.user_loader
-def load_user(user_id):
-    user = User.query.get(int(user_id))
-    if user:
-        session.permanent = True  # Rende la sessione permanente per rispettare il timeout configurato
-    return user
+    def get_id(self):
+        return str(self.id)
 
 
-# Load the district and exercise mapper, load the info saver
-exercise_mapper = DistrictExerciseMapper(config_path='../../config/district_and_exercise_italian.yaml')
-info_saver = InfoSaver(base_dir=Path('../../db'))
+@login_manager.user_loader
+def load_user(user_id):
+    # Every authenticated request loads its user, the profile is cached for USER_CACHE_TTL seconds
+    services = _services()
+    cached = services.user_cache.get(user_id)
+    if cached is not None and cached[1] > time.monotonic():
+        return cached[0]
+    if not user_id.isdigit():
+        return None
+    user = db.session.get(User, int(user_id))
+    if user is None:
+        services.user_cache.pop(user_id)
+        return None
+    session_user = SessionUser(user)
+    if services.user_cache_ttl > 0:
+        services.user_cache.put(user_id, (session_user, time.monotonic() + services.user_cache_ttl))
+    return session_user
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_cached_user(_mapper, _connection, user):
+    # Other processes see the change once their cached copy expires
+    if has_app_context() and EXTENSION in current_app.extensions:
+        _services().user_cache.pop(str(user.id))
+        _services().add_exercises_page_cache.pop(user.id)
+
+
+def storage_key(user) -> str:
+    """
+    Returns the name the history of a user is stored under. It depends on the user id only, so that
+    renaming a user keeps their history.
+
+    :param user: The User, or its SessionUser.
+    :return: The storage key, e.g. "user_42".
+    """
+    return f"user_{user.id}"
+
+
+def legacy_storage_key(user) -> str:
+    # Histories used to be stored under the name and surname of the user
+    return f"{user.name} {user.surname}"
+
+
+def default_config() -> Dict[str, Any]:
+    """
+    Returns the configuration of the app, read from the SHEET_TO_GRAPH_* environment variables.
+    """
+    return {
+        'SECRET_KEY': 'to_a_better_key',
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///users.db',
+        # Configura il timeout della sessione (esempio: 30 minuti)
+        'PERMANENT_SESSION_LIFETIME': timedelta(minutes=30),
+        # The district/exercise configs and the directory of the snapshots, caches, journal and profiles
+        'CONFIG_DIR': Path(os.environ.get('SHEET_TO_GRAPH_CONFIG_DIR', PROJECT_ROOT / 'config')),
+        'DATA_DIR': Path(os.environ.get('SHEET_TO_GRAPH_DATA_DIR', PROJECT_ROOT / 'db')),
+        'WRITE_BEHIND': os.environ.get('SHEET_TO_GRAPH_WRITE_BEHIND') == '1',
+        # "json" or "binary", see binary_format; migrate.py --convert converts the existing files
+        'SNAPSHOT_FORMAT': os.environ.get('SHEET_TO_GRAPH_SNAPSHOT_FORMAT', 'json'),
+        # Timing histograms served on /metrics, switchable at runtime with a POST to /metrics
+        'METRICS': os.environ.get('SHEET_TO_GRAPH_METRICS', '1') == '1',
+        # Bearer token required by /metrics, which answers 404 while it is empty
+        'METRICS_TOKEN': os.environ.get('SHEET_TO_GRAPH_METRICS_TOKEN', ''),
+        # Fraction of requests profiled, the profiles of those slower than the threshold (seconds) are kept
+        'PROFILE_SAMPLE_RATE': float(os.environ.get('SHEET_TO_GRAPH_PROFILE_RATE', '0')),
+        'PROFILE_THRESHOLD': float(os.environ.get('SHEET_TO_GRAPH_PROFILE_THRESHOLD', '1.0')),
+        # Level of the package logs, see utils.get_logger for the queue handler and the rate limit
+        'LOG_LEVEL': os.environ.get(LOG_LEVEL_ENV, 'INFO'),
+        # Seconds a logged-in user is served from memory instead of the users database, 0 disables the cache
+        'USER_CACHE_TTL': float(os.environ.get('SHEET_TO_GRAPH_USER_CACHE_TTL', '60')),
+        # Connections kept open to the users database by every process, when it is a SQLite file
+        'DB_POOL_SIZE': int(os.environ.get('SHEET_TO_GRAPH_DB_POOL_SIZE', '10')),
+    }
+
+
+class Services:
+    def __init__(self, config: Dict[str, Any]):
+        """
+        The mapper, storage and graph services of an app, each imported and built the first time it is used.
+        Building is serialized, so concurrent first requests share a single instance of every service.
+
+        :param config: The configuration of the app.
+        """
+        self.config = config
+        self.data_dir = Path(config['DATA_DIR'])
+        self.profiler = OutlierProfiler(self.data_dir / 'profiles', sample_rate=config['PROFILE_SAMPLE_RATE'],
+                                        threshold=config['PROFILE_THRESHOLD'])
+        # Payload and page of /add_exercises, built once per config version
+        self.exercise_options_cache = LRUCache(max_entries=4)
+        self.add_exercises_page_cache = LRUCache(max_entries=256)
+        # (SessionUser, expiry) by user id, see load_user
+        self.user_cache = LRUCache(max_entries=4096)
+        self.user_cache_ttl = config['USER_CACHE_TTL']
+        # Ids of the users whose legacy history was checked by this process, see migrate_storage_key
+        self.migrated_users = set()
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    def _get(self, name: str, build: Callable[[], Any]) -> Any:
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = self._instances[name] = build()
+        return instance
+
+    @property
+    def exercise_mapper(self):
+        def build():
+            from exercise_sheet_to_graph.district_exercise_mapper import DistrictExerciseMapper
+            config_dir = Path(self.config['CONFIG_DIR'])
+            return DistrictExerciseMapper(config_path=str(config_dir / 'district_and_exercise_italian.yaml'),
+                                          alias_config_paths=[str(config_dir / 'district_and_exercise_english.yaml')],
+                                          cache_dir=self.data_dir / 'cache', watch_interval=5.0, persist_edits=True)
+
+        return self._get('exercise_mapper', build)
+
+    @property
+    def info_saver(self):
+        def build():
+            from exercise_sheet_to_graph.infosaver import InfoSaver
+            info_saver = InfoSaver(base_dir=self.data_dir, snapshot_format=self.config['SNAPSHOT_FORMAT'])
+            info_saver.add_listener(self.figure_cache.on_save)
+            info_saver.add_listener(self.aggregate_store.on_save)
+            if info_saver.cache is not None:
+                metrics.add_gauges('person_cache', info_saver.cache.stats)
+            return info_saver
+
+        return self._get('info_saver', build)
+
+    @property
+    def storage(self):
+        def build():
+            if not self.config['WRITE_BEHIND']:
+                return self.info_saver
+            # With write-behind, submissions are journaled and written to the InfoSaver by a background thread
+            from exercise_sheet_to_graph.write_behind import WriteBehindStorage
+            storage = WriteBehindStorage(self.info_saver, self.data_dir / 'journal')
+            metrics.add_gauges('write_behind', storage.stats)
+            return storage
+
+        return self._get('storage', build)
+
+    @property
+    def graph_creator(self):
+        def build():
+            from exercise_sheet_to_graph.graph_creator import GraphCreator
+            return GraphCreator(self.exercise_mapper)
+
+        return self._get('graph_creator', build)
+
+    @property
+    def info_generator(self):
+        def build():
+            from exercise_sheet_to_graph.infogenerator import InfoGenerator
+            return InfoGenerator(self.exercise_mapper)
+
+        return self._get('info_generator', build)
+
+    @property
+    def figure_cache(self):
+        def build():
+            from exercise_sheet_to_graph.graph_cache import FigureCache
+            figure_cache = FigureCache(max_entries=512)
+            metrics.add_gauges('figure_cache', figure_cache.memory.stats)
+            return figure_cache
+
+        return self._get('figure_cache', build)
+
+    @property
+    def aggregate_store(self):
+        def build():
+            from exercise_sheet_to_graph.aggregates import AggregateStore
+            return AggregateStore(self.data_dir, mapper=self.exercise_mapper,
+                                  load_person=lambda name: self.info_saver.load_person(name))
+
+        return self._get('aggregate_store', build)
+
+    def migrate_storage_key(self, user) -> str:
+        """
+        Returns the storage key of a user, first copying the history saved under their name if there is none
+        under the key yet. The copy is a merge, so concurrent copies by several processes are harmless;
+        the history saved under the name is left in place.
+
+        :param user: The logged-in user.
+        :return: The storage key of the user.
+        """
+        key = storage_key(user)
+        if user.id in self.migrated_users:
+            return key
+        with self._lock:
+            if user.id not in self.migrated_users:
+                legacy_key = legacy_storage_key(user)
+                if self.storage.data_version(key) is None and self.storage.data_version(legacy_key) is not None:
+                    person = self.storage.load_person(legacy_key)
+                    self.storage.save_person(person.model_copy(update={'name': key}))
+                    logger.info("Copied the history of %s to %s", legacy_key, key)
+                self.migrated_users.add(user.id)
+        return key
+
+
+def create_app(config: Optional[Dict[str, Any]] = None) -> Flask:
+    """
+    Creates the Flask app. Only the users database is set up here, the other services are built on first use.
+
+    :param config: Values overriding those of default_config, e.g. DATA_DIR or SQLALCHEMY_DATABASE_URI.
+    :return: The configured app.
+    """
+    app = Flask(__name__)
+    app.config.update(default_config())
+    app.config.update(config or {})
+    _configure_database(app)
+
+    get_logger('sheet_to_graph', level=app.config['LOG_LEVEL'])
+    db.init_app(app)
+    login_manager.init_app(app)
+    app.extensions[EXTENSION] = Services(app.config)
+    metrics.enabled = app.config['METRICS']
+
+    app.register_blueprint(bp)
+    app.before_request(_start_request_timer)
+    app.after_request(_record_request_time)
+    app.teardown_request(_stop_profiler)
+
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', _set_sqlite_pragmas)
+        db.create_all()
+    return app
+
+
+def _configure_database(app: Flask) -> None:
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return
+    # A pool per process instead of a connection per request; the timeout waits for the writer lock
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    options.setdefault('pool_size', app.config['DB_POOL_SIZE'])
+    options.setdefault('max_overflow', app.config['DB_POOL_SIZE'])
+    options.setdefault('connect_args', {}).setdefault('timeout', 10)
+
+
+def _set_sqlite_pragmas(dbapi_connection, _connection_record):
+    # WAL lets the readers run while a registration is written, NORMAL sync is durable enough in WAL mode
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+
+def _services() -> Services:
+    return current_app.extensions[EXTENSION]
+
+
+GRAPH_TYPES = ('volume', 'weight_per_reps', 'reps_per_weight')
+DEFAULT_MAX_POINTS = 1000  # Point budget of a graph when the client does not ask for one
+MAX_BATCH_SETS = 5000  # Largest batch accepted by /api/sets
+
+
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+    g.profile = _services().profiler.start()
+
+
+def _record_request_time(response):
+    elapsed = time.perf_counter() - g.request_start
+    endpoint = request.endpoint or 'unmatched'
+    metrics.observe('request_seconds', elapsed, endpoint=endpoint, method=request.method,
+                    status=str(response.status_code))
+    profile = g.pop('profile', None)
+    if profile is not None:
+        _services().profiler.stop(profile, elapsed, endpoint)
+    return response
+
+
+def _stop_profiler(_exception):
+    # after_request is skipped when the view raised, the profiler must be released anyway
+    profile = g.pop('profile', None)
+    if profile is not None:
+        _services().profiler.stop(profile, time.perf_counter() - g.request_start, request.endpoint or 'unmatched')
 
 
 class RegistrationForm(FlaskForm):
@@ -70,7 +364,7 @@ class LoginForm(FlaskForm):
     submit = SubmitField('Login')
 
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     form = RegistrationForm()
     if form.validate_on_submit():
@@ -91,11 +385,12 @@ def register():
         db.session.add(new_user)
         db.session.commit()
         login_user(new_user)
-        return redirect(url_for('index'))
+        session.permanent = True  # Rende la sessione permanente per rispettare il timeout configurato
+        return redirect(url_for('.index'))
     return render_template('register.html', form=form)
 
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     form = LoginForm()
     if form.validate_on_submit():
@@ -104,88 +399,324 @@ def login():
         if user and check_password_hash(user.password_hash, form.password.data):
             login_user(user)
             session.permanent = True  # Rende la sessione permanente al login
-            return redirect(url_for('index'))
+            return redirect(url_for('.index'))
         else:
             error = 'Credenziali non valide. Riprova.'
             return render_template('login.html', form=form, error=error)
     return render_template('login.html', form=form)
 
 
-@app.route('/logout', methods=['GET', 'POST'])
+@bp.route('/logout', methods=['GET', 'POST'])
 @login_required
 def logout():
     logout_user()
-    return redirect(url_for('login'))
+    return redirect(url_for('.login'))
 
 
 # Modifica della rotta '/' per mostrare il messaggio di benvenuto e le opzioni
-@app.route('/', methods=['GET'])
+@bp.route('/', methods=['GET'])
 @login_required
 def index():
     name = current_user.name
     return render_template('home.html', name=name)
 
 
-@app.route('/add_exercises', methods=['GET'])
+WEIGHTS = [round(i * 2.5, 1) for i in range(1, 81)]  # Da 2.5 a 200 con incrementi di 2.5
+REPS = list(range(1, 31))
+ASSET_MAX_AGE = 365 * 24 * 3600  # The options asset is addressed by config version, it never changes
+
+
+def _exercise_options() -> Tuple[str, bytes, bytes]:
+    """
+    Returns the config version with the JSON of the add-exercises form options, plain and gzipped.
+    """
+    services = _services()
+    version = services.exercise_mapper.version
+    asset = services.exercise_options_cache.get('options', version=version)
+    if asset is None:
+        state = services.exercise_mapper.state
+        payload = json.dumps({
+            'districts': list(state.district_to_exercises),
+            'exercises': list(state.exercises_to_district),
+            'district_to_exercises': state.district_to_exercises,
+            'exercises_to_district': state.exercises_to_district,
+            'reps': REPS,
+            'weights': WEIGHTS,
+        }, separators=(',', ':')).encode()
+        asset = (version, payload, gzip.compress(payload, mtime=0))
+        services.exercise_options_cache.put('options', asset, version=version)
+    return asset
+
+
+@bp.route('/add_exercises', methods=['GET'])
 @login_required
 def add_exercises():
-    districts = list(exercise_mapper.district_to_exercises.keys())
-    exercises = list(exercise_mapper.exercises_to_district.keys())
-    district_to_exercises = exercise_mapper.district_to_exercises
-    exercises_to_district = exercise_mapper.exercises_to_district
-    weights = [round(i * 2.5, 1) for i in range(1, 81)]  # Da 2.5 a 200 con incrementi di 2.5
-    return render_template('index.html', districts=districts,
-                           exercises=exercises,
-                           district_to_exercises=district_to_exercises,
-                           exercises_to_district=exercises_to_district,
-                           weights=weights)
+    services = _services()
+    version = services.exercise_mapper.version
+    # The navbar greets the user, so pages are kept per user and dropped when the user changes
+    page = services.add_exercises_page_cache.get(current_user.id, version=version)
+    if page is None:
+        page = render_template('index.html', options_url=url_for('.exercise_options', version=version))
+        services.add_exercises_page_cache.put(current_user.id, page, size=len(page), version=version)
+    return page
+
+
+@bp.route('/add_exercises/options/<version>.json', methods=['GET'])
+@login_required
+def exercise_options(version):
+    current_version, payload, gzipped = _exercise_options()
+    if version != current_version:
+        return redirect(url_for('.exercise_options', version=current_version))
+
+    response = Response(mimetype='application/json')
+    response.set_etag(current_version)
+    response.cache_control.private = True
+    response.cache_control.max_age = ASSET_MAX_AGE
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+    if 'gzip' in request.accept_encodings:
+        response.content_encoding = 'gzip'
+        response.set_data(gzipped)
+    else:
+        response.set_data(payload)
+    return response
 
 
 # Nuova rotta per il pannello di visualizzazione grafici
-@app.route('/graphs', methods=['GET'])
+@bp.route('/graphs', methods=['GET'])
 @login_required
 def graphs():
     return render_template('graphs.html')
 
 
-@app.route('/submit', methods=['POST'])
+def _person_name() -> str:
+    return _services().migrate_storage_key(current_user)
+
+
+def _conditional_response(tag: str, build) -> Response:
+    """
+    Answers with 304 if the client already has the representation identified by tag,
+    otherwise calls build with the person's data version to produce the JSON body.
+
+    :param tag: The ETag of the representation, derived from the person's data version.
+    :param build: A callable receiving the data version tag and returning the JSON body.
+    :return: The Flask response.
+    """
+    version = _services().storage.data_version(_person_name())
+    response = Response(mimetype='application/json')
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    if version:
+        response.set_etag(hashlib.sha1(f"{version[0]}-{tag}".encode()).hexdigest())
+        response.last_modified = datetime.fromtimestamp(version[1], tz=timezone.utc)
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+    response.set_data(build(version[0] if version else ''))
+    return response
+
+
+@bp.route('/graphs/exercises', methods=['GET'])
 @login_required
-def submit():
+def graph_exercises():
+    services = _services()
+
+    def build(_version):
+        person = services.storage.load_person(_person_name())
+        exercises = person.exercises if person else []
+        mapper = services.exercise_mapper
+        return jsonify([{
+            'name': exercise.name,
+            'district': exercise.district or mapper.get_district_by_exercise(exercise.name, fuzzy=True) or '',
+            'reps': sorted({volume.reps for volume in exercise.volumes}),
+            'weights': sorted({volume.weight for volume in exercise.volumes}),
+        } for exercise in exercises]).get_data()
+
+    return _conditional_response('exercises', build)
+
+
+@bp.route('/graphs/aggregates', methods=['GET'])
+@login_required
+def graph_aggregates():
+    aggregates = _services().aggregate_store.get(_person_name())
+    if not aggregates:
+        abort(404)
+    return Response(aggregates.model_dump_json(), mimetype='application/json')
+
+
+def _graph_options() -> GraphOptions:
     try:
-        name = current_user.name
-        surname = current_user.surname
+        return GraphOptions(bucket=request.args.get('bucket') or None,
+                            agg=request.args.get('agg') or None,
+                            max_points=request.args.get('max_points', DEFAULT_MAX_POINTS, type=int),
+                            start=request.args.get('start') or None,
+                            end=request.args.get('end') or None)
+    except ValidationError:
+        abort(400)
 
-        exercise_list = []
 
-        index = 1
-        while f'exercises[{index}][name]' in request.form:
-            exercise_name = request.form.get(f'exercises[{index}][name]')
-            district = request.form.get(f'exercises[{index}][district]')
-            reps = request.form.get(f'exercises[{index}][reps]')
-            weight = request.form.get(f'exercises[{index}][weight]')
+def _overlay_response(overlay: str, build_figure) -> Response:
+    options = _graph_options()
+    services = _services()
 
-            volume = Volume(
-                weight=float(weight),
-                reps=int(reps)
-            )
+    def build(version):
+        def build_from_person():
+            person = services.storage.load_person(_person_name())
+            if not person:
+                abort(404)
+            return build_figure(person, options)
 
-            exercise = Exercise(
-                name=exercise_name,
-                district=district,
-                volumes=[volume]
-            )
+        return services.figure_cache.get_or_create(_person_name(), ALL_EXERCISES, overlay, options, version,
+                                                   build_from_person)
 
-            exercise_list.append(exercise)
-            index += 1
+    return _conditional_response(f"{overlay}-{options!r}", build)
 
-        person = SheetPerson(
-            name=f"{name} {surname}",
-            exercises=exercise_list
-        )
 
-        info_saver.save_person(person)
+@bp.route('/graphs/district/<district>', methods=['GET'])
+@login_required
+def graph_district(district):
+    services = _services()
+    return _overlay_response(f"district-{district}", lambda person, options:
+                             services.graph_creator.create_district_volume_graph(person, district, options))
+
+
+@bp.route('/graphs/multi', methods=['GET'])
+@login_required
+def graph_multi():
+    exercise_names = sorted(set(request.args.getlist('exercise')))
+    if not exercise_names:
+        abort(400)
+    services = _services()
+    return _overlay_response(f"multi-{exercise_names}", lambda person, options:
+                             services.graph_creator.create_multi_exercise_volume_graph(person, exercise_names, options))
+
+
+@bp.route('/graphs/<graph_type>', methods=['GET'])
+@login_required
+def graph_data(graph_type):
+    if graph_type not in GRAPH_TYPES:
+        abort(404)
+    exercise_name = request.args.get('exercise', '')
+    reps = request.args.get('reps', type=int)
+    weight = request.args.get('weight', type=float)
+    if (graph_type == 'weight_per_reps' and reps is None) or (graph_type == 'reps_per_weight' and weight is None):
+        abort(400)
+    options = _graph_options()
+    services = _services()
+
+    def build_figure():
+        window = dict(start=options.start, end=options.end)
+        if graph_type == 'volume':
+            exercise = services.storage.load_exercise(_person_name(), exercise_name, **window)
+        elif graph_type == 'weight_per_reps':
+            exercise = services.storage.load_exercise(_person_name(), exercise_name, reps=reps, **window)
+        else:
+            exercise = services.storage.load_exercise(_person_name(), exercise_name, weight=weight, **window)
+        if not exercise:
+            abort(404)
+
+        if graph_type == 'volume':
+            return services.graph_creator.create_volume_graph(exercise, options)
+        if graph_type == 'weight_per_reps':
+            return services.graph_creator.create_weight_per_reps_graph(exercise, reps, options)
+        return services.graph_creator.create_reps_per_weight_graph(exercise, weight, options)
+
+    def build(version):
+        filter_value = reps if graph_type == 'weight_per_reps' else weight if graph_type == 'reps_per_weight' else None
+        return services.figure_cache.get_or_create(_person_name(), exercise_name, graph_type,
+                                                   (filter_value, options), version, build_figure)
+
+    return _conditional_response(f"{graph_type}-{exercise_name}-{reps}-{weight}-{options!r}", build)
+
+
+@bp.route('/api/sets', methods=['POST'])
+@login_required
+def submit_sets():
+    """
+    Accepts a JSON batch of sets, as a list or as {"sets": [...]}, and saves the valid ones in a single write.
+    Answers with the SubmitReport: 200 if at least one set was accepted, 400 otherwise.
+    """
+    with metrics.stage('parse_json'):
+        payload = request.get_json(silent=True)
+    sets = payload.get('sets') if isinstance(payload, dict) else payload
+    if not isinstance(sets, list):
+        abort(400)
+    if len(sets) > MAX_BATCH_SETS:
+        abort(413)
+
+    services = _services()
+    person, report = services.info_generator.load_sheet_person_from_sets(_person_name(), sets)
+    if person:
+        services.storage.save_person(person)
+    return Response(report.model_dump_json(), status=200 if person else 400, mimetype='application/json')
+
+
+@bp.route('/metrics', methods=['GET', 'POST'])
+def metrics_page():
+    """
+    Serves the timing histograms and the cache and queue gauges in the Prometheus text format, to local clients
+    sending the METRICS_TOKEN as a bearer token. A POST with enabled=0 or enabled=1 switches the recording off or on.
+    The loopback check alone does not protect the page behind a reverse proxy, so it is off without a token.
+    """
+    token = current_app.config['METRICS_TOKEN']
+    if not token or request.remote_addr not in ('127.0.0.1', '::1'):
+        abort(404)
+    authorization = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode()):
+        abort(404)
+    if request.method == 'POST':
+        enabled = request.values.get('enabled')
+        if enabled not in ('0', '1'):
+            abort(400)
+        metrics.enabled = enabled == '1'
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@bp.route('/submit', methods=['POST'])
+@login_required
+def submit():
+    try:
+        rows = []
+
+        with metrics.stage('parse_form'):
+            index = 1
+            while f'exercises[{index}][name]' in request.form:
+                rows.append((request.form.get(f'exercises[{index}][name]'),
+                             request.form.get(f'exercises[{index}][district]'),
+                             request.form.get(f'exercises[{index}][reps]'),
+                             request.form.get(f'exercises[{index}][weight]')))
+                index += 1
+
+        # Names are resolved like those of /api/sets, so both paths save to the same exercise
+        info_generator = _services().info_generator
+        with metrics.stage('validate'):
+            exercise_list = []
+            for exercise_name, district, reps, weight in rows:
+                exercise_name, district = info_generator.resolve_exercise(exercise_name, district)
+                volume = Volume(
+                    weight=float(weight),
+                    reps=int(reps)
+                )
+
+                exercise = Exercise(
+                    name=exercise_name,
+                    district=district,
+                    volumes=[volume]
+                )
+
+                exercise_list.append(exercise)
+
+            person = SheetPerson(
+                name=_person_name(),
+                exercises=exercise_list
+            )
+
+        _services().storage.save_person(person)
 
-        return render_template('success.html', name=person.name)
+        return render_template('success.html', name=f"{current_user.name} {current_user.surname}")
 
     except ValidationError as e:
         return f'Errore di validazione dei dati: {e}', 400
@@ -194,4 +725,4 @@ def submit():
 
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0')
+    create_app().run(debug=True, host='0.0.0.0')
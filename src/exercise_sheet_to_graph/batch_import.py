@@ -0,0 +1,119 @@
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Union, Optional, List, Tuple, Dict, Callable
+from exercise_sheet_to_graph.infogenerator import InfoGenerator
+from exercise_sheet_to_graph.infosaver import InfoSaver
+from exercise_sheet_to_graph.models import SheetPerson, Exercise, BatchImportReport
+from exercise_sheet_to_graph.sqlite_storage import SqliteStorage
+from exercise_sheet_to_graph.storage import Storage
+from exercise_sheet_to_graph.utils import get_logger
+
+logger = get_logger("sheet_to_graph")
+
+YAML_SUFFIXES = (".yaml", ".yml")
+SHEET_SUFFIXES = (".txt",)
+
+ProgressCallback = Callable[[int, int, Path], None]
+
+
+def load_file(file: Union[Path, str]) -> Tuple[Optional[SheetPerson], Optional[str]]:
+    """
+    Parses a single YAML dump or text sheet. Text sheets take the person name from the
+    file name, with underscores replaced by spaces (mario_rossi.txt -> "mario rossi").
+
+    :param file: The file to parse.
+    :return: The parsed SheetPerson and None, or None and the reason the file was rejected.
+    """
+    file = Path(file)
+    info_generator = InfoGenerator()
+    try:
+        if file.suffix in YAML_SUFFIXES:
+            person = info_generator.load_sheet_person_from_yaml(file)
+        else:
+            person = info_generator.load_sheet_person_from_exercises_file(file.stem.replace("_", " "), file)
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+    if person is None or not person.name:
+        return None, "file could not be parsed"
+    if not person.exercises:
+        return None, "no exercises found"
+    return person, None
+
+
+def print_progress(done: int, total: int, file: Path) -> None:
+    print(f"[{done}/{total}] {file.name}", file=sys.stderr)
+
+
+def import_directory(directory: Union[Path, str], storage: Storage, workers: Optional[int] = None,
+                     progress: Optional[ProgressCallback] = None) -> BatchImportReport:
+    """
+    Parses every YAML dump and text sheet of a directory on a process pool, then saves
+    the results with one save per person, so files of the same person never race.
+
+    :param directory: The directory containing the files to import.
+    :param storage: The storage the people are saved to.
+    :param workers: Number of worker processes, None for one per CPU.
+    :param progress: Optional callable receiving (files done, total files, file) after each file.
+    :return: A BatchImportReport with the per-file errors.
+    """
+    directory = Path(directory)
+    files = sorted(file for file in directory.iterdir()
+                   if file.is_file() and file.suffix in YAML_SUFFIXES + SHEET_SUFFIXES)
+    report = BatchImportReport(files=len(files))
+    start = time.perf_counter()
+
+    people: Dict[str, List[Exercise]] = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(load_file, file): file for file in files}
+        for done, future in enumerate(as_completed(futures), start=1):
+            file = futures[future]
+            try:
+                person, error = future.result()
+            except Exception as e:
+                person, error = None, f"{type(e).__name__}: {e}"
+
+            if person is None:
+                report.failed += 1
+                report.errors[str(file)] = error
+                logger.error("Could not import %s: %s", file, error)
+            else:
+                report.imported += 1
+                people.setdefault(person.name, []).extend(person.exercises)
+
+            if progress:
+                progress(done, len(files), file)
+
+    for name in sorted(people):
+        storage.save_person(SheetPerson(name=name, exercises=people[name]))
+    report.people = len(people)
+    report.elapsed = time.perf_counter() - start
+
+    logger.info("Imported %s/%s files for %s people in %.1fs, %s failed", report.imported, report.files,
+                report.people, report.elapsed, report.failed)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Import a directory of YAML dumps and text sheets in parallel.")
+    parser.add_argument("source_dir", type=Path, help="Directory containing the .yaml/.yml dumps and .txt sheets")
+    parser.add_argument("target", type=Path, help="InfoSaver directory, or SQLite file with --sqlite")
+    parser.add_argument("--sqlite", action="store_true", help="Import into a SQLite database")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--quiet", action="store_true", help="Do not print progress")
+    args = parser.parse_args(argv)
+
+    storage = SqliteStorage(args.target) if args.sqlite else InfoSaver(args.target)
+    report = import_directory(args.source_dir, storage, workers=args.workers,
+                              progress=None if args.quiet else print_progress)
+    for file, error in report.errors.items():
+        print(f"{file}: {error}", file=sys.stderr)
+    if report.failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+Compact columnar encoding of SheetPerson histories.
+
+A file starts with a fixed header and a directory with the name, district, number of sets and
+the byte range of every exercise. The sets of an exercise are stored as one zlib compressed block
+holding three columns: the timestamps as deltas of microseconds since the epoch (int64), the
+weights (float64) and the reps (int32). Sorted timestamps and repeated weights and reps compress
+to a few bytes per set, and a single exercise is decoded without touching the blocks of the others.
+"""
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+from pydantic import TypeAdapter
+from exercise_sheet_to_graph.models import SheetPerson, Exercise, Volume
+from exercise_sheet_to_graph.series import datetime_to_epoch_us, EPOCH, MICROSECOND, np
+from exercise_sheet_to_graph.utils import normalize_string
+
+MAGIC = b"STGB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHI")
+ENTRY = struct.Struct("<IQI")
+LENGTH = struct.Struct("<I")
+COLUMNS = (("q", 8), ("d", 8), ("i", 4))
+COMPRESSION_LEVEL = 6
+VOLUMES = TypeAdapter(List[Volume])
+
+DirectoryEntry = Tuple[str, str, int, int, int]
+
+
+class BinaryFormatError(ValueError):
+    """
+    Raised when a file is not a valid binary snapshot.
+    """
+
+
+def _pack_text(text: str) -> bytes:
+    encoded = text.encode("utf-8")
+    return LENGTH.pack(len(encoded)) + encoded
+
+
+def _unpack_text(data, offset: int) -> Tuple[str, int]:
+    (length,) = LENGTH.unpack_from(data, offset)
+    offset += LENGTH.size
+    return bytes(data[offset:offset + length]).decode("utf-8"), offset + length
+
+
+def _column_bytes(typecode: str, values) -> bytes:
+    column = array(typecode, values)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column.tobytes()
+
+
+def _column(typecode: str, data: bytes) -> array:
+    column = array(typecode)
+    column.frombytes(data)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+def _encode_exercise(exercise: Exercise) -> bytes:
+    volumes = exercise.volumes
+    timestamps = [datetime_to_epoch_us(volume.ts) for volume in volumes]
+    deltas = [current - previous for previous, current in zip([0] + timestamps, timestamps)]
+    return zlib.compress(_column_bytes("q", deltas)
+                         + _column_bytes("d", [volume.weight for volume in volumes])
+                         + _column_bytes("i", [volume.reps for volume in volumes]), COMPRESSION_LEVEL)
+
+
+def dumps(person: SheetPerson) -> bytes:
+    """
+    Encodes a SheetPerson in the binary format.
+
+    :param person: The SheetPerson object to encode.
+    :return: The encoded bytes.
+    """
+    blocks = [_encode_exercise(exercise) for exercise in person.exercises]
+    directory = [_pack_text(person.name)]
+    offset = 0
+    for exercise, block in zip(person.exercises, blocks):
+        directory.append(_pack_text(exercise.name) + _pack_text(exercise.district)
+                         + ENTRY.pack(len(exercise.volumes), offset, len(block)))
+        offset += len(block)
+    return b"".join([HEADER.pack(MAGIC, FORMAT_VERSION, len(blocks))] + directory + blocks)
+
+
+def _read_directory(data) -> Tuple[str, List[DirectoryEntry], int]:
+    """
+    Parses the header and the exercise directory.
+
+    :param data: The encoded bytes, or a memory map of the file.
+    :return: The person name, a (name, district, sets, offset, length) tuple per exercise and
+             the position of the first block.
+    """
+    try:
+        magic, version, count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise BinaryFormatError("Not a binary SheetPerson snapshot")
+        if version != FORMAT_VERSION:
+            raise BinaryFormatError(f"Unsupported binary snapshot version {version}")
+        name, offset = _unpack_text(data, HEADER.size)
+        entries = []
+        for _ in range(count):
+            exercise_name, offset = _unpack_text(data, offset)
+            district, offset = _unpack_text(data, offset)
+            sets, block_offset, block_length = ENTRY.unpack_from(data, offset)
+            offset += ENTRY.size
+            entries.append((exercise_name, district, sets, block_offset, block_length))
+    except struct.error as e:
+        raise BinaryFormatError(f"Truncated binary snapshot: {e}") from e
+    return name, entries, offset
+
+
+def _decode_columns(data, base: int, entry: DirectoryEntry) -> Tuple[List[int], List[float], List[int]]:
+    _, _, sets, block_offset, block_length = entry
+    start = base + block_offset
+    try:
+        block = zlib.decompress(data[start:start + block_length])
+    except zlib.error as e:
+        raise BinaryFormatError(f"Corrupted block of exercise {entry[0]}: {e}") from e
+    if len(block) != sets * sum(size for _, size in COLUMNS):
+        raise BinaryFormatError(f"Corrupted block of exercise {entry[0]}")
+    columns = []
+    position = 0
+    for typecode, size in COLUMNS:
+        columns.append(_column(typecode, block[position:position + sets * size]))
+        position += sets * size
+    deltas, weights, reps = columns
+    return list(accumulate(deltas)), weights.tolist(), reps.tolist()
+
+
+def _timestamps(epoch_us: List[int]) -> list:
+    if np is not None:
+        # NumPy converts a whole column of microsecond datetimes to datetime objects at once
+        return np.array(epoch_us, dtype="datetime64[us]").tolist()
+    return [EPOCH + ts * MICROSECOND for ts in epoch_us]
+
+
+def _volumes(epoch_us: List[int], weights: List[float], reps: List[int]) -> List[Volume]:
+    # One validation call for the whole column, with already typed values
+    return VOLUMES.validate_python([{"ts": ts, "weight": weight, "reps": set_reps}
+                                    for ts, weight, set_reps in zip(_timestamps(epoch_us), weights, reps)])
+
+
+def loads(data) -> SheetPerson:
+    """
+    Decodes a SheetPerson from the binary format.
+
+    :param data: The encoded bytes, or a memory map of the file.
+    :return: The decoded SheetPerson.
+    :raises BinaryFormatError: If the data is not a valid binary snapshot.
+    """
+    name, entries, base = _read_directory(data)
+    exercises = [Exercise.model_construct(name=entry[0], district=entry[1],
+                                          volumes=_volumes(*_decode_columns(data, base, entry)))
+                 for entry in entries]
+    # The volumes are validated and already sorted, so the containers skip a second validation
+    return SheetPerson.model_construct(name=name, exercises=exercises)
+
+
+def read_person(path: Union[Path, str]) -> SheetPerson:
+    """
+    Reads a binary snapshot file.
+
+    :param path: The path of the file.
+    :return: The decoded SheetPerson.
+    """
+    with open(path, "rb") as read_file:
+        return loads(read_file.read())
+
+
+def read_exercise(path: Union[Path, str], exercise_name: str,
+                  start_us: Optional[int] = None, end_us: Optional[int] = None) -> Optional[Exercise]:
+    """
+    Reads a single exercise of a binary snapshot through a memory map, decoding only its block
+    and building Volume objects only for the sets in the [start_us, end_us] window.
+
+    :param path: The path of the file.
+    :param exercise_name: The name of the exercise, compared after normalization.
+    :param start_us: The start of the window in microseconds since the epoch, None for no lower bound.
+    :param end_us: The end of the window in microseconds since the epoch, None for no upper bound.
+    :return: The Exercise object if found, otherwise None.
+    """
+    normalized_name = normalize_string(exercise_name)
+    with open(path, "rb") as read_file:
+        with mmap.mmap(read_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            _, entries, base = _read_directory(data)
+            entry = next((entry for entry in entries if normalize_string(entry[0]) == normalized_name), None)
+            if entry is None:
+                return None
+            epoch_us, weights, reps = _decode_columns(data, base, entry)
+
+    low = bisect_left(epoch_us, start_us) if start_us is not None else 0
+    high = bisect_right(epoch_us, end_us) if end_us is not None else len(epoch_us)
+    return Exercise.model_construct(name=entry[0], district=entry[1],
+                                    volumes=_volumes(epoch_us[low:high], weights[low:high], reps[low:high]))
@@ -0,0 +1,122 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    def __init__(self, max_entries: int = 128, max_bytes: Optional[int] = None):
+        """
+        Initializes a thread-safe least-recently-used cache bounded by entry count and,
+        optionally, by the approximate size of its entries.
+
+        :param max_entries: The maximum number of entries kept.
+        :param max_bytes: The maximum total size of the entries, as reported on put, or None for no limit.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.current_bytes = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default: Any = None, version: Hashable = None) -> Any:
+        """
+        Returns the value stored for a key and marks it as recently used.
+
+        :param key: The key to look up.
+        :param default: The value returned on a miss.
+        :param version: If given, an entry stored with a different version is dropped and counted as a miss.
+        :return: The cached value, or default if the key is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and version is not None and entry[2] != version:
+                del self._entries[key]
+                self.current_bytes -= entry[1]
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: int = 0, version: Hashable = None) -> None:
+        """
+        Stores a value, evicting the least recently used entries if the cache is over its bounds.
+
+        :param key: The key to store.
+        :param value: The value to store.
+        :param size: The approximate size of the value in bytes.
+        :param version: The version of the data the value was built from.
+        """
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (value, size, version)
+            self.current_bytes += size
+
+            while self._entries and (len(self._entries) > self.max_entries or
+                                     (self.max_bytes is not None and self.current_bytes > self.max_bytes)):
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted[1]
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> Any:
+        """
+        Removes a key from the cache.
+
+        :param key: The key to remove.
+        :return: The removed value, or None if the key was not cached.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            self.current_bytes -= entry[1]
+            return entry[0]
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Removes every entry whose key satisfies a predicate.
+
+        :param predicate: A callable receiving a key and returning True if the entry must be removed.
+        :return: The number of removed entries.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the cache counters.
+
+        :return: A dictionary with hits, misses, evictions, invalidations, entries and bytes.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+        }
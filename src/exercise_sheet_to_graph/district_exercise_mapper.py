@@ -1,18 +1,194 @@
 # district_exercise_mapper.py
+import hashlib
+import os
+import pickle
+import threading
+import time
 import yaml
-from typing import List, Optional
-from exercise_sheet_to_graph.utils import get_logger, normalize_string
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Iterable, Tuple, Union
+from exercise_sheet_to_graph.name_index import ExerciseNameIndex, Resolution
+from exercise_sheet_to_graph.utils import get_logger, normalize_string, file_lock, atomic_write_bytes, \
+    atomic_write_text, yaml_loader
 
 logger = get_logger("sheet_to_graph")
 
+# Bumped whenever the pickled MapperState changes shape, so stale snapshots are ignored
+SNAPSHOT_FORMAT = 1
+
+
+class MapperState(NamedTuple):
+    """
+    Everything a DistrictExerciseMapper answers from. A state is never modified once published:
+    reloads and edits build a new one and swap it in with a single assignment, so readers never lock.
+    """
+    version: str
+    district_to_exercises: Dict[str, List[str]]
+    exercises_to_district: Dict[str, str]
+    name_index: ExerciseNameIndex
+
 
 class DistrictExerciseMapper:
-    def __init__(self, config_path: str):
+    def __init__(self, config_path: str, alias_config_paths: Iterable[str] = (), fuzzy_threshold: float = 0.5,
+                 cache_dir: Optional[Union[Path, str]] = None, watch_interval: Optional[float] = None,
+                 persist_edits: bool = False):
+        """
+        Initializes the mapper from a district/exercise config and builds the name index used by resolve_exercise.
+
+        :param config_path: The YAML config whose names are the canonical ones.
+        :param alias_config_paths: Configs in other languages, with the same districts and exercises in the same
+                                   order (e.g. the English config next to the Italian one), whose names become aliases.
+        :param fuzzy_threshold: The minimum confidence (0 to 1) of a fuzzy match.
+        :param cache_dir: If given, the parsed maps and name index are pickled there, keyed on the hash of the
+                          configs, and loaded instead of parsing the YAML on the next start.
+        :param watch_interval: If given, the configs are checked for changes at most once every this many
+                               seconds when the mapper is used, and reloaded when they changed.
+        :param persist_edits: If True, add_exercise_to_district and remove_exercise_from_district write the
+                              config back, so the edits survive restarts and reach the other worker processes.
+        """
+        self.config_path = config_path
+        self.alias_config_paths = list(alias_config_paths)
+        self.fuzzy_threshold = fuzzy_threshold
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.watch_interval = watch_interval
+        self.persist_edits = persist_edits
+        self._reload_lock = threading.Lock()
+        self._edit_lock = threading.Lock()
+        self._stamp = self._config_stamp()
+        self._checked_at = time.monotonic()
+        self._state = self._load()
+
+    @property
+    def state(self) -> MapperState:
+        if self.watch_interval is not None and time.monotonic() - self._checked_at >= self.watch_interval:
+            self.reload_if_changed()
+        return self._state
+
+    @property
+    def version(self) -> str:
+        """
+        A digest identifying the current content of the maps, changing on every reload or edit.
+        """
+        return self.state.version
+
+    @property
+    def district_to_exercises(self) -> Dict[str, List[str]]:
+        return self.state.district_to_exercises
+
+    @property
+    def exercises_to_district(self) -> Dict[str, str]:
+        return self.state.exercises_to_district
+
+    @property
+    def name_index(self) -> ExerciseNameIndex:
+        return self.state.name_index
+
+    def _config_paths(self) -> List[str]:
+        return [self.config_path] + self.alias_config_paths
+
+    def _config_stamp(self) -> Optional[Tuple]:
+        try:
+            return tuple((stat.st_mtime_ns, stat.st_size) for stat in map(os.stat, self._config_paths()))
+        except OSError:
+            return None
+
+    def _load(self) -> MapperState:
+        texts = []
+        for path in self._config_paths():
+            with open(path, "r") as read_file:
+                texts.append(read_file.read())
+        version = hashlib.sha1(f"{SNAPSHOT_FORMAT}-{self.fuzzy_threshold}-".encode() +
+                               b"\0".join(text.encode() for text in texts)).hexdigest()
+
+        snapshot_prefix = f"{Path(self.config_path).stem}-"
+        snapshot_path = self.cache_dir / f"{snapshot_prefix}{version}.pickle" if self.cache_dir else None
+        if snapshot_path and snapshot_path.is_file():
+            try:
+                with open(snapshot_path, "rb") as read_file:
+                    return pickle.load(read_file)
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+                logger.error("Error loading mapper snapshot %s: %s", snapshot_path, e)
+
+        configs = [yaml.load(text, Loader=yaml_loader()) or {} for text in texts]
+        config = configs[0]
+        state = self._build_state(version, config.get("district_to_exercises", {}),
+                                  config.get("exercise_to_district", {}), configs[1:])
+
+        if snapshot_path:
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                atomic_write_bytes(snapshot_path, pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+                for stale_path in self.cache_dir.glob(f"{snapshot_prefix}*.pickle"):
+                    if stale_path != snapshot_path:
+                        stale_path.unlink(missing_ok=True)
+            except OSError as e:
+                logger.error("Error writing mapper snapshot %s: %s", snapshot_path, e)
+        return state
 
-        with open(config_path, "r") as read_file:
-            config = yaml.safe_load(read_file)
-        self.district_to_exercises = config.get("district_to_exercises", {})
-        self.exercises_to_district = config.get("exercise_to_district", {})
+    def _build_state(self, version: str, district_to_exercises: Dict[str, List[str]],
+                     exercises_to_district: Dict[str, str], alias_configs: Iterable[dict]) -> MapperState:
+        name_index = ExerciseNameIndex(threshold=self.fuzzy_threshold)
+        for exercise, district in exercises_to_district.items():
+            name_index.add(exercise, exercise, district)
+        for district, exercises in district_to_exercises.items():
+            for exercise in exercises:
+                name_index.add(exercise, exercise, district)
+        for alias_config_path, alias_config in zip(self.alias_config_paths, alias_configs):
+            self._add_aliases(name_index, district_to_exercises, alias_config_path, alias_config)
+        return MapperState(version, district_to_exercises, exercises_to_district, name_index)
+
+    @staticmethod
+    def _add_aliases(name_index: ExerciseNameIndex, district_to_exercises: Dict[str, List[str]],
+                     alias_config_path: str, alias_config: dict) -> None:
+        alias_districts = alias_config.get("district_to_exercises", {})
+        # Districts added at runtime come after the aligned ones as well
+        if len(alias_districts) > len(district_to_exercises):
+            logger.error("Alias config '%s' has different districts, ignoring it.", alias_config_path)
+            return
+
+        for (district, exercises), (alias_district, aliases) in zip(district_to_exercises.items(),
+                                                                    alias_districts.items()):
+            # Exercises added at runtime have no translation yet, but come after the aligned ones
+            if len(exercises) < len(aliases):
+                logger.error("District '%s' of '%s' does not match district '%s', ignoring its aliases.",
+                             alias_district, alias_config_path, district)
+                continue
+            for exercise, alias in zip(exercises, aliases):
+                name_index.add(alias, exercise, district)
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reloads the configs if they changed on disk since they were loaded. Readers keep using the
+        current maps while the new ones are built, and a concurrent call returns without waiting.
+
+        :return: True if new maps were swapped in.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            self._checked_at = time.monotonic()
+            stamp = self._config_stamp()
+            if stamp is None or stamp == self._stamp:
+                return False
+            self._state = self._load()
+            self._stamp = stamp
+            logger.info("Reloaded district and exercise config %s.", self.config_path)
+            return True
+        except (OSError, yaml.YAMLError) as e:
+            logger.error("Error reloading district and exercise config: %s", e)
+            return False
+        finally:
+            self._reload_lock.release()
+
+    def resolve_exercise(self, exercise: str) -> Optional[Resolution]:
+        """
+        Resolves a free-text exercise name (any case, accents, weights or aliases in the
+        other language) to the canonical exercise of the config.
+
+        :param exercise: The name of the exercise as written.
+        :return: The canonical exercise, its district and the confidence of the match, or None if nothing matches.
+        """
+        return self.name_index.resolve(exercise)
 
     def get_exercise_by_district(self, district: str) -> Optional[List[str]]:
         """
@@ -25,23 +201,66 @@ class DistrictExerciseMapper:
             normalized_district = normalize_string(district)
             return self.district_to_exercises[normalized_district]
         except KeyError:
-            logger.error(f"District '{district}' does not exist.")
+            logger.error("District '%s' does not exist.", district)
             return None
 
-    def get_district_by_exercise(self, exercise: str) -> Optional[str]:
+    def get_district_by_exercise(self, exercise: str, fuzzy: bool = False) -> Optional[str]:
         """
         Retrieves the district for a given exercise.
 
         :param exercise: The name of the exercise.
+        :param fuzzy: If True, falls back to resolve_exercise when the name is not an exact match.
         :return: The district name, or None if the exercise does not exist.
         """
         try:
             normalized_exercise = normalize_string(exercise)
             return self.exercises_to_district[normalized_exercise]
         except KeyError:
-            logger.error(f"Exercise '{exercise}' does not exist.")
+            resolution = self.resolve_exercise(exercise) if fuzzy else None
+            if resolution:
+                return resolution.district
+            logger.error("Exercise '%s' does not exist.", exercise)
             return None
 
+    def _edit(self, description: str,
+              apply: Callable[[Dict[str, List[str]], Dict[str, str]], None]) -> None:
+        """
+        Applies an edit to copies of the maps and publishes them as a new state. With persist_edits
+        the edit is applied to the config as currently on disk, under a lock shared by all processes,
+        and written back atomically, so concurrent edits from other workers are not lost.
+        """
+        with self._edit_lock:
+            if not self.persist_edits:
+                state = self._state
+                district_to_exercises = {district: list(exercises)
+                                         for district, exercises in state.district_to_exercises.items()}
+                exercises_to_district = dict(state.exercises_to_district)
+                apply(district_to_exercises, exercises_to_district)
+                version = hashlib.sha1(f"{state.version}-{description}".encode()).hexdigest()
+                self._state = self._build_state(version, district_to_exercises, exercises_to_district,
+                                                self._alias_configs())
+                return
+
+            config_path = Path(self.config_path)
+            with file_lock(config_path.with_name(f"{config_path.name}.lock")):
+                with open(config_path, "r") as read_file:
+                    config = yaml.load(read_file, Loader=yaml_loader()) or {}
+                config.setdefault("district_to_exercises", {})
+                config.setdefault("exercise_to_district", {})
+                apply(config["district_to_exercises"], config["exercise_to_district"])
+                atomic_write_text(config_path, yaml.safe_dump(config, allow_unicode=True, sort_keys=False))
+                with self._reload_lock:
+                    self._state = self._load()
+                    self._stamp = self._config_stamp()
+                    self._checked_at = time.monotonic()
+
+    def _alias_configs(self) -> List[dict]:
+        configs = []
+        for path in self.alias_config_paths:
+            with open(path, "r") as read_file:
+                configs.append(yaml.load(read_file, Loader=yaml_loader()) or {})
+        return configs
+
     def add_exercise_to_district(self, district: str, exercise: str) -> None:
         """
         Adds an exercise to a district.
@@ -52,11 +271,17 @@ class DistrictExerciseMapper:
         try:
             normalized_district = normalize_string(district)
             normalized_exercise = normalize_string(exercise)
-            self.district_to_exercises[normalized_district] = self.district_to_exercises.get(normalized_district, []) + [normalized_exercise]
-            self.exercises_to_district[normalized_exercise] = normalized_district
-            logger.info(f"Added exercise '{exercise}' to district '{district}'.")
+
+            def apply(district_to_exercises, exercises_to_district):
+                exercises = district_to_exercises.setdefault(normalized_district, [])
+                if normalized_exercise not in exercises:
+                    exercises.append(normalized_exercise)
+                exercises_to_district[normalized_exercise] = normalized_district
+
+            self._edit(f"add-{normalized_district}-{normalized_exercise}", apply)
+            logger.info("Added exercise '%s' to district '%s'.", exercise, district)
         except Exception as e:
-            logger.error(f"Error adding exercise to district: {e}")
+            logger.error("Error adding exercise to district: %s", e)
 
     def remove_exercise_from_district(self, district: str, exercise: str) -> None:
         """
@@ -68,11 +293,15 @@ class DistrictExerciseMapper:
         try:
             normalized_district = normalize_string(district)
             normalized_exercise = normalize_string(exercise)
-            if normalized_exercise in self.district_to_exercises[normalized_district]:
-                self.district_to_exercises[normalized_district].remove(normalized_exercise)
-            self.exercises_to_district.pop(normalized_exercise, None)
-            logger.info(f"Removed exercise '{exercise}' from district '{district}'.")
+
+            def apply(district_to_exercises, exercises_to_district):
+                if normalized_exercise in district_to_exercises[normalized_district]:
+                    district_to_exercises[normalized_district].remove(normalized_exercise)
+                exercises_to_district.pop(normalized_exercise, None)
+
+            self._edit(f"remove-{normalized_district}-{normalized_exercise}", apply)
+            logger.info("Removed exercise '%s' from district '%s'.", exercise, district)
         except KeyError:
-            logger.error(f"Error: District '{district}' or exercise '{exercise}' does not exist.")
+            logger.error("Error: District '%s' or exercise '%s' does not exist.", district, exercise)
         except Exception as e:
-            logger.error(f"Error removing exercise from district: {e}")
\ No newline at end of file
+            logger.error("Error removing exercise from district: %s", e)
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+from typing import Sequence, List, Tuple, Dict, Callable
+from exercise_sheet_to_graph.series import EPOCH
+
+DAY_US = 86_400_000_000
+
+BUCKETS = ("day", "week", "month")
+
+AGGREGATIONS: Dict[str, Callable[[List[float]], float]] = {
+    "sum": sum,
+    "max": max,
+    "mean": lambda values: sum(values) / len(values),
+}
+
+
+def _bucket_start(epoch_us: int, bucket: str) -> int:
+    """
+    Returns the day (days since the epoch) on which the bucket containing a timestamp starts.
+    Weeks start on Monday, months on their first day.
+    """
+    day = epoch_us // DAY_US
+    if bucket == "day":
+        return day
+    if bucket == "week":
+        # 1970-01-01 was a Thursday
+        return day - (day + 3) % 7
+    date = EPOCH + timedelta(days=day)
+    return (datetime(date.year, date.month, 1) - EPOCH).days
+
+
+def bucket_values(times_us: Sequence[int], values: Sequence[float],
+                  bucket: str, agg: str) -> Tuple[List[str], List[float]]:
+    """
+    Aggregates a time series into per-day, per-week or per-month buckets.
+
+    :param times_us: The timestamps, in microseconds since the epoch.
+    :param values: The values, aligned with times_us.
+    :param bucket: One of 'day', 'week' or 'month'.
+    :param agg: One of 'sum', 'max' or 'mean'.
+    :return: The bucket start dates (YYYY-MM-DD) in chronological order and the aggregated values.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket '{bucket}', expected one of {BUCKETS}")
+    if agg not in AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation '{agg}', expected one of {tuple(AGGREGATIONS)}")
+
+    groups: Dict[int, List[float]] = {}
+    for epoch_us, value in zip(times_us, values):
+        groups.setdefault(_bucket_start(int(epoch_us), bucket), []).append(float(value))
+
+    aggregate = AGGREGATIONS[agg]
+    days = sorted(groups)
+    return ([(EPOCH + timedelta(days=day)).date().isoformat() for day in days],
+            [aggregate(groups[day]) for day in days])
+
+
+def lttb_indices(x: Sequence[float], y: Sequence[float], threshold: int) -> List[int]:
+    """
+    Selects the points that best preserve the shape of a series with the
+    Largest-Triangle-Three-Buckets algorithm.
+
+    :param x: The x values, in increasing order.
+    :param y: The y values.
+    :param threshold: The number of points to keep.
+    :return: The indices of the kept points, in increasing order.
+    """
+    length = len(x)
+    if threshold >= length or threshold < 3:
+        return list(range(length))
+
+    indices = [0]
+    every = (length - 2) / (threshold - 2)
+    selected = 0
+    for bucket in range(threshold - 2):
+        # Average of the next bucket, used as the third vertex of the triangle
+        next_start = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, length)
+        next_count = next_end - next_start
+        avg_x = sum(float(x[i]) for i in range(next_start, next_end)) / next_count
+        avg_y = sum(float(y[i]) for i in range(next_start, next_end)) / next_count
+
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        point_x, point_y = float(x[selected]), float(y[selected])
+        best_area = -1.0
+        for i in range(start, end):
+            area = abs((point_x - avg_x) * (float(y[i]) - point_y) - (point_x - float(x[i])) * (avg_y - point_y))
+            if area > best_area:
+                best_area = area
+                selected_candidate = i
+        selected = selected_candidate
+        indices.append(selected)
+
+    indices.append(length - 1)
+    return indices
@@ -0,0 +1,163 @@
+import hashlib
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Hashable, List, Optional, Union
+from exercise_sheet_to_graph.cache import LRUCache
+from exercise_sheet_to_graph.metrics import metrics
+from exercise_sheet_to_graph.models import Exercise
+from exercise_sheet_to_graph.utils import get_logger, atomic_write_text, normalize_string
+
+if TYPE_CHECKING:
+    # Only the figures handed to the cache need plotly, importing it costs a few hundred milliseconds
+    import plotly.graph_objects as go
+
+logger = get_logger("sheet_to_graph")
+
+# Exercise key of figures spanning several exercises (district and multi-exercise overlays)
+ALL_EXERCISES = "*"
+
+
+def _digest(value: str) -> str:
+    return hashlib.sha1(value.encode()).hexdigest()
+
+
+class FigureCache:
+    def __init__(self, max_entries: int = 256, max_bytes: Optional[int] = None,
+                 disk_dir: Optional[Union[Path, str]] = None, max_disk_entries: int = 4096,
+                 max_disk_bytes: Optional[int] = 256 * 1024 * 1024):
+        """
+        Initializes a cache of serialized GraphCreator figures, keyed by
+        (person, exercise, graph type, filter) and versioned by the person's data version.
+        Exercise names are normalized, so that a save of "bench press" drops the figures of "Bench Press".
+
+        On disk, writing the figure of a data version deletes the figure of the previous one, and the
+        oldest files are evicted once the tier is over its bounds.
+
+        :param max_entries: The maximum number of figures kept in memory.
+        :param max_bytes: Optional bound on the total size of the figures kept in memory.
+        :param disk_dir: If given, figures are also stored as JSON files under this directory.
+        :param max_disk_entries: The maximum number of figures kept on disk.
+        :param max_disk_bytes: The maximum total size of the figures kept on disk, or None for no limit.
+        """
+        self.memory = LRUCache(max_entries=max_entries, max_bytes=max_bytes)
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.max_disk_entries = max_disk_entries
+        self.max_disk_bytes = max_disk_bytes
+        # Sizes of the files on disk, oldest first, read from the directory on the first write
+        self._disk_index: Optional["OrderedDict[Path, int]"] = None
+        self._disk_bytes = 0
+        self._disk_lock = threading.Lock()
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    def _disk_path(self, person: str, exercise: str, graph_type: str, filter_value: Hashable, version: str) -> Path:
+        # The figures of every version of a graph share the prefix, so that older versions can be found
+        return (self.disk_dir / _digest(person) / _digest(exercise) /
+                f"{_digest(f'{graph_type}-{filter_value}')}-{_digest(version)}.json")
+
+    def get_or_create(self, person: str, exercise: str, graph_type: str, filter_value: Hashable,
+                      version: str, build: Callable[[], "go.Figure"]) -> str:
+        """
+        Returns the JSON of a figure, building it only if no figure is cached for the same data version.
+
+        :param person: The name of the person.
+        :param exercise: The name of the exercise.
+        :param graph_type: The kind of graph, e.g. 'volume'.
+        :param filter_value: The reps or weight the graph is filtered on, or None.
+        :param version: The data version of the person the figure is built from.
+        :param build: A callable returning the Plotly figure on a miss.
+        :return: The serialized figure.
+        """
+        exercise = normalize_string(exercise)
+        key = (person, exercise, graph_type, filter_value)
+        fig_json = self.memory.get(key, version=version)
+        if fig_json is not None:
+            return fig_json
+
+        disk_path = self._disk_path(person, exercise, graph_type, filter_value, version) if self.disk_dir else None
+        if disk_path and disk_path.is_file():
+            fig_json = disk_path.read_text()
+        else:
+            with metrics.stage("build_figure"):
+                figure = build()
+            with metrics.stage("plotly_json"):
+                fig_json = figure.to_json()
+            if disk_path:
+                self._write_disk(disk_path, fig_json)
+
+        self.memory.put(key, fig_json, size=len(fig_json), version=version)
+        return fig_json
+
+    def _write_disk(self, disk_path: Path, fig_json: str) -> None:
+        try:
+            disk_path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write_text(disk_path, fig_json)
+        except OSError as e:
+            logger.error("Error writing cached figure %s: %s", disk_path, e)
+            return
+
+        prefix = disk_path.name.rsplit("-", 1)[0]
+        with self._disk_lock:
+            index = self._load_disk_index()
+            # Figures of older data versions are never read again
+            for superseded in disk_path.parent.glob(f"{prefix}-*.json"):
+                if superseded != disk_path:
+                    self._remove_disk(superseded)
+            self._remove_disk(disk_path, unlink=False)
+            index[disk_path] = len(fig_json)
+            self._disk_bytes += len(fig_json)
+            while index and (len(index) > self.max_disk_entries or
+                             (self.max_disk_bytes is not None and self._disk_bytes > self.max_disk_bytes)):
+                self._remove_disk(next(iter(index)))
+
+    def _load_disk_index(self) -> "OrderedDict[Path, int]":
+        if self._disk_index is None:
+            files = []
+            for path in self.disk_dir.glob("*/*/*.json"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, path, stat.st_size))
+            self._disk_index = OrderedDict((path, size) for _, path, size in sorted(files))
+            self._disk_bytes = sum(self._disk_index.values())
+        return self._disk_index
+
+    def _remove_disk(self, disk_path: Path, unlink: bool = True) -> None:
+        self._disk_bytes -= self._disk_index.pop(disk_path, 0)
+        if unlink:
+            disk_path.unlink(missing_ok=True)
+
+    def invalidate(self, person: str, exercise: Optional[str] = None) -> None:
+        """
+        Drops the cached figures of a person, or only those of one of its exercises.
+
+        :param person: The name of the person.
+        :param exercise: The name of the exercise, or None for every exercise.
+        """
+        if exercise is not None:
+            exercise = normalize_string(exercise)
+        self.memory.discard_where(lambda key: key[0] == person and (exercise is None or key[1] == exercise))
+        if self.disk_dir:
+            disk_path = self.disk_dir / _digest(person)
+            if exercise is not None:
+                disk_path = disk_path / _digest(exercise)
+            with self._disk_lock:
+                shutil.rmtree(disk_path, ignore_errors=True)
+                if self._disk_index is not None:
+                    for removed in [path for path in self._disk_index if path.is_relative_to(disk_path)]:
+                        self._remove_disk(removed, unlink=False)
+
+    def on_save(self, person: str, exercises: List[Exercise]) -> None:
+        """
+        Storage listener dropping the figures of the exercises that just received new sets,
+        together with the overlay figures of the person.
+
+        :param person: The name of the saved person.
+        :param exercises: The exercises that were saved.
+        """
+        for exercise in exercises:
+            self.invalidate(person, exercise.name)
+        self.invalidate(person, ALL_EXERCISES)
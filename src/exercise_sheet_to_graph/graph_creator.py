@@ -1,27 +1,73 @@
+from datetime import datetime
+from typing import Union, Optional, Sequence, List, Tuple, Iterable
 import plotly.graph_objects as go
-from exercise_sheet_to_graph.models import Exercise
-from exercise_sheet_to_graph.utils import get_logger
+from exercise_sheet_to_graph.downsampling import bucket_values, lttb_indices
+from exercise_sheet_to_graph.models import Exercise, GraphOptions, SheetPerson
+from exercise_sheet_to_graph.series import ExerciseSeries, plottable, datetime_to_epoch_us
+from exercise_sheet_to_graph.utils import get_logger, normalize_string
 from exercise_sheet_to_graph.district_exercise_mapper import DistrictExerciseMapper
 
 logger = get_logger("sheet_to_graph")
 
 
+def _as_series(exercise: Union[Exercise, ExerciseSeries]) -> ExerciseSeries:
+    if isinstance(exercise, ExerciseSeries):
+        return exercise
+    return ExerciseSeries.from_exercise(exercise)
+
+
+def _window(series: ExerciseSeries, options: Optional[GraphOptions]) -> ExerciseSeries:
+    if options is None:
+        return series
+    return series.between(datetime_to_epoch_us(options.start) if options.start else None,
+                          datetime_to_epoch_us(options.end) if options.end else None)
+
+
+def _reduce(series: ExerciseSeries, values: Sequence[float], options: Optional[GraphOptions],
+            default_agg: str) -> Tuple[List[Union[datetime, str]], Sequence[float]]:
+    """
+    Applies the bucketing and the point budget of the options to a series.
+
+    :param series: The (already windowed and filtered) series.
+    :param values: The plotted values, aligned with the series.
+    :param options: The GraphOptions, or None to plot every set.
+    :param default_agg: The aggregation used when buckets are requested without one.
+    :return: The x values (set times or bucket start dates) and the y values to plot.
+    """
+    if options is None:
+        return series.times(), plottable(values)
+
+    if options.bucket:
+        times, values = bucket_values(series.ts, values, options.bucket, options.agg or default_agg)
+        if options.max_points:
+            indices = lttb_indices(range(len(values)), values, options.max_points)
+            times, values = [times[i] for i in indices], [values[i] for i in indices]
+        return times, values
+
+    if options.max_points and len(series) > options.max_points:
+        indices = lttb_indices(series.ts, values, options.max_points)
+        return series.take(indices).times(), [values[i] for i in indices]
+    return series.times(), plottable(values)
+
+
 class GraphCreator:
     def __init__(self, mapper: DistrictExerciseMapper):
         self.mapper_district_exercise = mapper
 
-    def create_weight_per_reps_graph(self, exercise: Exercise, target_reps: int) -> go.Figure:
+    def create_weight_per_reps_graph(self, exercise: Union[Exercise, ExerciseSeries], target_reps: int,
+                                     options: Optional[GraphOptions] = None) -> go.Figure:
         """
         Creates a graph showing the weight used for a specific number of reps over time for a given exercise.
 
-        :param exercise: The Exercise object containing weight and reps data.
+        :param exercise: The Exercise (or its ExerciseSeries) containing weight and reps data.
         :param target_reps: The specific number of reps to filter the data.
+        :param options: Optional date window, time buckets and point budget.
         :return: A Plotly Figure object.
         """
         try:
             # Extract data
-            times = [volume.ts for volume in exercise.volumes if volume.reps == target_reps]
-            weights = [volume.weight for volume in exercise.volumes if volume.reps == target_reps]
+            series = _window(_as_series(exercise), options).filter_reps(target_reps)
+            times, weights = _reduce(series, series.weights, options, default_agg="max")
 
             # Create the figure
             fig = go.Figure()
@@ -35,12 +81,7 @@ class GraphCreator:
                 title=f"Weight Over Time for {exercise.name} - {target_reps} Reps",
                 xaxis_title="Time",
                 yaxis_title="Weight (Kg)",
-                xaxis=dict(
-                    type='category',
-                    tickmode='array',
-                    tickvals=times,
-                    ticktext=times
-                ),
+                xaxis=dict(type='date'),
                 yaxis=dict(
                     tickmode='auto',
                     nticks=40  # Adjust this value to control the number of ticks
@@ -48,24 +89,26 @@ class GraphCreator:
                 template="plotly_dark"
             )
 
-            logger.info(f"Created weight per reps graph for {exercise.name} with target reps {target_reps}")
+            logger.info("Created weight per reps graph for %s with target reps %s", exercise.name, target_reps)
             return fig
         except Exception as e:
-            logger.error(f"Error creating weight per reps graph: {e}")
+            logger.error("Error creating weight per reps graph: %s", e)
             raise
 
-    def create_reps_per_weight_graph(self, exercise: Exercise, target_weight: int) -> go.Figure:
+    def create_reps_per_weight_graph(self, exercise: Union[Exercise, ExerciseSeries], target_weight: int,
+                                     options: Optional[GraphOptions] = None) -> go.Figure:
         """
         Creates a graph showing the reps performed for a specific weight over time for a given exercise.
 
-        :param exercise: The Exercise object containing weight and reps data.
+        :param exercise: The Exercise (or its ExerciseSeries) containing weight and reps data.
         :param target_weight: The specific weight to filter the data.
+        :param options: Optional date window, time buckets and point budget.
         :return: A Plotly Figure object.
         """
         try:
             # Extract data
-            times = [volume.ts for volume in exercise.volumes if volume.weight == target_weight]
-            reps = [volume.reps for volume in exercise.volumes if volume.weight == target_weight]
+            series = _window(_as_series(exercise), options).filter_weight(target_weight)
+            times, reps = _reduce(series, series.reps, options, default_agg="max")
 
             # Create the figure
             fig = go.Figure()
@@ -79,12 +122,7 @@ class GraphCreator:
                 title=f"Reps Over Time for {exercise.name} - {target_weight} Kg",
                 xaxis_title="Time",
                 yaxis_title="Reps",
-                xaxis=dict(
-                    type='category',
-                    tickmode='array',
-                    tickvals=times,
-                    ticktext=times
-                ),
+                xaxis=dict(type='date'),
                 yaxis=dict(
                     tickmode='auto',
                     nticks=40  # Adjust this value to control the number of ticks
@@ -92,23 +130,25 @@ class GraphCreator:
                 template="plotly_dark"
             )
 
-            logger.info(f"Created reps per weight graph for {exercise.name} with target weight {target_weight}")
+            logger.info("Created reps per weight graph for %s with target weight %s", exercise.name, target_weight)
             return fig
         except Exception as e:
-            logger.error(f"Error creating reps per weight graph: {e}")
+            logger.error("Error creating reps per weight graph: %s", e)
             raise
 
-    def create_volume_graph(self, exercise: Exercise) -> go.Figure:
+    def create_volume_graph(self, exercise: Union[Exercise, ExerciseSeries],
+                            options: Optional[GraphOptions] = None) -> go.Figure:
         """
         Creates a graph showing the volume (Reps x Kg) over time for a given exercise.
 
-        :param exercise: The Exercise object containing volume data.
+        :param exercise: The Exercise (or its ExerciseSeries) containing volume data.
+        :param options: Optional date window, time buckets and point budget.
         :return: A Plotly Figure object.
         """
         try:
             # Extract data
-            times = [volume.ts for volume in exercise.volumes]
-            volumes = [volume.weight * volume.reps for volume in exercise.volumes]
+            series = _window(_as_series(exercise), options)
+            times, volumes = _reduce(series, series.volumes(), options, default_agg="sum")
 
             # Create the figure
             fig = go.Figure()
@@ -121,11 +161,74 @@ class GraphCreator:
                 title=f"Volume Over Time for {exercise.name}",
                 xaxis_title="Time",
                 yaxis_title="Volume (Reps x Kg)",
+                xaxis=dict(type='date'),
+                template="plotly_dark"
+            )
+
+            logger.info("Created volume graph for %s", exercise.name)
+            return fig
+        except Exception as e:
+            logger.error("Error creating volume graph: %s", e)
+            raise
+
+    def create_multi_exercise_volume_graph(self, person: SheetPerson, exercise_names: Iterable[str],
+                                           options: Optional[GraphOptions] = None,
+                                           title: Optional[str] = None) -> go.Figure:
+        """
+        Creates one graph with a volume trace per selected exercise, sharing the same axes.
+        The exercises are picked in a single pass over the person's history.
+
+        :param person: The SheetPerson containing the exercises.
+        :param exercise_names: The names of the exercises to plot, compared after normalization.
+        :param options: Optional date window, time buckets and point budget.
+        :param title: The title of the graph, by default the list of exercises.
+        :return: A Plotly Figure object.
+        """
+        wanted = {normalize_string(name) for name in exercise_names}
+        return self._create_overlay_volume_graph(
+            person, lambda exercise: normalize_string(exercise.name) in wanted, options,
+            title or f"Volume Over Time for {', '.join(sorted(wanted))}")
+
+    def create_district_volume_graph(self, person: SheetPerson, district: str,
+                                     options: Optional[GraphOptions] = None) -> go.Figure:
+        """
+        Creates one graph with a volume trace for every exercise of a district the person performed.
+
+        :param person: The SheetPerson containing the exercises.
+        :param district: The district, as in DistrictExerciseMapper.district_to_exercises.
+        :param options: Optional date window, time buckets and point budget.
+        :return: A Plotly Figure object.
+        """
+        normalized_district = normalize_string(district)
+        district_exercises = set(self.mapper_district_exercise.get_exercise_by_district(district) or [])
+        return self._create_overlay_volume_graph(
+            person,
+            lambda exercise: (normalize_string(exercise.name) in district_exercises or
+                              normalize_string(exercise.district) == normalized_district),
+            options, f"Volume Over Time for {district}")
+
+    def _create_overlay_volume_graph(self, person: SheetPerson, selected, options: Optional[GraphOptions],
+                                     title: str) -> go.Figure:
+        try:
+            fig = go.Figure()
+            for exercise in person.exercises:
+                if not selected(exercise):
+                    continue
+                series = _window(_as_series(exercise), options)
+                times, volumes = _reduce(series, series.volumes(), options, default_agg="sum")
+                fig.add_trace(go.Scatter(x=times, y=volumes, mode='lines+markers', name=exercise.name))
+
+            fig.update_layout(
+                title=title,
+                xaxis_title="Time",
+                yaxis_title="Volume (Reps x Kg)",
+                xaxis=dict(type='date'),
+                hovermode="x unified",
                 template="plotly_dark"
             )
 
-            logger.info(f"Created volume graph for {exercise.name}")
+            logger.info("Created overlay volume graph for %s with %d exercises", person.name, len(fig.data))
             return fig
         except Exception as e:
-            logger.error(f"Error creating volume graph: {e}")
+            logger.error("Error creating overlay volume graph: %s", e)
             raise
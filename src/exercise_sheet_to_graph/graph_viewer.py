@@ -1,6 +1,7 @@
+from typing import List
 from exercise_sheet_to_graph.graph_creator import GraphCreator
 from exercise_sheet_to_graph.district_exercise_mapper import DistrictExerciseMapper
-from exercise_sheet_to_graph.models import Exercise
+from exercise_sheet_to_graph.models import Exercise, SheetPerson
 
 
 class GraphViewer:
@@ -37,3 +38,23 @@ class GraphViewer:
         """
         fig = self.graph_creator.create_reps_per_weight_graph(exercise, weight)
         fig.show()
+
+    def show_multi_exercise_volume_graph(self, person: SheetPerson, exercise_names: List[str]) -> None:
+        """
+        Displays one graph with the volume over time of several exercises.
+
+        :param person: The SheetPerson containing the exercises.
+        :param exercise_names: The names of the exercises to plot.
+        """
+        fig = self.graph_creator.create_multi_exercise_volume_graph(person, exercise_names)
+        fig.show()
+
+    def show_district_volume_graph(self, person: SheetPerson, district: str) -> None:
+        """
+        Displays one graph with the volume over time of every exercise of a district.
+
+        :param person: The SheetPerson containing the exercises.
+        :param district: The district to plot.
+        """
+        fig = self.graph_creator.create_district_volume_graph(person, district)
+        fig.show()
@@ -1,17 +1,45 @@
 import re
+import time
 import yaml
 from pathlib import Path
-from typing import Union, Tuple, Optional
+from typing import Union, Tuple, Optional, Iterator, Dict, Iterable, List, Any
 import exercise_sheet_to_graph.models as gm
-from exercise_sheet_to_graph.utils import get_logger
-from pydantic import ValidationError
+from exercise_sheet_to_graph.district_exercise_mapper import DistrictExerciseMapper
+from exercise_sheet_to_graph.metrics import metrics
+from exercise_sheet_to_graph.storage import Storage
+from exercise_sheet_to_graph.utils import get_logger, normalize_string, yaml_loader
+from pydantic import ValidationError, TypeAdapter
 
 logger = get_logger("sheet_to_graph")
 
+LINE_PATTERN = re.compile(r'(?P<exercise>[\w\s]+)\s+(?P<weight>\d+)kg\s*x\s*(?P<reps>\d+)')
+
+SUBMITTED_SETS = TypeAdapter(List[gm.SubmittedSet])
+
 
 class InfoGenerator:
-    def __init__(self):
-        pass
+    def __init__(self, mapper: Optional[DistrictExerciseMapper] = None):
+        """
+        Initializes the InfoGenerator.
+
+        :param mapper: If given, exercise names read from sheets are resolved to the canonical
+                       names and districts of its config.
+        """
+        self.mapper = mapper
+
+    def resolve_exercise(self, exercise_name: str, district: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Resolves a submitted exercise name to the canonical name of the mapper, so that the sets submitted
+        through the form and through the API end up in the same exercise.
+
+        :param exercise_name: The name of the exercise as submitted
+        :param district: The district submitted with it, if any, which takes precedence over the resolved one
+        :return: The name and district to save
+        """
+        resolution = self.mapper.resolve_exercise(exercise_name) if self.mapper else None
+        if resolution is None:
+            return exercise_name.strip(), district or ""
+        return resolution.exercise, district or resolution.district or ""
 
     def load_sheet_person_from_yaml(self, file: Union[Path, str]) -> Optional[gm.SheetPerson]:
         """
@@ -27,7 +55,7 @@ class InfoGenerator:
                 return None
 
             with open(file, 'r') as read_file:
-                data = yaml.safe_load(read_file)
+                data = yaml.load(read_file, Loader=yaml_loader())
 
             person = gm.SheetPerson.model_validate(data)
             return person
@@ -35,10 +63,10 @@ class InfoGenerator:
             logger.error("File not found")
             return None
         except yaml.YAMLError as e:
-            logger.error(f"Error loading file: {e}")
+            logger.error("Error loading file: %s", e)
             return None
         except ValidationError as e:
-            logger.error(f"Error validating data: {e}")
+            logger.error("Error validating data: %s", e)
             return None
 
     def load_sheet_person_from_exercises_file(self, name: str, file: Union[Path, str]) -> Optional[gm.SheetPerson]:
@@ -59,14 +87,159 @@ class InfoGenerator:
             logger.error("No file in input")
             return None
 
-        person = gm.SheetPerson(name=name, exercises=[])
         with open(file, "r") as read_file:
-            for line in read_file:
-                exercise = InfoGenerator._get_exercise(line=line)
-                if exercise:
-                    person.exercises.append(exercise)
+            rows = (row for row in map(InfoGenerator._parse_line_extended, read_file) if row)
+            exercises = InfoGenerator._group_rows(rows, self.mapper)
+
+        return gm.SheetPerson(name=name, exercises=list(exercises.values()))
+
+    def load_sheet_person_from_sets(self, name: str, sets: List[Any]) -> Tuple[Optional[gm.SheetPerson],
+                                                                                gm.SubmitReport]:
+        """
+        Validates a batch of submitted sets (e.g. buffered offline by a client) and groups them by exercise.
+        Invalid sets are rejected individually, the others are kept.
+
+        :param name: Name of the person
+        :param sets: The decoded JSON list of sets, each with name, weight, reps and optionally district and ts
+        :return: The SheetPerson with the accepted sets, or None if none was accepted, and a SubmitReport
+        """
+        report = gm.SubmitReport()
+        with metrics.stage("validate"):
+            submitted = InfoGenerator._validate_sets(sets, report)
+        if submitted is None:
+            return None, report
+        report.rejected = len(report.errors)
+        report.accepted = len(submitted)
+        if not submitted:
+            return None, report
+
+        exercises: Dict[str, gm.Exercise] = {}
+        for submitted_set in submitted:
+            exercise_name, district = self.resolve_exercise(submitted_set.name, submitted_set.district)
+            key = normalize_string(exercise_name)
+            exercise = exercises.get(key)
+            if exercise is None:
+                exercise = exercises[key] = gm.Exercise(name=exercise_name, district=district, volumes=[])
+            elif not exercise.district and submitted_set.district:
+                exercise.district = submitted_set.district
+            volume = (gm.Volume(weight=submitted_set.weight, reps=submitted_set.reps, ts=submitted_set.ts)
+                      if submitted_set.ts else gm.Volume(weight=submitted_set.weight, reps=submitted_set.reps))
+            exercise.add_volumes([volume])
+
+        report.exercises = len(exercises)
+        return gm.SheetPerson(name=name, exercises=list(exercises.values())), report
+
+    @staticmethod
+    def _validate_sets(sets: List[Any], report: gm.SubmitReport) -> Optional[List[gm.SubmittedSet]]:
+        """
+        Validates a batch of submitted sets, recording the errors of the invalid ones in the report.
+
+        :param sets: The decoded JSON list of sets
+        :param report: The SubmitReport receiving the errors, keyed by the index of the set
+        :return: The valid sets, or None if the payload itself is not a list of sets
+        """
+        try:
+            return SUBMITTED_SETS.validate_python(sets)
+        except ValidationError as e:
+            for error in e.errors():
+                index = error["loc"][0] if error["loc"] and isinstance(error["loc"][0], int) else -1
+                report.errors.setdefault(index, f"{'.'.join(map(str, error['loc'][1:]))}: {error['msg']}")
+            if -1 in report.errors:
+                # The payload itself is not a list
+                report.rejected = len(sets) if isinstance(sets, list) else 1
+                return None
+            # Only the valid sets are validated again
+            return SUBMITTED_SETS.validate_python([submitted_set for index, submitted_set in enumerate(sets)
+                                                   if index not in report.errors])
 
-        return person
+    def import_exercises_file(self, name: str, file: Union[Path, str], storage: Storage,
+                              batch_size: int = 1000) -> Optional[gm.ImportReport]:
+        """
+        Streams a (possibly very large) exercises file into a storage, saving the sets in batches
+        grouped by exercise, so memory use does not depend on the size of the file.
+        That holds for the storages with incremental saves, like SqliteStorage. A storage rewriting the whole
+        history on every save, like InfoSaver, gets all the sets in a single save instead, so that the import
+        stays linear; its memory use grows with the file.
+
+        :param name: Name of the person
+        :param file: Path to the file containing exercise data
+        :param storage: The storage the sets are written to
+        :param batch_size: Number of sets written at once to a storage with incremental saves
+        :return: An ImportReport with the line counts and the throughput
+        """
+        file = Path(file)
+        if not name:
+            logger.error("No Person name in input")
+            return None
+
+        if not file.is_file():
+            logger.error("No file in input")
+            return None
+
+        report = gm.ImportReport()
+        start = time.perf_counter()
+
+        def rows() -> Iterator[Tuple[str, int, int]]:
+            with open(file, "r") as read_file:
+                for line in read_file:
+                    report.lines += 1
+                    row = InfoGenerator._parse_line_extended(line)
+                    if row:
+                        report.accepted += 1
+                        yield row
+                    elif line.strip():
+                        report.rejected += 1
+
+        if not storage.incremental_saves:
+            batch_size = None
+        batch = []
+        for row in rows():
+            batch.append(row)
+            if batch_size is not None and len(batch) >= batch_size:
+                self._save_batch(name, batch, storage, self.mapper)
+                report.batches += 1
+                batch = []
+        if batch:
+            self._save_batch(name, batch, storage, self.mapper)
+            report.batches += 1
+
+        report.elapsed = time.perf_counter() - start
+        report.lines_per_sec = report.lines / report.elapsed if report.elapsed else 0
+        logger.info("Imported %s for %s: %s sets, %s rejected lines, %.0f lines/sec", file, name, report.accepted,
+                    report.rejected, report.lines_per_sec)
+        return report
+
+    @staticmethod
+    def _save_batch(name: str, batch: Iterable[Tuple[str, int, int]], storage: Storage,
+                    mapper: Optional[DistrictExerciseMapper] = None) -> None:
+        exercises = InfoGenerator._group_rows(batch, mapper)
+        storage.save_person(gm.SheetPerson(name=name, exercises=list(exercises.values())))
+
+    @staticmethod
+    def _group_rows(rows: Iterable[Tuple[str, int, int]],
+                    mapper: Optional[DistrictExerciseMapper] = None) -> Dict[str, gm.Exercise]:
+        """
+        Groups parsed rows into one Exercise per normalized exercise name, keeping the line order of the sets.
+
+        :param rows: Tuples of exercise name, weight and repetitions
+        :param mapper: If given, names it can resolve are replaced by the canonical name and district
+        :return: The exercises keyed by normalized (or canonical) name
+        """
+        exercises: Dict[str, gm.Exercise] = {}
+        keys: Dict[str, str] = {}
+        for exercise_name, weight, reps in rows:
+            normalized_name = normalize_string(exercise_name)
+            key = keys.get(normalized_name)
+            if key is None:
+                resolution = mapper.resolve_exercise(exercise_name) if mapper else None
+                # Different spellings of the same exercise share the canonical entry
+                key = keys[normalized_name] = resolution.exercise if resolution else normalized_name
+                if key not in exercises:
+                    exercises[key] = (gm.Exercise(name=resolution.exercise, district=resolution.district, volumes=[])
+                                      if resolution else gm.Exercise(name=exercise_name.strip(), volumes=[]))
+            exercise = exercises[key]
+            exercise.volumes.append(gm.Volume(weight=weight, reps=reps))
+        return exercises
 
     @staticmethod
     def _get_exercise(line: str) -> Optional[gm.Exercise]:
@@ -96,8 +269,7 @@ class InfoGenerator:
         if not line:
             return None
 
-        pattern = r'(?P<exercise>[\w\s]+)\s+(?P<weight>\d+)kg\s*x\s*(?P<reps>\d+)'
-        match = re.match(pattern, line)
+        match = LINE_PATTERN.match(line)
 
         if match:
             return match.group('exercise'), int(match.group('weight')), int(match.group('reps'))
@@ -1,39 +1,152 @@
-import json
+import threading
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
-from typing import Union
+from typing import Union, Iterable, List, Optional, Iterator, Tuple, Dict
+from exercise_sheet_to_graph import binary_format
+from exercise_sheet_to_graph.cache import LRUCache
+from exercise_sheet_to_graph.metrics import metrics
 from exercise_sheet_to_graph.models import SheetPerson, Exercise
-from exercise_sheet_to_graph.utils import get_logger
+from exercise_sheet_to_graph.storage import Storage
+from exercise_sheet_to_graph.series import datetime_to_epoch_us
+from exercise_sheet_to_graph.utils import get_logger, normalize_string, file_lock, atomic_write_bytes
 
 logger = get_logger("sheet_to_graph")
 
+SNAPSHOT_SUFFIXES = {"json": ".json", "binary": ".bin"}
+
 
 def find_exercise_by_name(person: SheetPerson, exercise_name: str) -> Union[Exercise, None]:
     """
     Finds an exercise by name in a given SheetPerson's exercises.
 
     :param person: The SheetPerson object containing exercises.
-    :param exercise_name: The name of the exercise to find.
+    :param exercise_name: The name of the exercise to find, compared after normalization.
     :return: The Exercise object if found, otherwise None.
     """
+    normalized_name = normalize_string(exercise_name)
     for exercise in person.exercises:
-        if exercise.name == exercise_name:
+        if normalize_string(exercise.name) == normalized_name:
             return exercise
     return None
 
 
-class InfoSaver:
-    def __init__(self, base_dir: Path):
+class InfoSaver(Storage):
+    # Snapshots are rewritten whole, and appends are merged into the cached history
+    incremental_saves = False
+
+    def __init__(self, base_dir: Path, append_log: bool = False, compact_threshold: int = 200,
+                 cache_size: int = 128, cache_max_bytes: Optional[int] = None, snapshot_format: str = "json"):
         """
         Initializes the InfoSaver with a base directory.
 
         :param base_dir: The base directory where data will be saved.
+        :param append_log: If True, new submissions are appended to a per-person JSON Lines log
+                           instead of rewriting the whole JSON snapshot.
+        :param compact_threshold: Number of log entries after which the log is compacted into the snapshot.
+        :param cache_size: Number of parsed SheetPerson objects kept in memory, 0 disables the cache.
+        :param cache_max_bytes: Optional bound on the cache, measured as the size of the cached files.
+        :param snapshot_format: "json" for the JSON snapshots, or "binary" for the compact columnar
+                                snapshots of binary_format. A binary InfoSaver still reads the JSON
+                                snapshot of a person until its next save replaces it.
         """
+        if snapshot_format not in SNAPSHOT_SUFFIXES:
+            raise ValueError(f"Unknown snapshot format {snapshot_format}, expected one of {list(SNAPSHOT_SUFFIXES)}")
+        super().__init__()
         self.base_dir = Path(base_dir)
         self.base_dir.mkdir(parents=True, exist_ok=True)
+        self.append_log = append_log
+        self.compact_threshold = compact_threshold
+        self.cache = LRUCache(max_entries=cache_size, max_bytes=cache_max_bytes) if cache_size > 0 else None
+        self.snapshot_format = snapshot_format
+        # Number of entries of each append log, valid while the log keeps the stamp it is stored with
+        self._log_entries: Dict[str, Tuple[Optional[Tuple], int]] = {}
+        # Names whose lock the current thread holds, see _person_lock
+        self._held_locks = threading.local()
+
+    @staticmethod
+    def _file_key(name: str) -> str:
+        return name.replace(' ', '_')
+
+    def _snapshot_path(self, name: str, snapshot_format: Optional[str] = None) -> Path:
+        suffix = SNAPSHOT_SUFFIXES[snapshot_format or self.snapshot_format]
+        return self.base_dir / f"{InfoSaver._file_key(name)}{suffix}"
+
+    def _existing_snapshot_path(self, name: str) -> Optional[Path]:
+        """
+        Finds the snapshot to read: the one in the configured format, otherwise one in another format.
+
+        :param name: The name of the person.
+        :return: The path of a non-empty snapshot, or None if the person has none.
+        """
+        for snapshot_format in [self.snapshot_format, *SNAPSHOT_SUFFIXES]:
+            path = self._snapshot_path(name, snapshot_format)
+            if path.exists() and path.stat().st_size > 0:
+                return path
+        return None
+
+    def _log_path(self, name: str) -> Path:
+        return self.base_dir / f"{InfoSaver._file_key(name)}.jsonl"
+
+    def _lock_path(self, name: str) -> Path:
+        return self.base_dir / f"{InfoSaver._file_key(name)}.lock"
+
+    def _file_stamp(self, name: str) -> Tuple:
+        """
+        Identifies the current on-disk version of a person by inode, mtime and size of its files.
+
+        :param name: The name of the person.
+        :return: A hashable stamp that changes whenever the snapshot or the log is written.
+        """
+        stamp = []
+        snapshot_paths = [self._snapshot_path(name, snapshot_format) for snapshot_format in SNAPSHOT_SUFFIXES]
+        for path in (*snapshot_paths, self._log_path(name)):
+            try:
+                stat = path.stat()
+                stamp.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    @staticmethod
+    def _path_stamp(path: Path) -> Optional[Tuple]:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _cache_person(self, person: SheetPerson) -> None:
+        if self.cache is None:
+            return
+        stamp = self._file_stamp(person.name)
+        size = sum(part[2] for part in stamp if part)
+        self.cache.put(InfoSaver._file_key(person.name), person, size=size, version=stamp)
+
+    @contextmanager
+    def _person_lock(self, name: str, shared: bool = False) -> Iterator[None]:
+        """
+        Holds an advisory lock on the files of a single person, so that saves of
+        different people never wait for each other. The lock is reentrant within a thread,
+        so the save listeners, which run under it, can load the person they are notified about.
+
+        :param name: The name of the person to lock.
+        :param shared: If True, takes a shared (read) lock instead of an exclusive one.
+        """
+        held = self._held_locks.__dict__.setdefault("names", set())
+        if name in held:
+            yield
+            return
+        with file_lock(self._lock_path(name), shared=shared):
+            held.add(name)
+            try:
+                yield
+            finally:
+                held.discard(name)
 
     def save_person(self, info_person: SheetPerson) -> None:
         """
-        Saves a SheetPerson's information to a JSON file.
+        Saves a SheetPerson's information to its snapshot file.
 
         :param info_person: The SheetPerson object to save.
         """
@@ -41,20 +154,39 @@ class InfoSaver:
             logger.error("No person inserted")
             return
 
-        name_to_save = info_person.name.replace(" ", "_")
-        file_path = self.base_dir / f"{name_to_save}.json"
+        # The listeners get the sets actually added, without those already saved
+        added = list(info_person.exercises)
+        if self.cache is not None:
+            # The saved objects end up in the cache, keep them apart from the caller's ones
+            info_person = info_person.model_copy(deep=True)
 
-        if file_path.exists():
-            info_person = self._merge_data(info_person) or info_person
+        with self._person_lock(info_person.name):
+            try:
+                if self.append_log:
+                    added = self._append_to_log(info_person)
+                else:
+                    if (self._existing_snapshot_path(info_person.name)
+                            or self._log_path(info_person.name).exists()):
+                        merged = self._merge_data(info_person)
+                        if merged:
+                            info_person, added = merged
 
-        with open(file_path, 'w') as to_write:
-            json.dump(info_person.model_dump(), to_write)
+                    self._write_snapshot(info_person)
+                    self._cache_person(info_person)
+            except BaseException:
+                if self.cache is not None:
+                    self.cache.pop(InfoSaver._file_key(info_person.name))
+                raise
 
-        logger.info(f"Person {info_person.name} saved")
+            logger.info("Person %s saved", info_person.name)
+            # Under the lock, so that the listeners hear about the saves of a person in the order they were written
+            self._notify(info_person.name, added)
 
     def load_person(self, name: str) -> Union[SheetPerson, None]:
         """
-        Loads a SheetPerson's information from a JSON file.
+        Loads a SheetPerson's information from its snapshot file, replaying the append log if present.
+        Unchanged histories are served from the in-memory cache, so the returned object
+        is shared and must be treated as read-only.
 
         :param name: The name of the person to load.
         :return: The SheetPerson object if found, otherwise None.
@@ -63,40 +195,341 @@ class InfoSaver:
             logger.error("No name inserted")
             return None
 
-        name_to_save = name.replace(" ", "_")
-        file_path = self.base_dir / f"{name_to_save}.json"
+        with self._person_lock(name, shared=True):
+            return self._read_person(name)
+
+    def _read_person(self, name: str) -> Union[SheetPerson, None]:
+        """
+        Reads the snapshot and the append log of a person; the caller must hold the person lock.
+
+        :param name: The name of the person to load.
+        :return: The SheetPerson object if found, otherwise None.
+        """
+        if self.cache is not None:
+            person = self.cache.get(InfoSaver._file_key(name), version=self._file_stamp(name))
+            if person is not None:
+                return person
+
+        file_path = self._existing_snapshot_path(name)
+        log_path = self._log_path(name)
 
-        if file_path.exists() and file_path.stat().st_size > 0:
-            with open(file_path, 'r') as read_file:
-                data = json.load(read_file)
-                return SheetPerson.model_validate(data)
+        person = None
+        if file_path is not None:
+            with metrics.stage("load_snapshot"):
+                if file_path.suffix == SNAPSHOT_SUFFIXES["binary"]:
+                    person = binary_format.read_person(file_path)
+                else:
+                    with open(file_path, 'r') as read_file:
+                        person = SheetPerson.model_validate_json(read_file.read())
+
+        if log_path.exists():
+            log_stamp = InfoSaver._path_stamp(log_path)
+            person, entries = self._replay_log(person, log_path)
+            self._log_entries[InfoSaver._file_key(name)] = (log_stamp, entries)
+
+        if person is None:
+            logger.error("File for %s not found, check the name of the person", name)
         else:
-            logger.error(f"File for {name} not found, check the name of the person")
+            self._cache_person(person)
+        return person
+
+    def load_exercise(self, name: str, exercise_name: str,
+                      reps: Optional[int] = None, weight: Optional[float] = None,
+                      start: Optional[datetime] = None, end: Optional[datetime] = None) -> Union[Exercise, None]:
+        """
+        Loads a single exercise of a person, optionally keeping only the sets with the given reps or weight.
+
+        :param name: The name of the person.
+        :param exercise_name: The name of the exercise.
+        :param reps: If given, only the sets with this number of reps are returned.
+        :param weight: If given, only the sets with this weight are returned.
+        :param start: If given, only the sets performed at or after this time are returned.
+        :param end: If given, only the sets performed at or before this time are returned.
+        :return: The Exercise object if found, otherwise None.
+        """
+        if not name:
+            logger.error("No name inserted")
+            return None
+
+        with self._person_lock(name, shared=True):
+            exercise = self._read_exercise(name, exercise_name, start, end)
+        if not exercise:
+            return None
+
+        volumes = [volume for volume in exercise.between(start, end)
+                   if (reps is None or volume.reps == reps) and (weight is None or volume.weight == weight)]
+        return Exercise(name=exercise.name, district=exercise.district, volumes=volumes)
+
+    def _read_exercise(self, name: str, exercise_name: str,
+                       start: Optional[datetime], end: Optional[datetime]) -> Union[Exercise, None]:
+        """
+        Reads one exercise; the caller must hold the person lock. A binary snapshot without a pending
+        log is read directly, decoding only the exercise and the sets in the window, unless the
+        person is already cached.
+
+        :param name: The name of the person.
+        :param exercise_name: The name of the exercise.
+        :param start: If given, sets performed before this time may be left out.
+        :param end: If given, sets performed after this time may be left out.
+        :return: The Exercise object if found, otherwise None.
+        """
+        file_path = self._existing_snapshot_path(name)
+        cached = self.cache is not None and InfoSaver._file_key(name) in self.cache
+        if (not cached and file_path is not None and file_path.suffix == SNAPSHOT_SUFFIXES["binary"]
+                and not self._log_path(name).exists()):
+            return binary_format.read_exercise(file_path, exercise_name,
+                                               start_us=datetime_to_epoch_us(start) if start else None,
+                                               end_us=datetime_to_epoch_us(end) if end else None)
+
+        person = self._read_person(name)
+        if not person:
             return None
+        return find_exercise_by_name(person, exercise_name)
 
-    def _merge_data(self, person_to_save: SheetPerson) -> Union[SheetPerson, None]:
+    def data_version(self, name: str) -> Optional[Tuple[str, float]]:
+        """
+        Returns an opaque tag derived from the snapshot and log files of a person,
+        together with the time of the last write.
+
+        :param name: The name of the person.
+        :return: A (tag, last modified epoch seconds) tuple, or None if the person does not exist.
+        """
+        stamp = self._file_stamp(name)
+        if not any(stamp):
+            return None
+
+        tag = "-".join(f"{inode:x}.{mtime:x}.{size:x}" for inode, mtime, size in filter(None, stamp))
+        last_modified = max(mtime for _, mtime, _ in filter(None, stamp)) / 1e9
+        return tag, last_modified
+
+    def compact(self, name: str) -> None:
+        """
+        Folds the append log of a person into the snapshot and removes the log.
+
+        :param name: The name of the person to compact.
+        """
+        with self._person_lock(name):
+            self._compact(name)
+
+    def _compact(self, name: str) -> None:
+        log_path = self._log_path(name)
+        if not log_path.exists():
+            return
+
+        person = self._read_person(name)
+        if person:
+            self._write_snapshot(person)
+        log_path.unlink()
+        self._log_entries.pop(InfoSaver._file_key(name), None)
+        if person:
+            self._cache_person(person)
+        logger.info("Compacted log for %s", name)
+
+    def _encode_snapshot(self, info_person: SheetPerson) -> bytes:
+        with metrics.stage("dump"):
+            if self.snapshot_format == "binary":
+                return binary_format.dumps(info_person)
+            return info_person.model_dump_json().encode()
+
+    def _write_snapshot(self, info_person: SheetPerson, data: Optional[bytes] = None) -> None:
+        """
+        Writes the snapshot to a temporary file and atomically renames it over the old one,
+        so readers and crashes never observe a truncated file.
+
+        :param info_person: The SheetPerson object to write.
+        :param data: The already encoded snapshot, if available.
+        """
+        atomic_write_bytes(self._snapshot_path(info_person.name),
+                           data if data is not None else self._encode_snapshot(info_person))
+        # The snapshot now holds the whole history, a snapshot left in another format is stale
+        for snapshot_format in SNAPSHOT_SUFFIXES:
+            if snapshot_format != self.snapshot_format:
+                self._snapshot_path(info_person.name, snapshot_format).unlink(missing_ok=True)
+
+    def convert(self, name: str) -> bool:
+        """
+        Rewrites the history of a person in the snapshot format of this InfoSaver, folding in the
+        append log. The new snapshot is decoded and compared with the history before the old
+        files are removed, so a conversion never loses data.
+
+        :param name: The name of the person to convert.
+        :return: True if the person was converted, False if there was nothing to convert.
+        :raises ValueError: If the converted snapshot does not decode to the same history.
+        """
+        with self._person_lock(name):
+            source_path = self._existing_snapshot_path(name)
+            log_path = self._log_path(name)
+            if not log_path.exists() and (source_path is None or source_path == self._snapshot_path(name)):
+                return False
+
+            person = self._read_person(name)
+            if person is None:
+                return False
+
+            data = self._encode_snapshot(person)
+            if self.snapshot_format == "binary":
+                converted = binary_format.loads(data)
+            else:
+                converted = SheetPerson.model_validate_json(data)
+            if converted.model_dump() != person.model_dump():
+                raise ValueError(f"Converted snapshot of {name} does not match its history")
+
+            self._write_snapshot(person, data)
+            log_path.unlink(missing_ok=True)
+            self._log_entries.pop(InfoSaver._file_key(name), None)
+            self._cache_person(person)
+        logger.info("Converted %s to the %s format", name, self.snapshot_format)
+        return True
+
+    def _append_to_log(self, info_person: SheetPerson) -> List[Exercise]:
+        """
+        Appends a submission as one JSON line, compacting once the log grows past the threshold.
+        The cost does not depend on the size of the history: when the person is cached, the new sets are
+        merged into the cached copy, otherwise they are only told apart from those of the log, which the
+        threshold bounds. In that case sets already compacted into the snapshot are reported again.
+
+        :param info_person: The SheetPerson object holding only the new exercises.
+        :return: The exercises holding the sets that were not saved yet.
+        """
+        key = InfoSaver._file_key(info_person.name)
+        log_path = self._log_path(info_person.name)
+        log_stamp = InfoSaver._path_stamp(log_path)
+        stamp, entries = self._log_entries.get(key, (None, None))
+        if stamp != log_stamp:
+            entries = None
+
+        current = None
+        if self.cache is not None:
+            current = self.cache.get(key, version=self._file_stamp(info_person.name))
+        if current is not None:
+            current, added = InfoSaver._merged_copy(current, info_person.exercises)
+        elif log_stamp is not None:
+            logged, entries = self._replay_log(None, log_path)
+            added = (InfoSaver._merged_copy(logged, info_person.exercises)[1] if logged
+                     else list(info_person.exercises))
+        else:
+            added = list(info_person.exercises)
+            entries = 0
+            if not self._existing_snapshot_path(info_person.name):
+                # A new person, the submission is the whole history
+                current = info_person
+
+        with open(log_path, 'a') as to_append:
+            to_append.write(info_person.model_dump_json() + "\n")
+        if current is not None:
+            self._cache_person(current)
+
+        if entries is None:
+            # Only when the log was written by another process since this one last saw it
+            with open(log_path, 'rb') as read_log:
+                entries = sum(1 for _ in read_log)
+        else:
+            entries += 1
+        self._log_entries[key] = (InfoSaver._path_stamp(log_path), entries)
+        if entries >= self.compact_threshold:
+            self._compact(info_person.name)
+        return added
+
+    def _replay_log(self, person: Union[SheetPerson, None], log_path: Path) -> Tuple[Union[SheetPerson, None], int]:
+        """
+        Applies every entry of an append log on top of a snapshot.
+
+        :param person: The snapshot SheetPerson, or None if no snapshot exists yet.
+        :param log_path: Path of the JSON Lines log.
+        :return: The SheetPerson with every logged submission merged in, and the number of lines of the log.
+        """
+        entries = 0
+        with open(log_path, 'r') as read_log:
+            for line in read_log:
+                entries += 1
+                if not line.strip():
+                    continue
+                try:
+                    entry = SheetPerson.model_validate_json(line)
+                except ValueError as e:
+                    logger.error("Skipping corrupted log entry in %s: %s", log_path, e)
+                    continue
+                if person is None:
+                    person = entry
+                else:
+                    InfoSaver._merge_exercises(person, entry.exercises)
+        return person, entries
+
+    def _merge_data(self, person_to_save: SheetPerson) -> Optional[Tuple[SheetPerson, List[Exercise]]]:
         """
         Merges new exercise data with existing data for a SheetPerson.
 
         :param person_to_save: The SheetPerson object with new data to merge.
-        :return: The merged SheetPerson object if successful, otherwise None.
+        :return: The merged SheetPerson with the exercises holding the added sets if successful, otherwise None.
         """
-        saved_person = self.load_person(person_to_save.name)
+        saved_person = self._read_person(person_to_save.name)
 
         if not saved_person or not saved_person.name:
-            logger.error(f"{person_to_save.name} not found")
+            logger.error("%s not found", person_to_save.name)
             return None
 
-        not_founded = []
+        with metrics.stage("merge"):
+            return InfoSaver._merged_copy(saved_person, person_to_save.exercises)
 
-        for exercise in person_to_save.exercises:
-            matching_exercise = find_exercise_by_name(saved_person, exercise.name)
-            if matching_exercise:
-                matching_exercise.volumes.append(exercise.volumes[0])
-                logger.info(f"{exercise.name} found in {saved_person.name}")
-            else:
-                not_founded.append(exercise)
+    @staticmethod
+    def _merged_copy(saved_person: SheetPerson, exercises: Iterable[Exercise]) -> Tuple[SheetPerson, List[Exercise]]:
+        """
+        Merges exercises into a copy of a saved SheetPerson, leaving the original untouched: it may be the cached
+        object that load_person hands out, which readers must never see half-merged or before it is persisted.
+        Only the lists that change are copied, the sets themselves are shared.
+
+        :param saved_person: The saved SheetPerson.
+        :param exercises: The exercises to merge into it.
+        :return: The merged copy, with the exercises holding the added sets.
+        """
+        exercises = list(exercises)
+        keys = {normalize_string(exercise.name) for exercise in exercises}
+        merged = saved_person.model_copy(update={"exercises": [
+            exercise.model_copy(update={"volumes": list(exercise.volumes)})
+            if normalize_string(exercise.name) in keys else exercise
+            for exercise in saved_person.exercises
+        ]})
+        return merged, InfoSaver._merge_exercises(merged, exercises)
+
+    @staticmethod
+    def _merge_exercises(saved_person: SheetPerson, exercises: Iterable[Exercise]) -> List[Exercise]:
+        """
+        Merges exercises into a saved SheetPerson in place. Exercises are matched on their normalized
+        name through an index built once per merge, and sets already saved with the same
+        (ts, weight, reps) are skipped, so importing the same data twice does not duplicate it.
+
+        :param saved_person: The SheetPerson to update.
+        :param exercises: The exercises to merge into it.
+        :return: The exercises holding only the sets that were added, for the save listeners.
+        """
+        index = {normalize_string(exercise.name): exercise for exercise in reversed(saved_person.exercises)}
+        saved_sets = {}
+        added = []
+        new_keys = set()
+
+        for exercise in exercises:
+            key = normalize_string(exercise.name)
+            matching_exercise = index.get(key)
+            if matching_exercise is None:
+                index[key] = exercise
+                saved_sets[key] = set()
+                saved_person.exercises.append(exercise)
+                added.append(exercise)
+                new_keys.add(key)
+                continue
 
-        saved_person.exercises.extend(not_founded)
+            seen = saved_sets.get(key)
+            if seen is None:
+                # Only the sets saved before this merge count, repeated sets within a submission are legitimate
+                seen = saved_sets[key] = {(volume.ts, volume.weight, volume.reps)
+                                          for volume in matching_exercise.volumes}
+            new_volumes = [volume for volume in exercise.volumes if (volume.ts, volume.weight, volume.reps) not in seen]
+            if not new_volumes:
+                continue
+            if key not in new_keys:
+                # Exercises new to this merge are reported whole, with the sets added to them later on
+                added.append(Exercise(name=matching_exercise.name, district=matching_exercise.district,
+                                      volumes=list(new_volumes)))
+            matching_exercise.add_volumes(new_volumes)
 
-        return saved_person
+        return added
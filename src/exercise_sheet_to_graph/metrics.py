@@ -0,0 +1,254 @@
+import cProfile
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from exercise_sheet_to_graph.utils import get_logger
+
+logger = get_logger("sheet_to_graph")
+
+NAMESPACE = "sheet_to_graph"
+# Upper bounds in seconds, from sub-millisecond dict lookups to multi-second plots of whole histories
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HELP = {
+    "stage_seconds": "Time spent in the hot-path stages of a request.",
+    "request_seconds": "Time spent serving a Flask request.",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: Sequence[float]):
+        """
+        Counts observations in fixed buckets, like a Prometheus histogram.
+
+        :param buckets: The increasing upper bounds of the buckets; a +Inf bucket is implied.
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """
+        Returns the cumulative count of every bucket, keyed by its formatted upper bound.
+        """
+        total = 0
+        result = []
+        for bound, count in zip([*map(repr, self.buckets), "+Inf"], self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class Metrics:
+    def __init__(self, enabled: bool = True, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Thread-safe registry of timing histograms and gauges, rendered in the Prometheus text format.
+        Recording can be switched off at runtime, after which timers cost a single attribute check.
+
+        :param enabled: If False, observations are dropped until enabled is set.
+        :param buckets: The upper bounds in seconds of the histogram buckets.
+        """
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._gauge_sources: Dict[str, Callable[[], Dict[str, float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        """
+        Records a duration in the histogram of a metric.
+
+        :param name: The metric name, without the namespace, e.g. "stage_seconds".
+        :param seconds: The observed duration.
+        :param labels: The labels of the series, e.g. stage="merge".
+        """
+        if not self.enabled:
+            return
+        key = tuple(sorted((key, str(value)) for key, value in labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        """
+        Records the duration of the block, also when it raises.
+
+        :param name: The metric name, without the namespace.
+        :param labels: The labels of the series.
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def stage(self, stage: str):
+        """
+        Times a hot-path stage, e.g. "merge" or "plotly_json", in the stage_seconds histogram.
+
+        :param stage: The name of the stage.
+        """
+        return self.timer("stage_seconds", stage=stage)
+
+    def add_gauges(self, prefix: str, source: Callable[[], Dict[str, float]]) -> None:
+        """
+        Registers a callable whose counters are exported as gauges named <prefix>_<key> on every render.
+
+        :param prefix: The prefix of the gauge names, e.g. "write_behind".
+        :param source: A callable returning a dictionary of numbers, e.g. WriteBehindStorage.stats.
+        """
+        with self._lock:
+            self._gauge_sources[prefix] = source
+
+    def snapshot(self, name: str) -> Dict[Labels, Tuple[int, float]]:
+        """
+        Returns the count and sum of every series of a histogram.
+
+        :param name: The metric name, without the namespace.
+        :return: A (count, sum) tuple per label set.
+        """
+        with self._lock:
+            return {labels: (histogram.count, histogram.sum)
+                    for labels, histogram in self._histograms.get(name, {}).items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self) -> str:
+        """
+        Renders every histogram and gauge in the Prometheus text exposition format.
+
+        :return: The text of the /metrics page.
+        """
+        lines = []
+        with self._lock:
+            histograms = {name: {labels: (histogram.cumulative(), histogram.count, histogram.sum)
+                                 for labels, histogram in series.items()}
+                          for name, series in self._histograms.items()}
+            gauge_sources = dict(self._gauge_sources)
+
+        for name, series in sorted(histograms.items()):
+            metric = f"{NAMESPACE}_{name}"
+            lines.append(f"# HELP {metric} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {metric} histogram")
+            for labels, (buckets, count, total) in sorted(series.items()):
+                for bound, cumulative in buckets:
+                    bound_label = f'le="{bound}"'
+                    lines.append(f"{metric}_bucket{_format_labels(labels, bound_label)} {cumulative}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {total!r}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+
+        for prefix, source in sorted(gauge_sources.items()):
+            try:
+                values = source()
+            except Exception as e:
+                logger.error("Error reading the %s gauges: %s", prefix, e)
+                continue
+            for key, value in sorted(values.items()):
+                metric = _metric_name(f"{NAMESPACE}_{prefix}_{key}")
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {float(value)!r}")
+
+        lines.append(f"# TYPE {NAMESPACE}_metrics_enabled gauge")
+        lines.append(f"{NAMESPACE}_metrics_enabled {int(self.enabled)}")
+        return "\n".join(lines) + "\n"
+
+
+class OutlierProfiler:
+    def __init__(self, profile_dir: Union[Path, str], sample_rate: float = 0.0, threshold: float = 1.0):
+        """
+        Profiles a random sample of requests with cProfile and keeps the profile of those slower than a threshold,
+        so the outliers can be inspected with pstats or snakeviz. One request is profiled at a time.
+
+        :param profile_dir: The directory the .prof files are written to.
+        :param sample_rate: The fraction of requests profiled, 0 disables profiling.
+        :param threshold: The duration in seconds above which a profiled request is dumped.
+        """
+        self.profile_dir = Path(profile_dir)
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.dumps = 0
+        self._active = threading.Lock()
+
+    def start(self) -> Optional[cProfile.Profile]:
+        """
+        Starts profiling the current request if it is sampled.
+
+        :return: The running profiler, to be passed to stop, or None if the request is not profiled.
+        """
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        if not self._active.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already running in this interpreter
+            self._active.release()
+            return None
+        return profile
+
+    def stop(self, profile: cProfile.Profile, elapsed: float, name: str) -> Optional[Path]:
+        """
+        Stops a profiler returned by start and dumps it if the request was an outlier.
+
+        :param profile: The profiler returned by start.
+        :param elapsed: The duration of the request in seconds.
+        :param name: A name for the dump, e.g. the endpoint.
+        :return: The path of the dump, or None if the request was fast enough.
+        """
+        try:
+            profile.disable()
+        finally:
+            self._active.release()
+        if elapsed < self.threshold:
+            return None
+
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        path = self.profile_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{_metric_name(name)}-{elapsed * 1000:.0f}ms.prof"
+        profile.dump_stats(path)
+        self.dumps += 1
+        logger.info("Slow request %s took %.0f ms, profile written to %s", name, elapsed * 1000, path)
+        return path
+
+
+# Registry shared by the modules of the package and exposed by the app on /metrics
+metrics = Metrics()
@@ -0,0 +1,91 @@
+import argparse
+from pathlib import Path
+from typing import Union, Iterator, Optional, List
+from exercise_sheet_to_graph.infogenerator import InfoGenerator
+from exercise_sheet_to_graph.infosaver import InfoSaver, SNAPSHOT_SUFFIXES
+from exercise_sheet_to_graph.models import SheetPerson
+from exercise_sheet_to_graph.sqlite_storage import SqliteStorage
+from exercise_sheet_to_graph.storage import Storage
+from exercise_sheet_to_graph.utils import get_logger
+
+logger = get_logger("sheet_to_graph")
+
+
+def iter_people(source_dir: Union[Path, str]) -> Iterator[SheetPerson]:
+    """
+    Yields every SheetPerson stored in a directory of InfoSaver snapshots (and their logs) and YAML dumps.
+
+    :param source_dir: The directory to read.
+    :return: An iterator over the SheetPerson objects found.
+    """
+    source_dir = Path(source_dir)
+    info_saver = InfoSaver(source_dir)
+    info_generator = InfoGenerator()
+
+    for name in _snapshot_names(source_dir):
+        person = info_saver.load_person(name)
+        if person:
+            yield person
+
+    for file in sorted(source_dir.iterdir()):
+        if file.suffix in (".yaml", ".yml"):
+            person = info_generator.load_sheet_person_from_yaml(file)
+            if person:
+                yield person
+
+
+def _snapshot_names(source_dir: Path) -> List[str]:
+    suffixes = {*SNAPSHOT_SUFFIXES.values(), ".jsonl"}
+    return sorted({file.stem for file in source_dir.iterdir() if file.suffix in suffixes})
+
+
+def import_directory(source_dir: Union[Path, str], storage: Storage) -> int:
+    """
+    Bulk-imports a directory of JSON and YAML files into a storage backend.
+
+    :param source_dir: The directory to read.
+    :param storage: The storage to import into.
+    :return: The number of people imported.
+    """
+    imported = 0
+    for person in iter_people(source_dir):
+        storage.save_person(person)
+        imported += 1
+    logger.info("Imported %s people from %s", imported, source_dir)
+    return imported
+
+
+def convert_directory(source_dir: Union[Path, str], snapshot_format: str = "binary") -> int:
+    """
+    Converts in place every InfoSaver snapshot of a directory to the given format.
+
+    :param source_dir: The directory to convert.
+    :param snapshot_format: The target format, "json" or "binary".
+    :return: The number of people converted.
+    """
+    source_dir = Path(source_dir)
+    info_saver = InfoSaver(source_dir, cache_size=0, snapshot_format=snapshot_format)
+    converted = sum(info_saver.convert(name) for name in _snapshot_names(source_dir))
+    logger.info("Converted %s people in %s to the %s format", converted, source_dir, snapshot_format)
+    return converted
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Import a db/ directory of JSON and YAML files into SQLite, "
+                                                 "or convert its snapshots to another format.")
+    parser.add_argument("source_dir", type=Path, help="Directory containing the JSON and YAML files")
+    parser.add_argument("db_path", type=Path, nargs="?", help="SQLite database to create or update")
+    parser.add_argument("--convert", choices=sorted(SNAPSHOT_SUFFIXES),
+                        help="Convert the snapshots of source_dir in place instead of importing them")
+    args = parser.parse_args(argv)
+
+    if args.convert:
+        convert_directory(args.source_dir, args.convert)
+    elif args.db_path:
+        import_directory(args.source_dir, SqliteStorage(args.db_path))
+    else:
+        parser.error("db_path is required unless --convert is given")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,40 @@
-from typing import List
+import bisect
+from collections.abc import Sequence
+from typing import List, Dict, Optional, Literal, Iterable
 from datetime import datetime
+from operator import attrgetter
 import pydantic
 
+volume_ts = attrgetter("ts")
+
+
+def to_local_naive(ts: Optional[datetime]) -> Optional[datetime]:
+    # Timestamps are compared and sorted as naive local times, like datetime.now() returns them
+    return ts.astimezone().replace(tzinfo=None) if ts is not None and ts.tzinfo else ts
+
+
+class _Timestamps(Sequence):
+    # The timestamps of a list of volumes without copying them, as bisect only takes key= from Python 3.10
+    def __init__(self, volumes: List["Volume"]):
+        self.volumes = volumes
+
+    def __len__(self) -> int:
+        return len(self.volumes)
+
+    def __getitem__(self, index):
+        return self.volumes[index].ts
+
 
 class Volume(pydantic.BaseModel):
     weight: float = 0
     reps: int = 0
-    ts: str = str(datetime.now())
+    # Also reads the str(datetime) strings of older files and dumps
+    ts: datetime = pydantic.Field(default_factory=datetime.now)
+
+    @pydantic.field_validator("ts")
+    @classmethod
+    def _local_naive(cls, ts: datetime) -> datetime:
+        return to_local_naive(ts)
 
 
 class Exercise(pydantic.BaseModel):
@@ -14,6 +42,38 @@ class Exercise(pydantic.BaseModel):
     district: str = ""
     volumes: List[Volume] = []
 
+    @pydantic.field_validator("volumes")
+    @classmethod
+    def _time_sorted(cls, volumes: List[Volume]) -> List[Volume]:
+        # Stable, and linear on the already sorted lists of saved files
+        volumes.sort(key=volume_ts)
+        return volumes
+
+    def add_volumes(self, volumes: Iterable[Volume]) -> None:
+        """
+        Adds sets keeping the volumes sorted by timestamp.
+
+        :param volumes: The sets to add, in any order.
+        """
+        for volume in volumes:
+            if not self.volumes or volume.ts >= self.volumes[-1].ts:
+                self.volumes.append(volume)
+            else:
+                self.volumes.insert(bisect.bisect_right(_Timestamps(self.volumes), volume.ts), volume)
+
+    def between(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Volume]:
+        """
+        Returns the sets with start <= ts <= end with a binary search on the sorted volumes.
+
+        :param start: The first timestamp included, or None for no lower bound.
+        :param end: The last timestamp included, or None for no upper bound.
+        :return: The sets in the range, in chronological order.
+        """
+        timestamps = _Timestamps(self.volumes)
+        low = bisect.bisect_left(timestamps, start) if start else 0
+        high = bisect.bisect_right(timestamps, end) if end else len(self.volumes)
+        return self.volumes[low:high]
+
 
 class SheetPerson(pydantic.BaseModel):
     name: str = ""
@@ -24,3 +84,66 @@ class SheetPeople(pydantic.BaseModel):
     people: List[SheetPerson] = []
 
 
+class ImportReport(pydantic.BaseModel):
+    lines: int = 0
+    accepted: int = 0
+    rejected: int = 0
+    batches: int = 0
+    elapsed: float = 0
+    lines_per_sec: float = 0
+
+
+class BatchImportReport(pydantic.BaseModel):
+    files: int = 0
+    imported: int = 0
+    failed: int = 0
+    people: int = 0
+    elapsed: float = 0
+    errors: Dict[str, str] = {}
+
+
+class SubmittedSet(pydantic.BaseModel):
+    name: str = pydantic.Field(min_length=1)
+    district: str = ""
+    weight: float = pydantic.Field(ge=0)
+    reps: int = pydantic.Field(ge=1)
+    ts: Optional[datetime] = None
+
+
+class SubmitReport(pydantic.BaseModel):
+    accepted: int = 0
+    rejected: int = 0
+    exercises: int = 0
+    errors: Dict[int, str] = {}
+
+
+class ExerciseAggregates(pydantic.BaseModel):
+    name: str = ""
+    district: str = ""
+    sets: int = 0
+    total_volume: float = 0
+    best_weight_by_reps: Dict[int, float] = {}
+    best_e1rm: float = 0
+    e1rm_by_day: Dict[str, float] = {}
+
+
+class PersonAggregates(pydantic.BaseModel):
+    name: str = ""
+    exercises: Dict[str, ExerciseAggregates] = {}
+    weekly_volume: Dict[str, Dict[str, float]] = {}
+
+
+class GraphOptions(pydantic.BaseModel):
+    model_config = pydantic.ConfigDict(frozen=True)
+
+    bucket: Optional[Literal["day", "week", "month"]] = None
+    agg: Optional[Literal["sum", "max", "mean"]] = None
+    max_points: Optional[int] = pydantic.Field(default=None, ge=3)
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+
+    @pydantic.field_validator("start", "end")
+    @classmethod
+    def _local_naive(cls, ts: Optional[datetime]) -> Optional[datetime]:
+        # Compared with the naive local timestamps of the sets
+        return to_local_naive(ts)
@@ -0,0 +1,149 @@
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Set
+from exercise_sheet_to_graph.cache import LRUCache
+from exercise_sheet_to_graph.utils import normalize_string
+
+# Weights and set schemes written next to the name in free text ("60kgx5", "60 kg", "3x10")
+QUANTITY_PATTERN = re.compile(r"\b\d+(?:[.,]\d+)?\s*(?:kg|x\s*\d+)\S*")
+NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+
+
+class Resolution(NamedTuple):
+    exercise: str
+    district: Optional[str]
+    score: float
+
+
+def fold(name: str) -> str:
+    """
+    Folds an exercise name to the form the index compares: lower case, without accents,
+    weights or punctuation, with single spaces ("Alzate Laterali (Cavi) 10kgx12" -> "alzate laterali cavi").
+
+    :param name: The exercise name as written.
+    :return: The folded name.
+    """
+    name = unicodedata.normalize("NFKD", normalize_string(name))
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    name = QUANTITY_PATTERN.sub(" ", name)
+    return " ".join(NON_ALPHANUMERIC.sub(" ", name).split())
+
+
+def trigrams(folded: str) -> Set[str]:
+    """
+    Returns the character trigrams of a folded name, padding each word so that
+    word starts and ends count as trigrams of their own.
+    """
+    grams = set()
+    for word in folded.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class ExerciseNameIndex:
+    def __init__(self, threshold: float = 0.5, cache_size: int = 4096):
+        """
+        Initializes an index resolving free-text exercise names to canonical ones, with exact lookups
+        on the folded name and trigram candidates scored by their Dice coefficient otherwise.
+
+        :param threshold: The minimum score (0 to 1) of a fuzzy match.
+        :param cache_size: Number of resolved names remembered, importers see the same names over and over.
+        """
+        self.threshold = threshold
+        self._canonical: Dict[str, str] = {}
+        self._districts: Dict[str, Optional[str]] = {}
+        self._aliases: List[str] = []
+        self._alias_ids: Dict[str, int] = {}
+        self._alias_grams: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+        self._resolved = LRUCache(max_entries=cache_size)
+
+    def __len__(self) -> int:
+        return len(self._canonical)
+
+    def __getstate__(self) -> dict:
+        # The memo holds a lock and is rebuilt lazily, leave it out of pickles
+        state = self.__dict__.copy()
+        state["_resolved"] = self._resolved.max_entries
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._resolved = LRUCache(max_entries=state["_resolved"])
+
+    def add(self, alias: str, exercise: str, district: Optional[str] = None) -> None:
+        """
+        Adds a name under which an exercise can be found.
+
+        :param alias: The name as it may be written, e.g. the canonical name itself or a translation.
+        :param exercise: The canonical exercise name.
+        :param district: The district of the exercise.
+        """
+        folded = fold(alias)
+        if not folded:
+            return
+        if exercise not in self._districts or district is not None:
+            self._districts[exercise] = district
+        self._canonical[folded] = exercise
+        if folded not in self._alias_ids:
+            grams = trigrams(folded)
+            alias_id = len(self._aliases)
+            self._aliases.append(folded)
+            self._alias_ids[folded] = alias_id
+            self._alias_grams.append(len(grams))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(alias_id)
+        self._resolved.clear()
+
+    def remove(self, exercise: str) -> None:
+        """
+        Removes an exercise and all of its aliases. The postings keep the stale ids,
+        which are skipped at lookup time.
+
+        :param exercise: The canonical exercise name.
+        """
+        for folded in [folded for folded, canonical in self._canonical.items() if canonical == exercise]:
+            del self._canonical[folded]
+        self._districts.pop(exercise, None)
+        self._resolved.clear()
+
+    def resolve(self, name: str) -> Optional[Resolution]:
+        """
+        Resolves a free-text exercise name.
+
+        :param name: The name as written in a sheet or a form.
+        :return: The canonical exercise, its district and the confidence of the match,
+                 or None if no exercise scores at least the threshold.
+        """
+        folded = fold(name)
+        resolution = self._resolved.get(folded, default=False)
+        if resolution is not False:
+            return resolution
+
+        resolution = self._lookup(folded)
+        self._resolved.put(folded, resolution)
+        return resolution
+
+    def _lookup(self, folded: str) -> Optional[Resolution]:
+        exercise = self._canonical.get(folded)
+        if exercise is not None:
+            return Resolution(exercise, self._districts.get(exercise), 1.0)
+
+        grams = trigrams(folded)
+        if not grams:
+            return None
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+
+        best = None
+        for alias_id, count in shared.items():
+            exercise = self._canonical.get(self._aliases[alias_id])
+            if exercise is None:
+                continue
+            score = 2 * count / (len(grams) + self._alias_grams[alias_id])
+            if score >= self.threshold and (best is None or score > best.score):
+                best = Resolution(exercise, self._districts.get(exercise), score)
+        return best
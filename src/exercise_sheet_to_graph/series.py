@@ -0,0 +1,200 @@
+import bisect
+from array import array
+from datetime import datetime, timedelta
+from typing import Sequence, List, Union, Optional
+from exercise_sheet_to_graph.models import Exercise, Volume
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def ts_to_epoch_us(ts: Union[datetime, str]) -> int:
+    """
+    Converts a Volume timestamp to microseconds since the epoch.
+
+    :param ts: The timestamp, as a naive datetime or in the ISO / str(datetime) format of older files.
+    :return: The number of microseconds since 1970-01-01.
+    """
+    return datetime_to_epoch_us(datetime.fromisoformat(ts) if isinstance(ts, str) else ts)
+
+
+def datetime_to_epoch_us(value: datetime) -> int:
+    """
+    Converts a naive datetime to microseconds since the epoch.
+
+    :param value: The datetime to convert.
+    :return: The number of microseconds since 1970-01-01.
+    """
+    return (value - EPOCH) // MICROSECOND
+
+
+def epoch_us_to_ts(epoch_us: int) -> datetime:
+    """
+    Converts microseconds since the epoch back to a Volume timestamp.
+
+    :param epoch_us: The number of microseconds since 1970-01-01.
+    :return: The timestamp, as a naive datetime.
+    """
+    return EPOCH + timedelta(microseconds=int(epoch_us))
+
+
+def plottable(values: Sequence) -> Sequence:
+    """
+    Returns a column in a form Plotly accepts: NumPy arrays are passed through, array.array objects become lists.
+
+    :param values: A column of an ExerciseSeries.
+    :return: The values, ready to be used as trace data.
+    """
+    if isinstance(values, array):
+        return values.tolist()
+    return values
+
+
+class ExerciseSeries:
+    """
+    Columnar view of an Exercise: parallel arrays of epoch timestamps (microseconds), weights and reps.
+    The arrays are NumPy arrays when NumPy is installed, otherwise array.array objects.
+    """
+    __slots__ = ("name", "district", "ts", "weights", "reps")
+
+    def __init__(self, name: str = "", district: str = "",
+                 ts: Sequence[int] = (), weights: Sequence[float] = (), reps: Sequence[int] = ()):
+        if not len(ts) == len(weights) == len(reps):
+            raise ValueError("ts, weights and reps must have the same length")
+        self.name = name
+        self.district = district
+        if np is not None:
+            self.ts = np.asarray(ts, dtype=np.int64)
+            self.weights = np.asarray(weights, dtype=np.float64)
+            self.reps = np.asarray(reps, dtype=np.int32)
+        else:
+            self.ts = array('q', ts)
+            self.weights = array('d', weights)
+            self.reps = array('i', reps)
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    @classmethod
+    def from_exercise(cls, exercise: Exercise) -> "ExerciseSeries":
+        """
+        Builds the columnar representation of an Exercise.
+
+        :param exercise: The Exercise object to convert.
+        :return: The ExerciseSeries holding the same sets.
+        """
+        volumes = exercise.volumes
+        return cls(name=exercise.name, district=exercise.district,
+                   ts=[datetime_to_epoch_us(volume.ts) for volume in volumes],
+                   weights=[volume.weight for volume in volumes],
+                   reps=[volume.reps for volume in volumes])
+
+    def to_exercise(self) -> Exercise:
+        """
+        Converts the series back to an Exercise with one Volume per set.
+
+        :return: The Exercise object holding the same sets.
+        """
+        return Exercise(name=self.name, district=self.district, volumes=[
+            Volume(ts=epoch_us_to_ts(ts), weight=float(weight), reps=int(reps))
+            for ts, weight, reps in zip(self.ts, self.weights, self.reps)
+        ])
+
+    def _select(self, mask: Union[Sequence[bool], "np.ndarray"]) -> "ExerciseSeries":
+        series = ExerciseSeries.__new__(ExerciseSeries)
+        series.name = self.name
+        series.district = self.district
+        if np is not None:
+            series.ts, series.weights, series.reps = self.ts[mask], self.weights[mask], self.reps[mask]
+        else:
+            series.ts = array('q', [value for value, keep in zip(self.ts, mask) if keep])
+            series.weights = array('d', [value for value, keep in zip(self.weights, mask) if keep])
+            series.reps = array('i', [value for value, keep in zip(self.reps, mask) if keep])
+        return series
+
+    def take(self, indices: Sequence[int]) -> "ExerciseSeries":
+        """
+        Keeps only the sets at the given positions.
+
+        :param indices: The positions to keep, in increasing order.
+        :return: A new ExerciseSeries.
+        """
+        series = ExerciseSeries.__new__(ExerciseSeries)
+        series.name = self.name
+        series.district = self.district
+        if np is not None:
+            indices = np.asarray(indices, dtype=np.intp)
+            series.ts, series.weights, series.reps = self.ts[indices], self.weights[indices], self.reps[indices]
+        else:
+            series.ts = array('q', [self.ts[index] for index in indices])
+            series.weights = array('d', [self.weights[index] for index in indices])
+            series.reps = array('i', [self.reps[index] for index in indices])
+        return series
+
+    def between(self, start_us: Optional[int] = None, end_us: Optional[int] = None) -> "ExerciseSeries":
+        """
+        Keeps only the sets performed in the [start_us, end_us] window. The series of an Exercise
+        are in chronological order, so the window is found with a binary search.
+
+        :param start_us: The start of the window in microseconds since the epoch, None for no lower bound.
+        :param end_us: The end of the window in microseconds since the epoch, None for no upper bound.
+        :return: A new ExerciseSeries.
+        """
+        if start_us is None and end_us is None:
+            return self
+        if np is not None:
+            low = np.searchsorted(self.ts, start_us, side="left") if start_us is not None else 0
+            high = np.searchsorted(self.ts, end_us, side="right") if end_us is not None else len(self)
+        else:
+            low = bisect.bisect_left(self.ts, start_us) if start_us is not None else 0
+            high = bisect.bisect_right(self.ts, end_us) if end_us is not None else len(self)
+        series = ExerciseSeries.__new__(ExerciseSeries)
+        series.name = self.name
+        series.district = self.district
+        series.ts, series.weights, series.reps = self.ts[low:high], self.weights[low:high], self.reps[low:high]
+        return series
+
+    def filter_reps(self, target_reps: int) -> "ExerciseSeries":
+        """
+        Keeps only the sets performed with the given number of reps.
+
+        :param target_reps: The number of reps to keep.
+        :return: A new ExerciseSeries.
+        """
+        if np is not None:
+            return self._select(self.reps == target_reps)
+        return self._select([reps == target_reps for reps in self.reps])
+
+    def filter_weight(self, target_weight: float) -> "ExerciseSeries":
+        """
+        Keeps only the sets performed with the given weight.
+
+        :param target_weight: The weight to keep.
+        :return: A new ExerciseSeries.
+        """
+        if np is not None:
+            return self._select(self.weights == target_weight)
+        return self._select([weight == target_weight for weight in self.weights])
+
+    def volumes(self) -> Sequence[float]:
+        """
+        Computes weight x reps for every set.
+
+        :return: The volume of every set, in the same order as the series.
+        """
+        if np is not None:
+            return self.weights * self.reps
+        return array('d', [weight * reps for weight, reps in zip(self.weights, self.reps)])
+
+    def times(self) -> List[datetime]:
+        """
+        Returns the timestamps of the sets as datetimes.
+
+        :return: The list of timestamps.
+        """
+        return [epoch_us_to_ts(ts) for ts in self.ts]
@@ -0,0 +1,231 @@
+import sqlite3
+import time
+from datetime import datetime
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Union, Optional, Iterator, Tuple
+from exercise_sheet_to_graph.models import SheetPerson, Exercise, Volume
+from exercise_sheet_to_graph.storage import Storage
+from exercise_sheet_to_graph.utils import get_logger, normalize_string
+
+logger = get_logger("sheet_to_graph")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS person (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS exercise (
+    id INTEGER PRIMARY KEY,
+    person_id INTEGER NOT NULL REFERENCES person(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    district TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS volume (
+    id INTEGER PRIMARY KEY,
+    exercise_id INTEGER NOT NULL REFERENCES exercise(id) ON DELETE CASCADE,
+    ts TEXT NOT NULL,
+    weight REAL NOT NULL,
+    reps INTEGER NOT NULL
+);
+"""
+# Created once the exercise table has its key column, see _add_exercise_keys
+INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS idx_exercise_person_key ON exercise (person_id, key);
+CREATE INDEX IF NOT EXISTS idx_volume_exercise_ts ON volume (exercise_id, ts);
+CREATE INDEX IF NOT EXISTS idx_volume_exercise_reps ON volume (exercise_id, reps, ts);
+CREATE INDEX IF NOT EXISTS idx_volume_exercise_weight ON volume (exercise_id, weight, ts);
+"""
+
+
+class SqliteStorage(Storage):
+    def __init__(self, db_path: Union[Path, str]):
+        """
+        Initializes the SqliteStorage, creating the person / exercise / volume tables if needed.
+        Exercises are looked up by their normalized name, stored in the key column, as the InfoSaver does.
+
+        :param db_path: Path of the SQLite database file.
+        """
+        super().__init__()
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+            self._add_exercise_keys(connection)
+            connection.executescript(INDEXES)
+
+    @staticmethod
+    def _add_exercise_keys(connection: sqlite3.Connection) -> None:
+        """
+        Upgrades a database created before the key column: fills it, then merges the exercises of a person
+        whose names only differ in case or whitespace into the first one, dropping the sets stored twice.
+        """
+        if "key" in [column[1] for column in connection.execute("PRAGMA table_info(exercise)")]:
+            return
+        connection.execute("ALTER TABLE exercise ADD COLUMN key TEXT NOT NULL DEFAULT ''")
+        connection.create_function("normalize_string", 1, normalize_string, deterministic=True)
+        connection.execute("UPDATE exercise SET key = normalize_string(name)")
+        duplicates = connection.execute(
+            "SELECT e.id, MIN(f.id) FROM exercise e JOIN exercise f ON f.person_id = e.person_id AND f.key = e.key "
+            "GROUP BY e.id HAVING MIN(f.id) < e.id").fetchall()
+        for exercise_id, first_id in duplicates:
+            connection.execute("UPDATE volume SET exercise_id = ? WHERE exercise_id = ?", (first_id, exercise_id))
+            connection.execute("DELETE FROM exercise WHERE id = ?", (exercise_id,))
+        for first_id in {first_id for _, first_id in duplicates}:
+            connection.execute("DELETE FROM volume WHERE exercise_id = ? AND id NOT IN "
+                               "(SELECT MIN(id) FROM volume WHERE exercise_id = ? GROUP BY ts, weight, reps)",
+                               (first_id, first_id))
+        if duplicates:
+            logger.info("Merged %d exercises differing only in case or whitespace", len(duplicates))
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        Opens a connection and wraps its use in a single transaction.
+        """
+        connection = sqlite3.connect(self.db_path)
+        try:
+            connection.execute("PRAGMA foreign_keys = ON")
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def save_person(self, info_person: SheetPerson) -> None:
+        """
+        Saves a SheetPerson, appending its sets to the exercises already stored for the same name.
+        Sets already stored with the same (ts, weight, reps) are skipped, so saving the same data twice
+        does not duplicate it.
+
+        :param info_person: The SheetPerson object to save.
+        """
+        if not info_person or not info_person.name:
+            logger.error("No person inserted")
+            return
+
+        # The listeners get the sets actually added, without those already saved
+        added = []
+        with self._connect() as connection:
+            connection.execute("INSERT OR IGNORE INTO person (name) VALUES (?)", (info_person.name,))
+            person_id = connection.execute("SELECT id FROM person WHERE name = ?",
+                                           (info_person.name,)).fetchone()[0]
+
+            for exercise in info_person.exercises:
+                key = normalize_string(exercise.name)
+                connection.execute("INSERT OR IGNORE INTO exercise (person_id, name, key, district) "
+                                   "VALUES (?, ?, ?, ?)", (person_id, exercise.name, key, exercise.district))
+                exercise_id = connection.execute("SELECT id FROM exercise WHERE person_id = ? AND key = ?",
+                                                 (person_id, key)).fetchone()[0]
+                if not exercise.volumes:
+                    continue
+                # Timestamps are stored as str(datetime), which sorts chronologically as text
+                rows = [(str(volume.ts), volume.weight, volume.reps) for volume in exercise.volumes]
+                timestamps = [row[0] for row in rows]
+                saved_sets = set(connection.execute(
+                    "SELECT ts, weight, reps FROM volume WHERE exercise_id = ? AND ts BETWEEN ? AND ?",
+                    (exercise_id, min(timestamps), max(timestamps))))
+                new_volumes = [volume for volume, row in zip(exercise.volumes, rows) if row not in saved_sets]
+                connection.executemany("INSERT INTO volume (exercise_id, ts, weight, reps) VALUES (?, ?, ?, ?)",
+                                       [(exercise_id, *row) for row in rows if row not in saved_sets])
+                if new_volumes:
+                    added.append(Exercise(name=exercise.name, district=exercise.district, volumes=new_volumes))
+
+            connection.execute("UPDATE person SET version = version + 1, updated_at = ? WHERE id = ?",
+                               (time.time(), person_id))
+
+        logger.info("Person %s saved", info_person.name)
+        self._notify(info_person.name, added)
+
+    def load_person(self, name: str) -> Union[SheetPerson, None]:
+        """
+        Loads the whole history of a SheetPerson.
+
+        :param name: The name of the person to load.
+        :return: The SheetPerson object if found, otherwise None.
+        """
+        if not name:
+            logger.error("No name inserted")
+            return None
+
+        with self._connect() as connection:
+            row = connection.execute("SELECT id, name FROM person WHERE name = ?", (name,)).fetchone()
+            if not row:
+                logger.error("Person %s not found", name)
+                return None
+
+            person = SheetPerson(name=row[1], exercises=[])
+            exercises = {}
+            for exercise_id, exercise_name, district in connection.execute(
+                    "SELECT id, name, district FROM exercise WHERE person_id = ? ORDER BY id", (row[0],)):
+                exercises[exercise_id] = Exercise(name=exercise_name, district=district, volumes=[])
+                person.exercises.append(exercises[exercise_id])
+
+            # Sets inserted out of time order are sorted here, the validator of Exercise.volumes skips appends
+            for exercise_id, ts, weight, reps in connection.execute(
+                    "SELECT v.exercise_id, v.ts, v.weight, v.reps FROM volume v "
+                    "JOIN exercise e ON e.id = v.exercise_id WHERE e.person_id = ? ORDER BY v.exercise_id, v.ts, v.id",
+                    (row[0],)):
+                exercises[exercise_id].volumes.append(Volume(ts=ts, weight=weight, reps=reps))
+
+        return person
+
+    def load_exercise(self, name: str, exercise_name: str,
+                      reps: Optional[int] = None, weight: Optional[float] = None,
+                      start: Optional[datetime] = None, end: Optional[datetime] = None) -> Union[Exercise, None]:
+        """
+        Loads a single exercise of a person through the volume indexes,
+        optionally keeping only the sets with the given reps or weight.
+
+        :param name: The name of the person.
+        :param exercise_name: The name of the exercise.
+        :param reps: If given, only the sets with this number of reps are returned.
+        :param weight: If given, only the sets with this weight are returned.
+        :param start: If given, only the sets performed at or after this time are returned.
+        :param end: If given, only the sets performed at or before this time are returned.
+        :return: The Exercise object if found, otherwise None.
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT e.id, e.name, e.district FROM exercise e JOIN person p ON p.id = e.person_id "
+                "WHERE p.name = ? AND e.key = ?", (name, normalize_string(exercise_name))).fetchone()
+            if not row:
+                logger.error("Exercise %s not found for %s", exercise_name, name)
+                return None
+
+            query = "SELECT ts, weight, reps FROM volume WHERE exercise_id = ?"
+            parameters = [row[0]]
+            if reps is not None:
+                query += " AND reps = ?"
+                parameters.append(reps)
+            if weight is not None:
+                query += " AND weight = ?"
+                parameters.append(weight)
+            if start is not None:
+                query += " AND ts >= ?"
+                parameters.append(str(start))
+            if end is not None:
+                query += " AND ts <= ?"
+                parameters.append(str(end))
+            query += " ORDER BY ts, id"
+
+            volumes = [Volume(ts=ts, weight=volume_weight, reps=volume_reps)
+                       for ts, volume_weight, volume_reps in connection.execute(query, parameters)]
+
+        return Exercise(name=row[1], district=row[2], volumes=volumes)
+
+    def data_version(self, name: str) -> Optional[Tuple[str, float]]:
+        """
+        Returns the write counter of a person, together with the time of the last write.
+
+        :param name: The name of the person.
+        :return: A (tag, last modified epoch seconds) tuple, or None if the person does not exist.
+        """
+        with self._connect() as connection:
+            row = connection.execute("SELECT id, version, updated_at FROM person WHERE name = ?",
+                                     (name,)).fetchone()
+        if not row:
+            return None
+        return f"{row[0]}.{row[1]}", row[2]
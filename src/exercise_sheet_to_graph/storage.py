@@ -0,0 +1,79 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Optional, Tuple, Callable, List
+from exercise_sheet_to_graph.models import SheetPerson, Exercise
+from exercise_sheet_to_graph.utils import get_logger
+
+logger = get_logger("sheet_to_graph")
+
+SaveListener = Callable[[str, List[Exercise]], None]
+
+
+class Storage(ABC):
+    """
+    Common interface of the backends that persist SheetPerson histories.
+    """
+
+    # True if the cost of a save depends on the sets saved only, False if every save rewrites the whole history
+    incremental_saves = True
+
+    def __init__(self):
+        self._listeners: List[SaveListener] = []
+
+    def add_listener(self, listener: SaveListener) -> None:
+        """
+        Registers a callable invoked with the person name and the saved exercises after every save.
+
+        :param listener: The callable to register.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, name: str, exercises: List[Exercise]) -> None:
+        for listener in self._listeners:
+            try:
+                listener(name, exercises)
+            except Exception as e:
+                logger.error("Error notifying save of %s: %s", name, e)
+
+    @abstractmethod
+    def save_person(self, info_person: SheetPerson) -> None:
+        """
+        Saves a SheetPerson, merging it with the history already stored for the same name.
+
+        :param info_person: The SheetPerson object to save.
+        """
+
+    @abstractmethod
+    def load_person(self, name: str) -> Optional[SheetPerson]:
+        """
+        Loads the whole history of a SheetPerson.
+
+        :param name: The name of the person to load.
+        :return: The SheetPerson object if found, otherwise None.
+        """
+
+    @abstractmethod
+    def load_exercise(self, name: str, exercise_name: str,
+                      reps: Optional[int] = None, weight: Optional[float] = None,
+                      start: Optional[datetime] = None, end: Optional[datetime] = None) -> Optional[Exercise]:
+        """
+        Loads a single exercise of a person, optionally keeping only the sets with the given reps or weight.
+
+        :param name: The name of the person.
+        :param exercise_name: The name of the exercise.
+        :param reps: If given, only the sets with this number of reps are returned.
+        :param weight: If given, only the sets with this weight are returned.
+        :param start: If given, only the sets performed at or after this time are returned.
+        :param end: If given, only the sets performed at or before this time are returned.
+        :return: The Exercise object if found, otherwise None.
+        """
+
+    @abstractmethod
+    def data_version(self, name: str) -> Optional[Tuple[str, float]]:
+        """
+        Returns an opaque tag that changes every time the history of a person is written,
+        together with the time of the last write.
+
+        :param name: The name of the person.
+        :return: A (tag, last modified epoch seconds) tuple, or None if the person does not exist.
+        """
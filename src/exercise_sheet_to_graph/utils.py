@@ -1,19 +1,175 @@
+import atexit
 import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
 
-def get_logger(logger_name: str):
+
+LOG_FORMAT = "%(asctime)s - %(filename)s - %(funcName)s - %(levelname)s - %(message)s"
+# Level of the package loggers, e.g. WARNING during bulk imports
+LOG_LEVEL_ENV = "SHEET_TO_GRAPH_LOG_LEVEL"
+# If "1", records are handed to a queue and written by a background thread, so callers never block on the stream
+LOG_QUEUE_ENV = "SHEET_TO_GRAPH_LOG_QUEUE"
+# "<burst>/<seconds>": records of one call site beyond burst per window are dropped, "0" disables the limit
+LOG_RATE_LIMIT_ENV = "SHEET_TO_GRAPH_LOG_RATE_LIMIT"
+DEFAULT_RATE_LIMIT = "20/60"
+
+
+class RateLimitFilter(logging.Filter):
+    def __init__(self, burst: int = 20, period: float = 60.0, min_level: int = logging.WARNING):
+        """
+        Drops the records of a call site, e.g. the "does not exist" errors of a bulk import, once more than burst
+        of them were logged in period seconds. The first record of the next window reports how many were dropped.
+
+        :param burst: The records of a call site let through per window.
+        :param period: The length of a window in seconds.
+        :param min_level: Records below this level are never dropped.
+        """
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        self.min_level = min_level
+        self.suppressed = 0
+        # (window start, records in the window, records dropped) by (path, line) of the logging call
+        self._windows: Dict[Tuple[str, int], List] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < self.min_level:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.period:
+                dropped = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+                if dropped:
+                    record.msg = f"{record.msg} ({dropped} similar messages suppressed)"
+                return True
+            window[1] += 1
+            if window[1] <= self.burst:
+                return True
+            window[2] += 1
+            self.suppressed += 1
+            return False
+
+
+def _parse_rate_limit(value: str) -> Optional[RateLimitFilter]:
+    if value.strip() in ("", "0"):
+        return None
+    burst, _, period = value.partition("/")
+    return RateLimitFilter(int(burst), float(period or 60))
+
+
+def get_logger(logger_name: str, level: Optional[Union[int, str]] = None):
+    """
+    Returns a logger, configuring it on first use from the SHEET_TO_GRAPH_LOG_* environment variables:
+    the level (INFO by default), a queue-based handler and the rate limit of repeated warnings and errors.
+    Log with %-style arguments on hot paths, e.g. logger.info("Saved %s", name), so that the message is
+    only formatted if the record is emitted.
+
+    :param logger_name: The name of the logger.
+    :param level: If given, the level of the logger, overriding the environment.
+    :return: The logger.
+    """
     logger = logging.getLogger(logger_name)
-    logger.setLevel(logging.INFO)
+    if level is not None:
+        logger.setLevel(level.upper() if isinstance(level, str) else level)
+    elif logger.level == logging.NOTSET:
+        logger.setLevel(os.environ.get(LOG_LEVEL_ENV, "INFO").upper())
     if not logger.hasHandlers():
         ch = logging.StreamHandler()
-        ch.setLevel(logging.INFO)
-        formatter = logging.Formatter(
-            "%(asctime)s - %(filename)s - %(funcName)s - %(levelname)s - %(message)s"
-        )
-        ch.setFormatter(formatter)
-        logger.addHandler(ch)
+        ch.setFormatter(logging.Formatter(LOG_FORMAT))
+        if os.environ.get(LOG_QUEUE_ENV) == "1":
+            log_queue = queue.SimpleQueue()
+            listener = QueueListener(log_queue, ch, respect_handler_level=True)
+            listener.start()
+            atexit.register(listener.stop)
+            logger.addHandler(QueueHandler(log_queue))
+        else:
+            logger.addHandler(ch)
+    # Also when the records go to handlers configured elsewhere, e.g. on the root logger
+    if not any(isinstance(existing, RateLimitFilter) for existing in logger.filters):
+        rate_limit = _parse_rate_limit(os.environ.get(LOG_RATE_LIMIT_ENV, DEFAULT_RATE_LIMIT))
+        if rate_limit is not None:
+            logger.addFilter(rate_limit)
     return logger
 
 
+def yaml_loader():
+    """
+    Returns the loader of the YAML files: libyaml's C loader, several times faster than the pure-Python one,
+    when PyYAML was built with it, otherwise the SafeLoader. PyYAML is imported on the first call, so that
+    importing the utilities does not load it.
+    """
+    import yaml
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
 def normalize_string(s):
     return ' '.join(s.lower().strip().split())
+
+
+@contextmanager
+def file_lock(lock_path: Path, shared: bool = False) -> Iterator[None]:
+    """
+    Holds an advisory flock on a lock file for the duration of the block.
+    On platforms without fcntl the block runs unlocked.
+
+    :param lock_path: The lock file, created if it does not exist.
+    :param shared: If True, takes a shared (read) lock instead of an exclusive one.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    with open(lock_path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def atomic_write_text(file_path: Path, text: str) -> None:
+    """
+    Writes text to a temporary file next to the target and atomically renames it over the target,
+    so readers and crashes never observe a truncated file.
+
+    :param file_path: The file to write.
+    :param text: The content to write.
+    """
+    atomic_write_bytes(file_path, text.encode())
+
+
+def atomic_write_bytes(file_path: Path, data: bytes) -> None:
+    """
+    Binary counterpart of atomic_write_text.
+
+    :param file_path: The file to write.
+    :param data: The content to write.
+    """
+    file_path = Path(file_path)
+    with tempfile.NamedTemporaryFile('wb', dir=file_path.parent, prefix=f".{file_path.name}.",
+                                     suffix=".tmp", delete=False) as to_write:
+        try:
+            to_write.write(data)
+            to_write.flush()
+            os.fsync(to_write.fileno())
+        except BaseException:
+            to_write.close()
+            os.unlink(to_write.name)
+            raise
+    os.replace(to_write.name, file_path)
@@ -0,0 +1,274 @@
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+from exercise_sheet_to_graph.models import SheetPerson, Exercise
+from exercise_sheet_to_graph.storage import Storage, SaveListener
+from exercise_sheet_to_graph.utils import get_logger, normalize_string, file_lock
+
+logger = get_logger("sheet_to_graph")
+
+JOURNAL_NAME = "journal.jsonl"
+SEGMENT_SUFFIX = ".flushing"
+QUARANTINE_SUFFIX = ".quarantine"
+MAX_RETRY_DELAY = 300.0
+
+
+class WriteBehindStorage(Storage):
+    def __init__(self, storage: Storage, journal_dir: Union[Path, str], flush_interval: float = 0.5,
+                 max_pending: int = 1000, max_attempts: int = 5, retry_delay: float = 1.0):
+        """
+        Wraps a storage so that saves are only appended to an on-disk journal and acknowledged, while
+        a background thread periodically writes them to the wrapped storage, with one save per person
+        however many submissions are pending for it.
+
+        The journal is shared by every process using the same directory: appends are serialized with a
+        file lock, and a flush first renames the journal to a segment, so submissions never wait for one.
+        Segments left behind by a crash are replayed on the next start. Sets carry their timestamp and
+        the storages skip sets already saved, so replaying a segment twice does not duplicate them.
+        A segment the wrapped storage fails on is kept and retried with an exponential backoff, while the
+        other segments are still flushed. A segment that cannot be decoded, or still fails after max_attempts
+        flushes, is renamed to *.quarantine and left out; renaming it back to *.flushing retries it.
+
+        :param storage: The storage the submissions are eventually written to.
+        :param journal_dir: The directory of the journal.
+        :param flush_interval: Seconds between two flushes of the background thread.
+        :param max_pending: Number of pending submissions of this process that triggers an early flush.
+        :param max_attempts: Number of failed flushes of a segment after which it is quarantined.
+        :param retry_delay: Seconds before the first retry of a failed segment, doubled after every failure.
+        """
+        super().__init__()
+        self.storage = storage
+        self.journal_dir = Path(journal_dir)
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        # Failed flushes of the segments being retried and when they are due, by segment name
+        self._retries: Dict[str, Tuple[int, float]] = {}
+        self._pending: Dict[str, int] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self.flushes = 0
+        self.flushed_submissions = 0
+        self.quarantined_segments = 0
+        self.flush_seconds_total = 0.0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+
+        self.flush()
+        self._worker = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    @property
+    def _journal_path(self) -> Path:
+        return self.journal_dir / JOURNAL_NAME
+
+    @property
+    def _lock_path(self) -> Path:
+        return self.journal_dir / f"{JOURNAL_NAME}.lock"
+
+    def add_listener(self, listener: SaveListener) -> None:
+        # Listeners hear about a save once it reached the wrapped storage
+        self.storage.add_listener(listener)
+
+    def save_person(self, info_person: SheetPerson) -> None:
+        """
+        Appends a SheetPerson to the journal. The call returns once the journal entry is on disk.
+
+        :param info_person: The SheetPerson object to save.
+        """
+        if not info_person or not info_person.name:
+            logger.error("No person inserted")
+            return
+
+        line = info_person.model_dump_json() + "\n"
+        with file_lock(self._lock_path):
+            with open(self._journal_path, "a") as journal:
+                journal.write(line)
+                journal.flush()
+                os.fsync(journal.fileno())
+
+        with self._pending_lock:
+            self._pending[info_person.name] = self._pending.get(info_person.name, 0) + 1
+            depth = sum(self._pending.values())
+        if depth >= self.max_pending:
+            self._wakeup.set()
+
+    def load_person(self, name: str) -> Optional[SheetPerson]:
+        self._flush_pending(name)
+        return self.storage.load_person(name)
+
+    def load_exercise(self, name: str, exercise_name: str,
+                      reps: Optional[int] = None, weight: Optional[float] = None,
+                      start: Optional[datetime] = None, end: Optional[datetime] = None) -> Optional[Exercise]:
+        self._flush_pending(name)
+        return self.storage.load_exercise(name, exercise_name, reps=reps, weight=weight, start=start, end=end)
+
+    def data_version(self, name: str) -> Optional[Tuple[str, float]]:
+        self._flush_pending(name)
+        return self.storage.data_version(name)
+
+    def _flush_pending(self, name: str) -> None:
+        # A process always reads its own writes, other processes see them after their flush
+        if self._pending.get(name):
+            try:
+                self.flush()
+            except Exception as e:
+                # The read is served from the wrapped storage anyway, the background thread retries
+                logger.error("Error flushing the journal before reading %s: %s", name, e)
+        elif self._flush_lock.locked():
+            # The person's submissions may be in the flush running right now
+            with self._flush_lock:
+                pass
+
+    def queue_depth(self) -> int:
+        """
+        Returns the number of submissions of this process not written to the wrapped storage yet.
+        """
+        with self._pending_lock:
+            return sum(self._pending.values())
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the queue counters.
+
+        :return: A dictionary with queue depth, flushes, flushed submissions and the last, mean and
+                 max flush latency in seconds.
+        """
+        return {
+            "queue_depth": self.queue_depth(),
+            "flushes": self.flushes,
+            "flushed_submissions": self.flushed_submissions,
+            "retrying_segments": len(self._retries),
+            "quarantined_segments": self.quarantined_segments,
+            "last_flush_seconds": self.last_flush_seconds,
+            "mean_flush_seconds": self.flush_seconds_total / self.flushes if self.flushes else 0.0,
+            "max_flush_seconds": self.max_flush_seconds,
+        }
+
+    def flush(self) -> int:
+        """
+        Writes every journaled submission, including segments left by interrupted flushes,
+        to the wrapped storage. A segment that fails is retried on a later flush once its backoff expired,
+        and the others are still written.
+
+        :return: The number of submissions written.
+        """
+        with self._flush_lock:
+            start = time.perf_counter()
+            with file_lock(self._lock_path):
+                if self._journal_path.exists() and self._journal_path.stat().st_size:
+                    self._journal_path.rename(
+                        self.journal_dir / f"{JOURNAL_NAME}.{os.getpid()}-{time.time_ns()}{SEGMENT_SUFFIX}")
+                with self._pending_lock:
+                    self._pending.clear()
+
+            written = 0
+            segments = sorted(self.journal_dir.glob(f"{JOURNAL_NAME}.*{SEGMENT_SUFFIX}"))
+            # Segments flushed or quarantined by another process are not retried anymore
+            names = {segment.name for segment in segments}
+            self._retries = {name: retry for name, retry in self._retries.items() if name in names}
+            for segment in segments:
+                attempts, due = self._retries.get(segment.name, (0, 0.0))
+                if time.monotonic() < due:
+                    continue
+                try:
+                    written += self._flush_segment(segment)
+                except FileNotFoundError:
+                    # Another process flushed it in the meantime
+                    pass
+                except UnicodeDecodeError as e:
+                    # Retrying cannot help
+                    self._quarantine(segment, e)
+                except Exception as e:
+                    self._retry_later(segment, attempts + 1, e)
+                    continue
+                self._retries.pop(segment.name, None)
+
+            if written:
+                elapsed = time.perf_counter() - start
+                self.flushes += 1
+                self.flushed_submissions += written
+                self.flush_seconds_total += elapsed
+                self.last_flush_seconds = elapsed
+                self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+                logger.info("Flushed %d submissions in %.1f ms", written, elapsed * 1000)
+            return written
+
+    def _flush_segment(self, segment: Path) -> int:
+        people: Dict[str, Dict[str, Exercise]] = {}
+        submissions = 0
+        with open(segment, "r") as read_file:
+            for line in read_file:
+                if not line.strip():
+                    continue
+                try:
+                    person = SheetPerson.model_validate_json(line)
+                except ValueError as e:
+                    # A torn last line from a crash during an append
+                    logger.error("Skipping unreadable journal entry in %s: %s", segment, e)
+                    continue
+                exercises = people.setdefault(person.name, {})
+                for exercise in person.exercises:
+                    pending = exercises.setdefault(normalize_string(exercise.name),
+                                                   Exercise(name=exercise.name, district=exercise.district))
+                    pending.volumes.extend(exercise.volumes)
+                submissions += 1
+
+        for name, exercises in people.items():
+            self.storage.save_person(SheetPerson(name=name, exercises=list(exercises.values())))
+        segment.unlink(missing_ok=True)
+        return submissions
+
+    def _retry_later(self, segment: Path, attempts: int, error: Exception) -> None:
+        if attempts >= self.max_attempts:
+            self._retries.pop(segment.name, None)
+            self._quarantine(segment, error)
+            return
+        delay = min(self.retry_delay * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+        self._retries[segment.name] = (attempts, time.monotonic() + delay)
+        logger.warning("Error flushing journal segment %s (attempt %d of %d), retrying in %.1f s: %s",
+                       segment, attempts, self.max_attempts, delay, error)
+
+    def _quarantine(self, segment: Path, error: Exception) -> None:
+        quarantine_path = segment.with_suffix(QUARANTINE_SUFFIX)
+        try:
+            segment.rename(quarantine_path)
+        except OSError as e:
+            logger.error("Error quarantining journal segment %s: %s", segment, e)
+            return
+        self.quarantined_segments += 1
+        logger.error("Quarantined journal segment %s, its submissions are not saved until it is renamed back to "
+                     "%s: %s", quarantine_path, segment.name, error)
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._closed:
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Error in write-behind flush: %s", e)
+
+    def close(self) -> None:
+        """
+        Stops the background thread and flushes the pending submissions. Called at interpreter exit.
+        Segments waiting for a retry stay in the journal and are replayed on the next start.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._worker.join()
+        self.flush()
+        atexit.unregister(self.close)
@@ -0,0 +1,112 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from exercise_sheet_to_graph.aggregates import AggregateStore, estimated_one_rep_max
+from exercise_sheet_to_graph.district_exercise_mapper import DistrictExerciseMapper
+from exercise_sheet_to_graph.infosaver import InfoSaver
+from exercise_sheet_to_graph.models import SheetPerson, Exercise, Volume
+
+
+class TestAggregateStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.saver = InfoSaver(Path(self.tmp_dir.name))
+        self.store = AggregateStore(Path(self.tmp_dir.name),
+                                    mapper=DistrictExerciseMapper("./config/district_and_exercise_italian.yaml"))
+        self.saver.add_listener(self.store.on_save)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _save(self, *volumes):
+        self.saver.save_person(SheetPerson(name="Lorenzo", exercises=[
+            Exercise(name="panca piana con bilanciere", volumes=list(volumes))
+        ]))
+
+    def test_incremental_update_matches_rebuild(self):
+        self._save(Volume(ts="2024-10-07 18:00:00", weight=80, reps=5),
+                   Volume(ts="2024-10-07 18:05:00", weight=70, reps=10))
+        self._save(Volume(ts="2024-10-14 18:00:00", weight=85, reps=5),
+                   Volume(ts="2024-10-14 18:05:00", weight=60, reps=10))
+
+        aggregates = self.store.get("Lorenzo")
+        bench = aggregates.exercises["panca piana con bilanciere"]
+        self.assertEqual(bench.district, "petto")
+        self.assertEqual(bench.sets, 4)
+        self.assertEqual(bench.best_weight_by_reps, {5: 85, 10: 70})
+        self.assertAlmostEqual(bench.best_e1rm, estimated_one_rep_max(85, 5))
+        self.assertEqual(sorted(bench.e1rm_by_day), ["2024-10-07", "2024-10-14"])
+        self.assertEqual(aggregates.weekly_volume["petto"], {"2024-W41": 1100, "2024-W42": 1025})
+
+        self.assertEqual(self.store.rebuild(self.saver.load_person("Lorenzo")), aggregates)
+
+    def test_duplicate_sets_are_counted_once(self):
+        for _ in range(2):
+            self._save(Volume(ts="2024-10-07 18:00:00", weight=100, reps=5))
+
+        aggregates = self.store.get("Lorenzo")
+        self.assertEqual(aggregates.exercises["panca piana con bilanciere"].sets, 1)
+        self.assertEqual(aggregates.weekly_volume["petto"], {"2024-W41": 500})
+
+    def test_names_are_normalized(self):
+        self.saver.save_person(SheetPerson(name="Lorenzo", exercises=[
+            Exercise(name="Squat", district="gambe", volumes=[Volume(ts="2024-10-07 18:00:00", weight=100, reps=5)]),
+        ]))
+        self.saver.save_person(SheetPerson(name="Lorenzo", exercises=[
+            Exercise(name="squat ", district="gambe", volumes=[Volume(ts="2024-10-08 18:00:00", weight=100, reps=5)]),
+        ]))
+        aggregates = self.store.get("Lorenzo")
+        self.assertEqual(list(aggregates.exercises), ["squat"])
+        self.assertEqual(aggregates.exercises["squat"].sets, 2)
+
+    def test_missing_aggregates_are_rebuilt_from_history(self):
+        saver = InfoSaver(Path(self.tmp_dir.name) / "history")
+        saver.save_person(SheetPerson(name="Lorenzo", exercises=[
+            Exercise(name="panca piana con bilanciere", volumes=[Volume(ts="2024-10-07 18:00:00", weight=80, reps=5)])
+        ]))
+        store = AggregateStore(saver.base_dir, load_person=saver.load_person)
+        saver.add_listener(store.on_save)
+        saver.save_person(SheetPerson(name="Lorenzo", exercises=[
+            Exercise(name="panca piana con bilanciere", volumes=[Volume(ts="2024-10-14 18:00:00", weight=85, reps=5)])
+        ]))
+        self.assertEqual(store.get("Lorenzo").exercises["panca piana con bilanciere"].sets, 2)
+
+    def test_concurrent_save_is_not_counted_twice(self):
+        base_dir = Path(self.tmp_dir.name) / "history"
+        saver, other_saver = InfoSaver(base_dir), InfoSaver(base_dir)
+        other_saves = []
+
+        def load_person(name):
+            # Another process saves while the missing aggregates are built from the history
+            other_save = threading.Thread(target=other_saver.save_person, args=(SheetPerson(name="Lorenzo", exercises=[
+                Exercise(name="squat", volumes=[Volume(ts="2024-10-14 18:00:00", weight=100, reps=5)])
+            ]),))
+            other_save.start()
+            other_saves.append(other_save)
+            # Long enough for its write to land, if nothing holds it back
+            other_save.join(timeout=0.5)
+            return saver.load_person(name)
+
+        store = AggregateStore(base_dir, load_person=load_person)
+        saver.add_listener(store.on_save)
+        other_saver.add_listener(store.on_save)
+        saver.save_person(SheetPerson(name="Lorenzo", exercises=[
+            Exercise(name="squat", volumes=[Volume(ts="2024-10-07 18:00:00", weight=100, reps=5)])
+        ]))
+        other_saves[0].join()
+
+        self.assertEqual(store.get("Lorenzo").exercises["squat"].sets, 2)
+
+    def test_e1rm_trend_is_bounded(self):
+        store = AggregateStore(Path(self.tmp_dir.name) / "bounded", max_e1rm_days=2)
+        for day in (7, 8, 9):
+            store.on_save("Lorenzo", [Exercise(name="squat", district="gambe", volumes=[
+                Volume(ts=f"2024-10-{day:02d} 18:00:00", weight=100, reps=5)])])
+
+        squat = store.get("Lorenzo").exercises["squat"]
+        self.assertEqual(list(squat.e1rm_by_day), ["2024-10-08", "2024-10-09"])
+        self.assertEqual(squat.sets, 3)
+
+    def test_missing_person(self):
+        self.assertIsNone(self.store.get("Nobody"))
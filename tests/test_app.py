@@ -0,0 +1,182 @@
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from sqlalchemy import text
+from werkzeug.security import generate_password_hash
+from exercise_sheet_to_graph.app import create_app, db, User, EXTENSION, load_user, MAX_BATCH_SETS
+from exercise_sheet_to_graph.metrics import metrics
+from exercise_sheet_to_graph.models import SheetPerson, Exercise, Volume
+
+
+class TestCreateApp(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.app = create_app({'TESTING': True, 'WTF_CSRF_ENABLED': False, 'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+                               'DATA_DIR': Path(self.tmp_dir.name)})
+        with self.app.app_context():
+            db.session.add(User(username='lollo', password_hash=generate_password_hash('secret1'),
+                                name='Lorenzo', surname='B'))
+            db.session.commit()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _login(self):
+        response = self.client.post('/login', data={'username': 'lollo', 'password': 'secret1'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_importing_the_app_loads_no_service(self):
+        # A fresh interpreter, the test process has already imported everything
+        code = ("import sys; from exercise_sheet_to_graph.app import create_app; "
+                "create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'}); "
+                "print(sorted({m.split('.')[0] for m in sys.modules} & {'plotly', 'yaml', 'numpy'}))")
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), '[]')
+
+    def test_services_are_built_on_first_use(self):
+        services = self.app.extensions[EXTENSION]
+        self._login()
+        self.assertEqual(self.client.get('/').status_code, 200)
+        self.assertEqual(services._instances, {})
+
+        response = self.client.post('/submit', data={'exercises[1][name]': 'squat', 'exercises[1][district]': 'gambe',
+                                                     'exercises[1][reps]': '5', 'exercises[1][weight]': '100'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('graph_creator', services._instances)
+        self.assertEqual(services.storage.load_person('user_1').exercises[0].name, 'squat')
+
+        response = self.client.get('/graphs/volume?exercise=squat')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('graph_creator', services._instances)
+
+    def test_graph_window_accepts_aware_datetimes(self):
+        services = self.app.extensions[EXTENSION]
+        services.storage.save_person(SheetPerson(name='user_1', exercises=[
+            Exercise(name='squat', volumes=[Volume(ts='2024-06-01 10:00:00', weight=100, reps=5)])
+        ]))
+        self._login()
+
+        for query in ('start=2024-01-01T00:00:00Z', 'end=2024-12-31T00:00:00%2B02:00',
+                      'start=2024-01-01T00:00:00Z&end=2024-12-31T00:00:00Z&bucket=week'):
+            response = self.client.get(f'/graphs/volume?exercise=squat&{query}')
+            self.assertEqual(response.status_code, 200, query)
+            self.assertEqual(response.get_json()['data'][0]['y'], [500.0], query)
+
+    def test_api_sets(self):
+        services = self.app.extensions[EXTENSION]
+        self._login()
+
+        self.assertEqual(self.client.post('/api/sets', data='not json', content_type='application/json').status_code,
+                         400)
+        self.assertEqual(self.client.post('/api/sets', json={'sets': 'squat'}).status_code, 400)
+        too_many = [{'name': 'squat', 'weight': 100, 'reps': 5}] * (MAX_BATCH_SETS + 1)
+        self.assertEqual(self.client.post('/api/sets', json=too_many).status_code, 413)
+        self.assertIsNone(services.storage.load_person('user_1'))
+
+        response = self.client.post('/api/sets', json={'sets': [
+            {'name': 'squat', 'weight': 100, 'reps': 5, 'ts': '2024-01-01 10:00:00'},
+            {'name': 'squat', 'weight': 'heavy', 'reps': 5},
+            {'name': 'squat', 'weight': 105, 'reps': -1},
+            {'name': 'squat', 'weight': 105, 'reps': 5, 'ts': '2024-01-01 10:05:00'},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        report = response.get_json()
+        self.assertEqual((report['accepted'], report['rejected']), (2, 2))
+        self.assertEqual(sorted(report['errors']), ['1', '2'])
+        volumes = services.storage.load_person('user_1').exercises[0].volumes
+        self.assertEqual([volume.weight for volume in volumes], [100, 105])
+
+        response = self.client.post('/api/sets', json=[{'name': 'squat', 'weight': 'heavy', 'reps': 5}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_form_and_api_resolve_names_alike(self):
+        services = self.app.extensions[EXTENSION]
+        self._login()
+        self.client.post('/submit', data={'exercises[1][name]': 'Low Cable Fly', 'exercises[1][district]': '',
+                                          'exercises[1][reps]': '10', 'exercises[1][weight]': '20'})
+        self.client.post('/api/sets', json=[{'name': 'low cable fly', 'weight': 22.5, 'reps': 10}])
+
+        exercises = services.storage.load_person('user_1').exercises
+        self.assertEqual([(exercise.name, exercise.district) for exercise in exercises],
+                         [('croci al cavo basso', 'petto')])
+        self.assertEqual([volume.weight for volume in exercises[0].volumes], [20, 22.5])
+
+    def test_add_exercises_page_follows_the_user(self):
+        self._login()
+        self.assertIn(b'Ciao, Lorenzo', self.client.get('/add_exercises').data)
+
+        with self.app.app_context():
+            db.session.get(User, 1).name = 'Lollo'
+            db.session.commit()
+        self.assertIn(b'Ciao, Lollo', self.client.get('/add_exercises').data)
+
+    def test_user_cache_is_invalidated_on_profile_change(self):
+        with self.app.test_request_context():
+            user = load_user('1')
+            self.assertIs(load_user('1'), user)
+
+            db.session.get(User, 1).surname = 'Bianchi'
+            db.session.commit()
+            self.assertEqual(load_user('1').surname, 'Bianchi')
+            self.assertIsNone(load_user('2'))
+
+    def test_history_saved_under_the_name_is_copied(self):
+        services = self.app.extensions[EXTENSION]
+        services.storage.save_person(SheetPerson(name='Lorenzo B', exercises=[
+            Exercise(name='squat', volumes=[Volume(ts='2024-01-01 10:00:00', weight=100, reps=5)])
+        ]))
+        self._login()
+
+        response = self.client.get('/graphs/exercises')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()[0]['name'], 'squat')
+        self.assertEqual(len(services.storage.load_person('user_1').exercises[0].volumes), 1)
+
+    def test_sqlite_file_uses_wal(self):
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.tmp_dir.name}/users.db',
+                          'DATA_DIR': Path(self.tmp_dir.name)})
+        with app.app_context():
+            self.assertEqual(db.session.execute(text('PRAGMA journal_mode')).scalar(), 'wal')
+            self.assertEqual(db.engine.pool.size(), app.config['DB_POOL_SIZE'])
+            db.engine.dispose()
+
+    def test_metrics_require_the_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+        self.app.config['METRICS_TOKEN'] = 'secret'
+        headers = {'Authorization': 'Bearer secret'}
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 404)
+        response = self.client.get('/metrics', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'sheet_to_graph_metrics_enabled', response.data)
+
+        remote = self.client.get('/metrics', headers=headers, environ_base={'REMOTE_ADDR': '203.0.113.7'})
+        self.assertEqual(remote.status_code, 404)
+
+    def test_metrics_toggle(self):
+        self.app.config['METRICS_TOKEN'] = 'secret'
+        headers = {'Authorization': 'Bearer secret'}
+        self.assertEqual(self.client.post('/metrics', data={'enabled': '0'}).status_code, 404)
+        self.assertTrue(metrics.enabled)
+        try:
+            response = self.client.post('/metrics', data={'enabled': '0'}, headers=headers)
+            self.assertIn(b'sheet_to_graph_metrics_enabled 0', response.data)
+            self.assertFalse(metrics.enabled)
+            self.assertEqual(self.client.post('/metrics', data={'enabled': 'yes'}, headers=headers).status_code, 400)
+            self.client.post('/metrics', data={'enabled': '1'}, headers=headers)
+            self.assertTrue(metrics.enabled)
+        finally:
+            metrics.enabled = True
+
+    def test_login_is_required(self):
+        response = self.client.get('/graphs')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/login', response.headers['Location'])
+
+
+if __name__ == '__main__':
+    unittest.main()
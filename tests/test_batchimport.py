@@ -0,0 +1,38 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from exercise_sheet_to_graph.batch_import import import_directory
+from exercise_sheet_to_graph.infosaver import InfoSaver
+
+
+class TestBatchImport(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.source_dir = Path(self.tmp_dir.name) / "sheets"
+        self.source_dir.mkdir()
+        shutil.copy("./tests/data/db/data_20241013_183717_giorgio_finizio.yaml", self.source_dir)
+        shutil.copy("./tests/data/esempio.txt", self.source_dir / "giorgio_finizio.txt")
+        shutil.copy("./tests/data/esempio2.txt", self.source_dir / "lorenzo.txt")
+        (self.source_dir / "broken.yaml").write_text("name: [unclosed")
+        (self.source_dir / "empty.txt").write_text("nothing to see here\n")
+        self.saver = InfoSaver(Path(self.tmp_dir.name) / "db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_import_directory(self):
+        progress = []
+        report = import_directory(self.source_dir, self.saver, workers=2,
+                                  progress=lambda done, total, file: progress.append((done, total)))
+
+        self.assertEqual(report.files, 5)
+        self.assertEqual(report.imported, 3)
+        self.assertEqual(report.failed, 2)
+        self.assertEqual(report.people, 2)
+        self.assertEqual(sorted(Path(file).name for file in report.errors), ["broken.yaml", "empty.txt"])
+        self.assertEqual(progress[-1], (5, 5))
+
+        giorgio = self.saver.load_person("giorgio finizio")
+        self.assertEqual(len(giorgio.exercises), 5)
+        self.assertEqual(len(self.saver.load_person("lorenzo").exercises), 4)
@@ -0,0 +1,34 @@
+import unittest
+from exercise_sheet_to_graph.cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_max_bytes(self):
+        cache = LRUCache(max_entries=10, max_bytes=100)
+        cache.put("a", 1, size=60)
+        cache.put("b", 2, size=60)
+
+        self.assertNotIn("a", cache)
+        self.assertEqual(cache.current_bytes, 60)
+
+    def test_version_mismatch_is_a_miss(self):
+        cache = LRUCache()
+        cache.put("a", 1, version=1)
+
+        self.assertEqual(cache.get("a", version=1), 1)
+        self.assertIsNone(cache.get("a", version=2))
+        self.assertNotIn("a", cache)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(cache.stats()["invalidations"], 1)
@@ -1,4 +1,8 @@
+import os
+import tempfile
+import time
 import unittest
+from pathlib import Path
 from unittest.mock import patch, mock_open
 from exercise_sheet_to_graph.district_exercise_mapper import DistrictExerciseMapper
 
@@ -42,3 +46,51 @@ class TestDistrictExerciseMapper(unittest.TestCase):
         self.mapper.remove_exercise_from_district("district1", "exercise1")
         self.assertNotIn("exercise1", self.mapper.district_to_exercises["district1"])
         self.assertNotIn("exercise1", self.mapper.exercises_to_district)
+
+
+class TestDistrictExerciseMapperPersistence(unittest.TestCase):
+    config_data = TestDistrictExerciseMapper.config_data
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.config_path = Path(self.tmp_dir.name) / "config.yaml"
+        self.config_path.write_text(self.config_data)
+        self.cache_dir = Path(self.tmp_dir.name) / "cache"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_snapshot_is_reused(self):
+        DistrictExerciseMapper(str(self.config_path), cache_dir=self.cache_dir)
+        self.assertEqual(len(list(self.cache_dir.glob("config-*.pickle"))), 1)
+
+        with patch("exercise_sheet_to_graph.district_exercise_mapper.yaml.load") as yaml_load:
+            mapper = DistrictExerciseMapper(str(self.config_path), cache_dir=self.cache_dir)
+        yaml_load.assert_not_called()
+        self.assertEqual(mapper.get_district_by_exercise("exercise3"), "district2")
+        self.assertEqual(mapper.resolve_exercise("EXERCISE3 10kgx5").exercise, "exercise3")
+
+    def test_reload_when_file_changes(self):
+        mapper = DistrictExerciseMapper(str(self.config_path), watch_interval=0)
+        readers_state = mapper.state
+        self.config_path.write_text(self.config_data.replace("exercise3", "exercise9"))
+        os.utime(self.config_path, ns=(time.time_ns() + 10 ** 9,) * 2)
+
+        self.assertEqual(mapper.get_district_by_exercise("exercise9"), "district2")
+        self.assertIn("exercise3", readers_state.exercises_to_district)
+
+    def test_edits_persist_across_processes(self):
+        mapper = DistrictExerciseMapper(str(self.config_path), persist_edits=True)
+        other_worker = DistrictExerciseMapper(str(self.config_path), watch_interval=0)
+        version = mapper.version
+
+        mapper.add_exercise_to_district("District2", "Exercise4")
+        mapper.add_exercise_to_district("district2", "exercise4")
+        mapper.remove_exercise_from_district("district1", "exercise1")
+
+        self.assertNotEqual(mapper.version, version)
+        self.assertEqual(mapper.get_exercise_by_district("district2"), ["exercise3", "exercise4"])
+        self.assertEqual(other_worker.get_exercise_by_district("district2"), ["exercise3", "exercise4"])
+        self.assertIsNone(other_worker.get_district_by_exercise("exercise1"))
+        restarted = DistrictExerciseMapper(str(self.config_path))
+        self.assertEqual(restarted.exercises_to_district["exercise4"], "district2")
@@ -0,0 +1,43 @@
+import math
+import unittest
+from datetime import datetime
+from exercise_sheet_to_graph.downsampling import bucket_values, lttb_indices
+from exercise_sheet_to_graph.series import ts_to_epoch_us
+
+
+class TestDownsampling(unittest.TestCase):
+    def setUp(self):
+        self.times = [ts_to_epoch_us(str(ts)) for ts in (
+            datetime(2024, 10, 7, 18), datetime(2024, 10, 7, 19), datetime(2024, 10, 13, 10),
+            datetime(2024, 10, 14, 18), datetime(2024, 11, 2, 9),
+        )]
+        self.values = [100, 200, 300, 400, 500]
+
+    def test_bucket_by_day(self):
+        self.assertEqual(bucket_values(self.times, self.values, "day", "sum"),
+                         (["2024-10-07", "2024-10-13", "2024-10-14", "2024-11-02"], [300, 300, 400, 500]))
+
+    def test_bucket_by_week_starts_on_monday(self):
+        self.assertEqual(bucket_values(self.times, self.values, "week", "max"),
+                         (["2024-10-07", "2024-10-14", "2024-10-28"], [300, 400, 500]))
+
+    def test_bucket_by_month(self):
+        self.assertEqual(bucket_values(self.times, self.values, "month", "mean"),
+                         (["2024-10-01", "2024-11-01"], [250, 500]))
+
+    def test_unknown_bucket(self):
+        with self.assertRaises(ValueError):
+            bucket_values(self.times, self.values, "year", "sum")
+
+    def test_lttb_keeps_extremes_and_budget(self):
+        x = list(range(1000))
+        y = [math.sin(value / 50) for value in x]
+        y[500] = 10
+
+        indices = lttb_indices(x, y, 100)
+        self.assertEqual(len(indices), 100)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], 999)
+        self.assertIn(500, indices)
+        self.assertEqual(indices, sorted(indices))
+        self.assertEqual(lttb_indices(x[:10], y[:10], 100), list(range(10)))
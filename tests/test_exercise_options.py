@@ -0,0 +1,45 @@
+import gzip
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from exercise_sheet_to_graph.app import create_app, EXTENSION
+
+
+class TestExerciseOptionsAsset(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        app = create_app({"TESTING": True, "LOGIN_DISABLED": True, "SQLALCHEMY_DATABASE_URI": "sqlite://",
+                          "DATA_DIR": Path(self.tmp_dir.name)})
+        self.client = app.test_client()
+        self.url = f"/add_exercises/options/{app.extensions[EXTENSION].exercise_mapper.version}.json"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_stale_version_redirects(self):
+        response = self.client.get("/add_exercises/options/old.json")
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.headers["Location"].endswith(self.url))
+
+    def test_gzip_is_negotiated(self):
+        plain = self.client.get(self.url)
+        self.assertEqual(plain.status_code, 200)
+        self.assertIsNone(plain.content_encoding)
+        self.assertIn("croci al cavo basso", json.loads(plain.data)["exercises"])
+        self.assertIn("Accept-Encoding", plain.headers["Vary"])
+
+        gzipped = self.client.get(self.url, headers={"Accept-Encoding": "gzip, deflate"})
+        self.assertEqual(gzipped.content_encoding, "gzip")
+        self.assertEqual(gzip.decompress(gzipped.data), plain.data)
+
+    def test_etag_answers_not_modified(self):
+        etag = self.client.get(self.url).headers["ETag"]
+        not_modified = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.data, b"")
+        self.assertEqual(self.client.get(self.url, headers={"If-None-Match": '"other"'}).status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
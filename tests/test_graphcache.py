@@ -0,0 +1,98 @@
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from exercise_sheet_to_graph.district_exercise_mapper import DistrictExerciseMapper
+from exercise_sheet_to_graph.graph_cache import FigureCache
+from exercise_sheet_to_graph.graph_creator import GraphCreator
+from exercise_sheet_to_graph.infosaver import InfoSaver
+from exercise_sheet_to_graph.models import Exercise, Volume, SheetPerson
+
+
+class TestFigureCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.exercise = Exercise(
+            name="Bench Press",
+            volumes=[
+                Volume(ts=str(datetime(2023, 1, 1)), weight=100, reps=10),
+                Volume(ts=str(datetime(2023, 2, 1)), weight=105, reps=10),
+            ]
+        )
+        self.graph_creator = GraphCreator(DistrictExerciseMapper("./config/district_and_exercise_italian.yaml"))
+        self.builds = 0
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _build(self):
+        self.builds += 1
+        return self.graph_creator.create_volume_graph(self.exercise)
+
+    def test_same_version_is_built_once(self):
+        cache = FigureCache()
+        first = cache.get_or_create("Lorenzo", "Bench Press", "volume", None, "v1", self._build)
+        second = cache.get_or_create("Lorenzo", "Bench Press", "volume", None, "v1", self._build)
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.builds, 1)
+        cache.get_or_create("Lorenzo", "Bench Press", "volume", None, "v2", self._build)
+        self.assertEqual(self.builds, 2)
+
+    def test_disk_tier(self):
+        disk_dir = Path(self.tmp_dir.name) / "figures"
+        FigureCache(disk_dir=disk_dir).get_or_create("Lorenzo", "Bench Press", "volume", None, "v1", self._build)
+        FigureCache(disk_dir=disk_dir).get_or_create("Lorenzo", "Bench Press", "volume", None, "v1", self._build)
+        self.assertEqual(self.builds, 1)
+
+    def test_saving_invalidates_exercise(self):
+        cache = FigureCache(disk_dir=Path(self.tmp_dir.name) / "figures")
+        saver = InfoSaver(Path(self.tmp_dir.name) / "db")
+        saver.add_listener(cache.on_save)
+        cache.get_or_create("Lorenzo", "Bench Press", "volume", None, "v1", self._build)
+        cache.get_or_create("Lorenzo", "Squat", "volume", None, "v1", self._build)
+
+        saver.save_person(SheetPerson(name="Lorenzo", exercises=[self.exercise]))
+
+        self.assertNotIn(("Lorenzo", "bench press", "volume", None), cache.memory)
+        self.assertIn(("Lorenzo", "squat", "volume", None), cache.memory)
+        cache.get_or_create("Lorenzo", "Bench Press", "volume", None, "v1", self._build)
+        self.assertEqual(self.builds, 3)
+
+    def test_saving_invalidates_differently_written_names(self):
+        disk_dir = Path(self.tmp_dir.name) / "figures"
+        cache = FigureCache(disk_dir=disk_dir)
+        cache.get_or_create("Lorenzo", "Bench Press", "volume", None, "v1", self._build)
+
+        cache.on_save("Lorenzo", [Exercise(name=" bench  press")])
+
+        self.assertEqual(len(cache.memory), 0)
+        self.assertEqual(list(disk_dir.glob("*/*/*.json")), [])
+
+    def test_new_version_replaces_the_old_one_on_disk(self):
+        disk_dir = Path(self.tmp_dir.name) / "figures"
+        cache = FigureCache(disk_dir=disk_dir)
+        for version in ("v1", "v2", "v3"):
+            cache.get_or_create("Lorenzo", "Bench Press", "volume", None, version, self._build)
+        cache.get_or_create("Lorenzo", "Bench Press", "volume", 10, "v3", self._build)
+
+        self.assertEqual(len(list(disk_dir.glob("*/*/*.json"))), 2)
+        self.assertEqual(self.builds, 4)
+
+    def test_disk_tier_is_bounded(self):
+        disk_dir = Path(self.tmp_dir.name) / "figures"
+        cache = FigureCache(disk_dir=disk_dir, max_disk_entries=2)
+        for reps in range(4):
+            cache.get_or_create("Lorenzo", "Bench Press", "weight_per_reps", reps, "v1", self._build)
+        self.assertEqual(len(list(disk_dir.glob("*/*/*.json"))), 2)
+
+        # The oldest figures were evicted, a new cache still finds the newest ones
+        restarted = FigureCache(disk_dir=disk_dir, max_disk_entries=2)
+        restarted.get_or_create("Lorenzo", "Bench Press", "weight_per_reps", 3, "v1", self._build)
+        restarted.get_or_create("Lorenzo", "Bench Press", "weight_per_reps", 0, "v1", self._build)
+        self.assertEqual(self.builds, 5)
+
+        size = len(next(disk_dir.glob("*/*/*.json")).read_text())
+        FigureCache(disk_dir=disk_dir, max_disk_bytes=size).get_or_create("Lorenzo", "Squat", "volume", None, "v1",
+                                                                           self._build)
+        self.assertEqual(len(list(disk_dir.glob("*/*/*.json"))), 1)
@@ -1,6 +1,6 @@
 import unittest
 from datetime import datetime
-from exercise_sheet_to_graph.models import Exercise, Volume
+from exercise_sheet_to_graph.models import Exercise, Volume, GraphOptions, SheetPerson
 from exercise_sheet_to_graph.graph_creator import GraphCreator
 from exercise_sheet_to_graph.district_exercise_mapper import DistrictExerciseMapper
 
@@ -58,3 +58,31 @@ class TestGraphCreator(unittest.TestCase):
         self.assertEqual(fig.layout.title.text, "Reps Over Time for Bench Press - 100 Kg")
         self.assertEqual(fig.layout.xaxis.title.text, "Time")
         self.assertEqual(fig.layout.yaxis.title.text, "Reps")
+
+    def test_graph_options(self):
+        fig = self.graph_creator.create_volume_graph(self.exercise, GraphOptions(bucket="month", agg="sum"))
+        self.assertEqual(list(fig.data[0].x), ["2023-01-01", "2023-02-01", "2023-03-01", "2023-04-01", "2023-05-01"])
+
+        fig = self.graph_creator.create_weight_per_reps_graph(
+            self.exercise, 10, GraphOptions(start=datetime(2023, 1, 15), end=datetime(2023, 3, 1)))
+        self.assertEqual(list(fig.data[0].y), [105, 110])
+
+        fig = self.graph_creator.create_volume_graph(self.exercise, GraphOptions(max_points=3))
+        self.assertEqual(len(fig.data[0].x), 3)
+
+    def test_create_district_volume_graph(self):
+        person = SheetPerson(name="Lorenzo", exercises=[
+            Exercise(name="Panca piana con bilanciere", volumes=self.exercise.volumes),
+            Exercise(name="croci con manubri", volumes=self.exercise.volumes[:2]),
+            Exercise(name="squat con bilanciere", volumes=self.exercise.volumes),
+            Exercise(name="Bench Press", district="petto", volumes=self.exercise.volumes[:1]),
+        ])
+
+        fig = self.graph_creator.create_district_volume_graph(person, "petto")
+        self.assertEqual([trace.name for trace in fig.data],
+                         ["Panca piana con bilanciere", "croci con manubri", "Bench Press"])
+        self.assertEqual([len(trace.x) for trace in fig.data], [5, 2, 1])
+        self.assertEqual(fig.layout.title.text, "Volume Over Time for petto")
+
+        fig = self.graph_creator.create_multi_exercise_volume_graph(person, ["squat con bilanciere", "bench press"])
+        self.assertEqual([trace.name for trace in fig.data], ["squat con bilanciere", "Bench Press"])
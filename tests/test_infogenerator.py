@@ -1,6 +1,12 @@
+import tempfile
+from datetime import datetime
 import unittest
 from pathlib import Path
+from unittest import mock
+from exercise_sheet_to_graph.district_exercise_mapper import DistrictExerciseMapper
 from exercise_sheet_to_graph.infogenerator import InfoGenerator
+from exercise_sheet_to_graph.infosaver import InfoSaver
+from exercise_sheet_to_graph.sqlite_storage import SqliteStorage
 
 
 class TestInfoGenerator(unittest.TestCase):
@@ -34,3 +40,76 @@ class TestInfoGenerator(unittest.TestCase):
             self.assertIsNotNone(exercise.volumes)
             self.assertIsNot(exercise.volumes[0].weight, 0)
             self.assertIsNot(exercise.volumes[0].reps, 0)
+
+    def test_getinformations_groups_exercises(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = Path(tmp_dir) / "sheet.txt"
+            file.write_text("Panca piana 60kgx5\npanca  piana 65kgx5\nSquat 100kgx10\n")
+
+            info = InfoGenerator().load_sheet_person_from_exercises_file("Lorenzo", file)
+
+        self.assertEqual([exercise.name for exercise in info.exercises], ["Panca piana", "Squat"])
+        self.assertEqual([volume.weight for volume in info.exercises[0].volumes], [60, 65])
+
+    def test_getinformations_resolves_names(self):
+        mapper = DistrictExerciseMapper("./config/district_and_exercise_italian.yaml",
+                                        alias_config_paths=["./config/district_and_exercise_english.yaml"])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = Path(tmp_dir) / "sheet.txt"
+            file.write_text("Stacco Rumeno 100kgx5\nRomanian deadlift 105kgx5\nZumba 10kgx10\n")
+
+            info = InfoGenerator(mapper).load_sheet_person_from_exercises_file("Lorenzo", file)
+
+        self.assertEqual([exercise.name for exercise in info.exercises], ["stacco rumeno", "Zumba"])
+        self.assertEqual(info.exercises[0].district, "gambe")
+        self.assertEqual([volume.weight for volume in info.exercises[0].volumes], [100, 105])
+
+    def test_load_sheet_person_from_sets(self):
+        sets = [
+            {"name": "Squat", "weight": 100, "reps": 5, "ts": "2024-03-01T10:00:00"},
+            {"name": "Panca piana", "weight": -5, "reps": 5},
+            {"name": "squat ", "district": "gambe", "weight": 105, "reps": 5, "ts": "2024-03-02 10:00:00"},
+            {"weight": 60},
+        ]
+
+        person, report = InfoGenerator().load_sheet_person_from_sets("Lorenzo", sets)
+
+        self.assertEqual((report.accepted, report.rejected, report.exercises), (2, 2, 1))
+        self.assertEqual(sorted(report.errors), [1, 3])
+        self.assertEqual([exercise.name for exercise in person.exercises], ["Squat"])
+        self.assertEqual(person.exercises[0].district, "gambe")
+        self.assertEqual([volume.ts for volume in person.exercises[0].volumes],
+                         [datetime(2024, 3, 1, 10), datetime(2024, 3, 2, 10)])
+
+        person, report = InfoGenerator().load_sheet_person_from_sets("Lorenzo", [{"weight": 60}])
+        self.assertIsNone(person)
+        self.assertEqual(report.rejected, 1)
+
+    def test_import_exercises_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = Path(tmp_dir) / "sheet.txt"
+            with open(file, "w") as to_write:
+                for index in range(25):
+                    to_write.write(f"Panca piana {60 + index}kgx5\n")
+                    to_write.write("Squat 100kgx10\n")
+                to_write.write("not a set\n\n")
+            saver = InfoSaver(Path(tmp_dir) / "db")
+            sqlite = SqliteStorage(Path(tmp_dir) / "exercises.db")
+
+            with mock.patch.object(saver, "save_person", wraps=saver.save_person) as save_person:
+                report = InfoGenerator().import_exercises_file("Lorenzo", file, saver, batch_size=10)
+            person = saver.load_person("Lorenzo")
+            sqlite_report = InfoGenerator().import_exercises_file("Lorenzo", file, sqlite, batch_size=10)
+            sqlite_person = sqlite.load_person("Lorenzo")
+
+        self.assertEqual(report.lines, 52)
+        self.assertEqual(report.accepted, 50)
+        self.assertEqual(report.rejected, 1)
+        # The InfoSaver rewrites the whole history on every save, it gets a single one
+        self.assertEqual(report.batches, 1)
+        self.assertEqual(save_person.call_count, 1)
+        self.assertEqual(sqlite_report.batches, 5)
+        for saved in (person, sqlite_person):
+            self.assertEqual([exercise.name for exercise in saved.exercises], ["Panca piana", "Squat"])
+            self.assertEqual([volume.weight for volume in saved.exercises[0].volumes], list(range(60, 85)))
+            self.assertEqual(len(saved.exercises[1].volumes), 25)
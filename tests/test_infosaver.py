@@ -1,8 +1,26 @@
+from datetime import datetime
 from pathlib import Path
+import multiprocessing
 import os
+import tempfile
+from exercise_sheet_to_graph import binary_format
 from exercise_sheet_to_graph.infosaver import InfoSaver
 from exercise_sheet_to_graph.infogenerator import InfoGenerator
+from exercise_sheet_to_graph.migrate import convert_directory
+from exercise_sheet_to_graph.models import SheetPerson, Exercise, Volume
 import unittest
+from unittest import mock
+
+PROCESSES = 4
+SAVES_PER_PROCESS = 15
+
+
+def _hammer_person(base_dir: str, append_log: bool, worker: int) -> None:
+    saver = InfoSaver(Path(base_dir), append_log=append_log, compact_threshold=5)
+    for index in range(SAVES_PER_PROCESS):
+        saver.save_person(SheetPerson(name="Lorenzo", exercises=[
+            Exercise(name="Squat", volumes=[Volume(weight=worker * 1000 + index, reps=5)])
+        ]))
 
 
 class TestInfoSaver(unittest.TestCase):
@@ -18,6 +36,7 @@ class TestInfoSaver(unittest.TestCase):
     @classmethod
     def tearDownClass(cls):
         os.remove(Path("./tests/data/db/Lorenzo.json"))
+        Path("./tests/data/db/Lorenzo.lock").unlink(missing_ok=True)
 
     def test_saveperson(self):
         self.saver.save_person(info_person=self.info)
@@ -38,3 +57,270 @@ class TestInfoSaver(unittest.TestCase):
         print(person)
         self.assertEqual(person.exercises[0].volumes[0].weight, 60)
         print(person)
+
+
+class TestInfoSaverAppendLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.info_generator = InfoGenerator()
+        self.saver = InfoSaver(Path(self.tmp_dir.name), append_log=True, compact_threshold=3)
+        self.info = self.info_generator.load_sheet_person_from_exercises_file("Lorenzo", Path("./tests/data/esempio.txt"))
+        self.new_info = self.info_generator.load_sheet_person_from_exercises_file("Lorenzo",
+                                                                                  Path("./tests/data/esempio2.txt"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_load_replays_log(self):
+        self.saver.save_person(info_person=self.info)
+        self.saver.save_person(info_person=self.new_info)
+
+        self.assertTrue((Path(self.tmp_dir.name) / "Lorenzo.jsonl").exists())
+        self.assertFalse((Path(self.tmp_dir.name) / "Lorenzo.json").exists())
+
+        person = self.saver.load_person("Lorenzo")
+        snapshot_saver = InfoSaver(Path(self.tmp_dir.name) / "snapshot")
+        snapshot_saver.save_person(info_person=self.info)
+        snapshot_saver.save_person(info_person=self.new_info)
+        self.assertEqual(person, snapshot_saver.load_person("Lorenzo"))
+
+    def test_compaction(self):
+        for _ in range(3):
+            self.saver.save_person(info_person=self.info)
+
+        self.assertFalse((Path(self.tmp_dir.name) / "Lorenzo.jsonl").exists())
+        self.assertTrue((Path(self.tmp_dir.name) / "Lorenzo.json").exists())
+
+        self.saver.save_person(info_person=self.new_info)
+        person = self.saver.load_person("Lorenzo")
+        self.assertEqual(person.exercises[0].name, "Panca piana")
+        # Saving the same sets again is idempotent
+        self.assertEqual([volume.weight for volume in person.exercises[0].volumes], [60, 65])
+
+    def test_merge_appends_all_sets_and_skips_duplicates(self):
+        first = SheetPerson(name="Lorenzo", exercises=[
+            Exercise(name="Squat", volumes=[Volume(ts="2024-01-01 10:00:00", weight=100, reps=5)])
+        ])
+        second = SheetPerson(name="Lorenzo", exercises=[
+            Exercise(name="squat ", volumes=[Volume(ts="2024-01-01 10:00:00", weight=100, reps=5),
+                                             Volume(ts="2024-01-02 10:00:00", weight=100, reps=5),
+                                             Volume(ts="2024-01-02 10:00:00", weight=100, reps=5)])
+        ])
+        self.saver.save_person(first)
+        self.saver.save_person(second)
+        self.saver.save_person(second)
+
+        person = self.saver.load_person("Lorenzo")
+        self.assertEqual(len(person.exercises), 1)
+        self.assertEqual([volume.ts.day for volume in person.exercises[0].volumes], [1, 2, 2])
+
+    def test_uncached_saves_do_not_read_the_history(self):
+        saver = InfoSaver(Path(self.tmp_dir.name) / "uncached", append_log=True, compact_threshold=4, cache_size=0)
+        added = []
+        saver.add_listener(lambda name, exercises: added.append(sum(len(exercise.volumes) for exercise in exercises)))
+        first = SheetPerson(name="Lorenzo", exercises=[
+            Exercise(name="Squat", volumes=[Volume(ts="2024-01-01 10:00:00", weight=100, reps=5)])
+        ])
+        second = SheetPerson(name="Lorenzo", exercises=[
+            Exercise(name="squat ", volumes=[Volume(ts="2024-01-01 10:00:00", weight=100, reps=5),
+                                             Volume(ts="2024-01-02 10:00:00", weight=100, reps=5)])
+        ])
+
+        saver.save_person(first)
+        with mock.patch.object(saver, "_read_person", side_effect=AssertionError("history read on append")):
+            saver.save_person(second)
+            saver.save_person(second)
+        self.assertEqual(added, [1, 1, 0])
+
+        # The fourth entry reaches the threshold
+        saver.save_person(first)
+        self.assertFalse((Path(self.tmp_dir.name) / "uncached" / "Lorenzo.jsonl").exists())
+        person = saver.load_person("Lorenzo")
+        self.assertEqual([volume.ts.day for volume in person.exercises[0].volumes], [1, 2])
+
+
+class TestInfoSaverConcurrency(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _run_workers(self, append_log: bool) -> None:
+        processes = [multiprocessing.Process(target=_hammer_person, args=(self.tmp_dir.name, append_log, worker))
+                     for worker in range(PROCESSES)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+
+        person = InfoSaver(Path(self.tmp_dir.name)).load_person("Lorenzo")
+        weights = sorted(volume.weight for volume in person.exercises[0].volumes)
+        self.assertEqual(weights, sorted(worker * 1000 + index
+                                         for worker in range(PROCESSES) for index in range(SAVES_PER_PROCESS)))
+
+    def test_concurrent_snapshot_saves_lose_no_sets(self):
+        self._run_workers(append_log=False)
+
+    def test_concurrent_log_saves_lose_no_sets(self):
+        self._run_workers(append_log=True)
+
+    def test_no_temporary_files_left(self):
+        self._run_workers(append_log=False)
+        self.assertEqual([file for file in os.listdir(self.tmp_dir.name) if file.endswith(".tmp")], [])
+
+
+def _failing_open(suffix, real_open=open):
+    def failing_open(file, *args, **kwargs):
+        if str(file).endswith(suffix):
+            raise OSError("disk full")
+        return real_open(file, *args, **kwargs)
+    return failing_open
+
+
+class TestInfoSaverCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.info_generator = InfoGenerator()
+        self.info = self.info_generator.load_sheet_person_from_exercises_file("Lorenzo", Path("./tests/data/esempio.txt"))
+        self.new_info = self.info_generator.load_sheet_person_from_exercises_file("Lorenzo",
+                                                                                  Path("./tests/data/esempio2.txt"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_repeated_loads_hit_cache(self):
+        saver = InfoSaver(Path(self.tmp_dir.name))
+        saver.save_person(info_person=self.info)
+
+        first = saver.load_person("Lorenzo")
+        second = saver.load_person("Lorenzo")
+        self.assertIs(first, second)
+        self.assertEqual(saver.cache.stats()["misses"], 0)
+        self.assertEqual(saver.cache.stats()["hits"], 2)
+
+    def test_save_updates_cache(self):
+        for append_log in (False, True):
+            saver = InfoSaver(Path(self.tmp_dir.name) / str(append_log), append_log=append_log)
+            saver.save_person(info_person=self.info)
+            saver.load_person("Lorenzo")
+            saver.save_person(info_person=self.new_info)
+
+            person = saver.load_person("Lorenzo")
+            self.assertEqual(person, InfoSaver(saver.base_dir, cache_size=0).load_person("Lorenzo"))
+            self.assertEqual([volume.weight for volume in person.exercises[0].volumes], [60, 65])
+
+    def test_loaded_person_is_never_mutated(self):
+        for append_log in (False, True):
+            saver = InfoSaver(Path(self.tmp_dir.name) / str(append_log), append_log=append_log)
+            saver.save_person(info_person=self.info)
+            loaded = saver.load_person("Lorenzo")
+            before = loaded.model_dump()
+
+            with mock.patch.object(InfoSaver, "_write_snapshot", side_effect=OSError("disk full")), \
+                    mock.patch("builtins.open", side_effect=_failing_open(".jsonl")):
+                with self.assertRaises(OSError):
+                    saver.save_person(info_person=self.new_info)
+            self.assertEqual(loaded.model_dump(), before)
+            self.assertEqual(saver.load_person("Lorenzo").model_dump(), before)
+
+            saver.save_person(info_person=self.new_info)
+            self.assertEqual(loaded.model_dump(), before)
+            self.assertEqual(len(saver.load_person("Lorenzo").exercises), 4)
+
+    def test_external_write_invalidates(self):
+        saver = InfoSaver(Path(self.tmp_dir.name))
+        other_worker = InfoSaver(Path(self.tmp_dir.name))
+        saver.save_person(info_person=self.info)
+        saver.load_person("Lorenzo")
+
+        other_worker.save_person(info_person=self.new_info)
+        person = saver.load_person("Lorenzo")
+        self.assertEqual(len(person.exercises), 4)
+        self.assertEqual(saver.cache.stats()["invalidations"], 1)
+
+    def test_cache_is_bounded(self):
+        saver = InfoSaver(Path(self.tmp_dir.name), cache_size=1)
+        saver.save_person(info_person=self.info)
+        saver.save_person(info_person=self.info.model_copy(update={"name": "Giorgio"}))
+
+        self.assertEqual(len(saver.cache), 1)
+        self.assertEqual(saver.cache.stats()["evictions"], 1)
+
+    def test_data_version_changes_on_save(self):
+        saver = InfoSaver(Path(self.tmp_dir.name))
+        self.assertIsNone(saver.data_version("Lorenzo"))
+
+        saver.save_person(info_person=self.info)
+        first = saver.data_version("Lorenzo")
+        self.assertEqual(first, saver.data_version("Lorenzo"))
+
+        saver.save_person(info_person=self.new_info)
+        self.assertNotEqual(first[0], saver.data_version("Lorenzo")[0])
+
+
+class TestInfoSaverBinaryFormat(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.base_dir = Path(self.tmp_dir.name)
+        self.info_generator = InfoGenerator()
+        self.info = self.info_generator.load_sheet_person_from_exercises_file("Lorenzo", Path("./tests/data/esempio.txt"))
+        self.new_info = self.info_generator.load_sheet_person_from_exercises_file("Lorenzo",
+                                                                                  Path("./tests/data/esempio2.txt"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_round_trip_matches_json(self):
+        json_saver = InfoSaver(self.base_dir / "json", cache_size=0)
+        binary_saver = InfoSaver(self.base_dir / "binary", cache_size=0, snapshot_format="binary")
+        for saver in (json_saver, binary_saver):
+            saver.save_person(info_person=self.info)
+            saver.save_person(info_person=self.new_info)
+
+        self.assertTrue((self.base_dir / "binary" / "Lorenzo.bin").exists())
+        self.assertFalse((self.base_dir / "binary" / "Lorenzo.json").exists())
+        self.assertEqual(binary_saver.load_person("Lorenzo"), json_saver.load_person("Lorenzo"))
+
+    def test_load_exercise_window(self):
+        saver = InfoSaver(self.base_dir, cache_size=0, snapshot_format="binary")
+        saver.save_person(SheetPerson(name="Lorenzo", exercises=[
+            Exercise(name="Squat", district="Gambe",
+                     volumes=[Volume(ts=f"2024-01-0{day} 10:00:00.123456", weight=100 + day, reps=5)
+                              for day in range(1, 6)])
+        ]))
+
+        exercise = saver.load_exercise("Lorenzo", "squat", start=datetime(2024, 1, 2), end=datetime(2024, 1, 4, 10))
+        self.assertEqual(exercise.district, "Gambe")
+        self.assertEqual([volume.weight for volume in exercise.volumes], [102, 103])
+        self.assertEqual(exercise.volumes[0].ts, datetime(2024, 1, 2, 10, 0, 0, 123456))
+        self.assertIsNone(saver.load_exercise("Lorenzo", "Stacco"))
+
+    def test_convert_is_lossless(self):
+        json_saver = InfoSaver(self.base_dir, append_log=True, cache_size=0)
+        json_saver.save_person(info_person=self.info)
+        json_saver.compact("Lorenzo")
+        json_saver.save_person(info_person=self.new_info)
+        expected = json_saver.load_person("Lorenzo")
+
+        self.assertEqual(convert_directory(self.base_dir, "binary"), 1)
+        self.assertEqual(sorted(file.name for file in self.base_dir.iterdir() if file.suffix != ".lock"),
+                         ["Lorenzo.bin"])
+        self.assertEqual(InfoSaver(self.base_dir, snapshot_format="binary").load_person("Lorenzo"), expected)
+        # A JSON InfoSaver still reads the converted history, and converting back restores the JSON file
+        self.assertEqual(json_saver.load_person("Lorenzo"), expected)
+        self.assertEqual(convert_directory(self.base_dir, "binary"), 0)
+        self.assertEqual(convert_directory(self.base_dir, "json"), 1)
+        self.assertTrue((self.base_dir / "Lorenzo.json").exists())
+        self.assertEqual(json_saver.load_person("Lorenzo"), expected)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            InfoSaver(self.base_dir, snapshot_format="msgpack")
+
+    def test_corrupted_file(self):
+        data = binary_format.dumps(self.info)
+        for corrupted in (b"", b"JSON" + data[4:], data[:-10]):
+            with self.assertRaises(binary_format.BinaryFormatError):
+                binary_format.loads(corrupted)
@@ -0,0 +1,81 @@
+import tempfile
+import unittest
+from pathlib import Path
+from exercise_sheet_to_graph.metrics import Metrics, OutlierProfiler
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics(buckets=(0.01, 0.1, 1.0))
+
+    def test_histogram_buckets_are_cumulative(self):
+        for seconds in (0.005, 0.05, 0.05, 5.0):
+            self.metrics.observe("stage_seconds", seconds, stage="merge")
+
+        text = self.metrics.render()
+        self.assertIn('sheet_to_graph_stage_seconds_bucket{stage="merge",le="0.01"} 1', text)
+        self.assertIn('sheet_to_graph_stage_seconds_bucket{stage="merge",le="0.1"} 3', text)
+        self.assertIn('sheet_to_graph_stage_seconds_bucket{stage="merge",le="1.0"} 3', text)
+        self.assertIn('sheet_to_graph_stage_seconds_bucket{stage="merge",le="+Inf"} 4', text)
+        self.assertIn('sheet_to_graph_stage_seconds_count{stage="merge"} 4', text)
+        self.assertIn("# TYPE sheet_to_graph_stage_seconds histogram", text)
+
+    def test_timer_records_also_on_error(self):
+        with self.assertRaises(KeyError):
+            with self.metrics.stage("dump"):
+                raise KeyError("boom")
+        self.assertEqual(self.metrics.snapshot("stage_seconds")[(("stage", "dump"),)][0], 1)
+
+    def test_disabled_metrics_record_nothing(self):
+        self.metrics.enabled = False
+        with self.metrics.stage("merge"):
+            pass
+        self.metrics.observe("request_seconds", 0.1, endpoint="index")
+        self.assertEqual(self.metrics.snapshot("stage_seconds"), {})
+        self.assertIn("sheet_to_graph_metrics_enabled 0", self.metrics.render())
+
+        self.metrics.enabled = True
+        with self.metrics.stage("merge"):
+            pass
+        self.assertEqual(len(self.metrics.snapshot("stage_seconds")), 1)
+
+    def test_gauges_and_label_escaping(self):
+        def broken():
+            raise RuntimeError("gone")
+
+        self.metrics.add_gauges("write_behind", lambda: {"queue_depth": 3})
+        self.metrics.add_gauges("broken", broken)
+        self.metrics.observe("request_seconds", 0.2, endpoint='say "hi"')
+
+        text = self.metrics.render()
+        self.assertIn("sheet_to_graph_write_behind_queue_depth 3.0", text)
+        self.assertNotIn("sheet_to_graph_broken", text)
+        self.assertIn('endpoint="say \\"hi\\""', text)
+
+
+class TestOutlierProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_only_slow_requests_are_dumped(self):
+        profiler = OutlierProfiler(self.tmp_dir.name, sample_rate=1.0, threshold=0.5)
+
+        profile = profiler.start()
+        self.assertIsNotNone(profile)
+        # A single request is profiled at a time
+        self.assertIsNone(profiler.start())
+        self.assertIsNone(profiler.stop(profile, 0.1, "index"))
+
+        path = profiler.stop(profiler.start(), 0.6, "graph_data")
+        self.assertTrue(Path(path).is_file())
+        self.assertEqual(profiler.dumps, 1)
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(OutlierProfiler(self.tmp_dir.name).start())
+
+
+if __name__ == '__main__':
+    unittest.main()
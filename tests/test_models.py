@@ -0,0 +1,65 @@
+import bisect
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+from exercise_sheet_to_graph.models import Exercise, Volume, SheetPerson
+
+
+class TestVolume(unittest.TestCase):
+    def test_default_timestamp_is_per_instance(self):
+        first = Volume(weight=100, reps=5)
+        second = Volume(weight=100, reps=5)
+        self.assertIsInstance(first.ts, datetime)
+        self.assertLessEqual(first.ts, second.ts)
+        self.assertLess(datetime.now() - first.ts, timedelta(minutes=1))
+
+    def test_reads_old_string_format(self):
+        volume = Volume.model_validate({"weight": 60, "reps": 5, "ts": "2024-10-13 18:36:52.276386"})
+        self.assertEqual(volume.ts, datetime(2024, 10, 13, 18, 36, 52, 276386))
+        self.assertEqual(Volume.model_validate_json(volume.model_dump_json()), volume)
+
+    def test_aware_timestamps_become_local(self):
+        aware = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+        self.assertEqual(Volume(ts=aware).ts, aware.astimezone().replace(tzinfo=None))
+
+
+class TestExercise(unittest.TestCase):
+    def setUp(self):
+        self.exercise = Exercise(name="Squat", volumes=[
+            Volume(ts=datetime(2024, 1, 3), weight=110, reps=5),
+            Volume(ts=datetime(2024, 1, 1), weight=100, reps=5),
+        ])
+
+    def test_volumes_are_time_sorted(self):
+        self.assertEqual([volume.weight for volume in self.exercise.volumes], [100, 110])
+        self.exercise.add_volumes([Volume(ts=datetime(2024, 1, 2), weight=105, reps=5),
+                                   Volume(ts=datetime(2024, 1, 4), weight=115, reps=5)])
+        self.assertEqual([volume.weight for volume in self.exercise.volumes], [100, 105, 110, 115])
+
+        person = SheetPerson.model_validate_json(SheetPerson(exercises=[self.exercise]).model_dump_json())
+        self.assertEqual(person.exercises[0], self.exercise)
+
+    def test_between(self):
+        self.assertEqual([volume.weight for volume in self.exercise.between(datetime(2024, 1, 2))], [110])
+        self.assertEqual([volume.weight for volume in self.exercise.between(end=datetime(2024, 1, 1))], [100])
+        self.assertEqual(self.exercise.between(), self.exercise.volumes)
+
+    def test_bisect_without_key(self):
+        # The signatures of Python 3.9, without key=
+        def no_key(function):
+            return lambda sequence, value, lo=0, hi=None: function(sequence, value, lo, len(sequence) if hi is None
+                                                                    else hi)
+
+        with mock.patch.object(bisect, "bisect_left", no_key(bisect.bisect_left)), \
+                mock.patch.object(bisect, "bisect_right", no_key(bisect.bisect_right)), \
+                mock.patch.object(bisect, "insort_right", no_key(bisect.insort_right)):
+            self.exercise.add_volumes([Volume(ts=datetime(2024, 1, 3), weight=112, reps=5),
+                                       Volume(ts=datetime(2024, 1, 2), weight=105, reps=5)])
+            self.assertEqual([volume.weight for volume in self.exercise.volumes], [100, 105, 110, 112])
+            self.assertEqual([volume.weight for volume in self.exercise.between(datetime(2024, 1, 2),
+                                                                                datetime(2024, 1, 3))],
+                             [105, 110, 112])
+
+
+if __name__ == "__main__":
+    unittest.main()
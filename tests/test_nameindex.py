@@ -0,0 +1,56 @@
+import unittest
+from exercise_sheet_to_graph.district_exercise_mapper import DistrictExerciseMapper
+from exercise_sheet_to_graph.name_index import ExerciseNameIndex, fold, trigrams
+
+
+class TestExerciseNameIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = ExerciseNameIndex(threshold=0.5)
+        self.index.add("stacco rumeno", "stacco rumeno", "gambe")
+        self.index.add("romanian deadlift", "stacco rumeno", "gambe")
+        self.index.add("leg press 45", "leg press 45", "gambe")
+
+    def test_fold(self):
+        self.assertEqual(fold("  Alzate Laterali (Cavi) 10kgx12"), "alzate laterali cavi")
+        self.assertEqual(fold("PANCA PIANÀ 60 kg"), "panca piana")
+        self.assertEqual(fold("Leg Press 45"), "leg press 45")
+        self.assertEqual(trigrams("ab"), {"  a", " ab", "ab "})
+
+    def test_resolve_exact_and_alias(self):
+        self.assertEqual(self.index.resolve("Stacco Rumeno 100kgx5"), ("stacco rumeno", "gambe", 1.0))
+        self.assertEqual(self.index.resolve("Romanian Deadlift").exercise, "stacco rumeno")
+
+    def test_resolve_fuzzy(self):
+        resolution = self.index.resolve("leg pres 45")
+        self.assertEqual(resolution.exercise, "leg press 45")
+        self.assertGreaterEqual(resolution.score, 0.5)
+        self.assertLess(resolution.score, 1.0)
+        self.assertIsNone(self.index.resolve("zumba"))
+        self.assertIsNone(self.index.resolve("60kgx5"))
+
+    def test_remove(self):
+        self.index.resolve("romanian deadlift")
+        self.index.remove("stacco rumeno")
+        self.assertIsNone(self.index.resolve("romanian deadlift"))
+        self.assertEqual(len(self.index), 1)
+
+
+class TestMapperResolution(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mapper = DistrictExerciseMapper("./config/district_and_exercise_italian.yaml",
+                                            alias_config_paths=["./config/district_and_exercise_english.yaml"])
+
+    def test_resolve_english_alias(self):
+        resolution = self.mapper.resolve_exercise("Flat Bench Press with Barbell")
+        self.assertEqual(resolution.exercise, "panca piana con bilanciere")
+        self.assertEqual(resolution.district, "petto")
+        self.assertEqual(self.mapper.resolve_exercise("bulgarian split squat").exercise, "squat bulgaro")
+
+    def test_get_district_by_exercise_fuzzy(self):
+        self.assertIsNone(self.mapper.get_district_by_exercise("stacco rumen"))
+        self.assertEqual(self.mapper.get_district_by_exercise("stacco rumen", fuzzy=True), "gambe")
+
+
+if __name__ == "__main__":
+    unittest.main()
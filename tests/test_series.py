@@ -0,0 +1,48 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+import exercise_sheet_to_graph.series as series_module
+from exercise_sheet_to_graph.district_exercise_mapper import DistrictExerciseMapper
+from exercise_sheet_to_graph.graph_creator import GraphCreator
+from exercise_sheet_to_graph.models import Exercise, Volume
+from exercise_sheet_to_graph.series import ExerciseSeries
+
+
+class TestExerciseSeries(unittest.TestCase):
+    def setUp(self):
+        self.exercise = Exercise(
+            name="Bench Press",
+            district="petto",
+            volumes=[
+                Volume(ts=str(datetime(2023, 1, 1)), weight=100, reps=10),
+                Volume(ts=str(datetime(2023, 2, 1, 18, 30, 5, 123456)), weight=102.5, reps=10),
+                Volume(ts=str(datetime(2023, 3, 1)), weight=100, reps=12),
+            ]
+        )
+
+    def _check_backend(self):
+        series = ExerciseSeries.from_exercise(self.exercise)
+        self.assertEqual(len(series), 3)
+        self.assertEqual(series.to_exercise(), self.exercise)
+
+        by_reps = series.filter_reps(10)
+        self.assertEqual(list(by_reps.weights), [100, 102.5])
+        self.assertEqual(by_reps.times(), [self.exercise.volumes[0].ts, self.exercise.volumes[1].ts])
+        self.assertEqual(list(series.filter_weight(100).reps), [10, 12])
+        self.assertEqual(list(series.volumes()), [1000, 1025, 1200])
+        window = series.between(series.ts[1], series.ts[2])
+        self.assertEqual(list(window.weights), [102.5, 100])
+        self.assertEqual(len(series.between(series.ts[2] + 1)), 0)
+
+        graph_creator = GraphCreator(DistrictExerciseMapper("./config/district_and_exercise_italian.yaml"))
+        fig = graph_creator.create_weight_per_reps_graph(series, 10)
+        self.assertEqual(list(fig.data[0].y), [100, 102.5])
+
+    def test_numpy_backend(self):
+        if series_module.np is None:
+            self.skipTest("numpy is not installed")
+        self._check_backend()
+
+    def test_array_backend(self):
+        with patch.object(series_module, "np", None):
+            self._check_backend()
@@ -0,0 +1,129 @@
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from exercise_sheet_to_graph.infogenerator import InfoGenerator
+from exercise_sheet_to_graph.infosaver import InfoSaver
+from exercise_sheet_to_graph.migrate import import_directory
+from exercise_sheet_to_graph.models import SheetPerson, Exercise, Volume
+from exercise_sheet_to_graph.sqlite_storage import SqliteStorage
+
+
+class TestSqliteStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.storage = SqliteStorage(Path(self.tmp_dir.name) / "exercises.db")
+        info_generator = InfoGenerator()
+        self.info = info_generator.load_sheet_person_from_exercises_file("Lorenzo", Path("./tests/data/esempio.txt"))
+        self.new_info = info_generator.load_sheet_person_from_exercises_file("Lorenzo",
+                                                                             Path("./tests/data/esempio2.txt"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_save_and_load_person(self):
+        self.storage.save_person(self.info)
+        self.storage.save_person(self.new_info)
+
+        person = self.storage.load_person("Lorenzo")
+        self.assertEqual(person.name, "Lorenzo")
+        self.assertEqual([exercise.name for exercise in person.exercises],
+                         ["Panca piana", "Lat machine", "Squat", "Scoreggie"])
+        self.assertEqual([volume.weight for volume in person.exercises[0].volumes], [60, 65])
+        self.assertIsNone(self.storage.load_person("Nobody"))
+
+    def test_save_is_idempotent(self):
+        self.storage.save_person(self.info)
+        self.storage.save_person(self.info)
+
+        person = self.storage.load_person("Lorenzo")
+        self.assertEqual([volume.weight for volume in person.exercises[0].volumes], [60])
+
+    def test_sets_saved_out_of_order_load_sorted(self):
+        for ts in ("2024-01-03 10:00:00", "2024-01-01 10:00:00", "2024-01-02 10:00:00"):
+            self.storage.save_person(SheetPerson(name="Lorenzo", exercises=[
+                Exercise(name="Squat", volumes=[Volume(ts=ts, weight=100, reps=5)])
+            ]))
+
+        volumes = self.storage.load_person("Lorenzo").exercises[0].volumes
+        self.assertEqual([volume.ts.day for volume in volumes], [1, 2, 3])
+        self.assertEqual(len(self.storage.load_person("Lorenzo").exercises[0].between(end=volumes[1].ts)), 2)
+
+    def test_load_exercise_filters(self):
+        self.storage.save_person(self.info)
+        self.storage.save_person(self.new_info)
+
+        exercise = self.storage.load_exercise("Lorenzo", "Lat machine", reps=8)
+        self.assertEqual([volume.weight for volume in exercise.volumes], [40, 44])
+        exercise = self.storage.load_exercise("Lorenzo", "Lat machine", weight=44)
+        self.assertEqual(len(exercise.volumes), 1)
+        self.assertIsNone(self.storage.load_exercise("Lorenzo", "Curl"))
+
+    def test_data_version(self):
+        self.assertIsNone(self.storage.data_version("Lorenzo"))
+        self.storage.save_person(self.info)
+        first = self.storage.data_version("Lorenzo")
+        self.storage.save_person(self.new_info)
+        self.assertNotEqual(first[0], self.storage.data_version("Lorenzo")[0])
+
+    def test_import_directory(self):
+        source_dir = Path(self.tmp_dir.name) / "db"
+        InfoSaver(source_dir).save_person(self.info)
+        shutil.copy("./tests/data/db/data_20241013_183717_giorgio_finizio.yaml", source_dir)
+
+        self.assertEqual(import_directory(source_dir, self.storage), 2)
+        self.assertEqual(len(self.storage.load_person("Lorenzo").exercises), 3)
+        self.assertEqual(self.storage.load_person("giorgio finizio").exercises[0].name, "croci al cavo basso")
+
+    def test_same_results_as_infosaver(self):
+        def person(name, weight):
+            return SheetPerson(name="Lorenzo", exercises=[
+                Exercise(name=name, volumes=[Volume(ts=f"2024-01-01 10:00:{int(weight):02d}", weight=weight, reps=5)])
+            ])
+
+        saver = InfoSaver(Path(self.tmp_dir.name) / "db")
+        submissions = [self.info, person("Squat", 10), person(" squat ", 12), person("SQUAT", 10),
+                       person("lat  machine", 20), self.new_info]
+        for storage in (saver, self.storage):
+            for submission in submissions:
+                storage.save_person(submission)
+
+        def history(storage):
+            return [(exercise.name, sorted((str(volume.ts), volume.weight, volume.reps) for volume in exercise.volumes))
+                    for exercise in storage.load_person("Lorenzo").exercises]
+
+        self.assertEqual(history(self.storage), history(saver))
+        for exercise_name in ("squat", "  Lat Machine", "Panca piana"):
+            from_saver = saver.load_exercise("Lorenzo", exercise_name, reps=5)
+            from_sqlite = self.storage.load_exercise("Lorenzo", exercise_name, reps=5)
+            self.assertEqual(from_sqlite.name, from_saver.name)
+            self.assertEqual(sorted(volume.weight for volume in from_sqlite.volumes),
+                             sorted(volume.weight for volume in from_saver.volumes))
+
+    def test_database_without_keys_is_upgraded(self):
+        db_path = Path(self.tmp_dir.name) / "old.db"
+        with sqlite3.connect(db_path) as connection:
+            connection.executescript("""
+                CREATE TABLE person (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE,
+                                     version INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL DEFAULT 0);
+                CREATE TABLE exercise (id INTEGER PRIMARY KEY, person_id INTEGER NOT NULL, name TEXT NOT NULL,
+                                       district TEXT NOT NULL DEFAULT '', UNIQUE (person_id, name));
+                CREATE TABLE volume (id INTEGER PRIMARY KEY, exercise_id INTEGER NOT NULL, ts TEXT NOT NULL,
+                                     weight REAL NOT NULL, reps INTEGER NOT NULL);
+                INSERT INTO person (id, name) VALUES (1, 'Lorenzo');
+                INSERT INTO exercise (id, person_id, name) VALUES (1, 1, 'Squat'), (2, 1, 'squat '), (3, 1, 'Curl');
+                INSERT INTO volume (exercise_id, ts, weight, reps) VALUES
+                    (1, '2024-01-01 10:00:00', 100, 5), (2, '2024-01-01 10:00:00', 100, 5),
+                    (2, '2024-01-02 10:00:00', 105, 5), (3, '2024-01-01 10:00:00', 20, 10);
+            """)
+        connection.close()
+
+        storage = SqliteStorage(db_path)
+        person = storage.load_person("Lorenzo")
+        self.assertEqual([exercise.name for exercise in person.exercises], ["Squat", "Curl"])
+        self.assertEqual([volume.weight for volume in person.exercises[0].volumes], [100, 105])
+        storage.save_person(SheetPerson(name="Lorenzo", exercises=[
+            Exercise(name="SQUAT", volumes=[Volume(ts="2024-01-03 10:00:00", weight=110, reps=5)])
+        ]))
+        self.assertEqual(len(storage.load_exercise("Lorenzo", "squat").volumes), 3)
@@ -0,0 +1,85 @@
+import logging
+import os
+import unittest
+from unittest.mock import patch
+from logging.handlers import QueueHandler
+from exercise_sheet_to_graph.utils import get_logger, RateLimitFilter, LOG_LEVEL_ENV, LOG_QUEUE_ENV
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class TestRateLimitFilter(unittest.TestCase):
+    def setUp(self):
+        self.logger = logging.getLogger("test_rate_limit")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.handler = _ListHandler()
+        self.logger.addHandler(self.handler)
+        self.rate_limit = RateLimitFilter(burst=3, period=60)
+        self.logger.addFilter(self.rate_limit)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        self.logger.removeFilter(self.rate_limit)
+
+    def _log_missing(self, count):
+        for index in range(count):
+            self.logger.error("Exercise '%s' does not exist.", index)
+
+    def test_repeated_errors_are_dropped(self):
+        self._log_missing(10)
+        self.logger.warning("Another call site")
+        self.logger.info("Below the limited level")
+        self.assertEqual(len(self.handler.messages), 5)
+        self.assertEqual(self.rate_limit.suppressed, 7)
+
+    def test_next_window_reports_the_dropped_records(self):
+        with patch("exercise_sheet_to_graph.utils.time.monotonic", return_value=0):
+            self._log_missing(5)
+        with patch("exercise_sheet_to_graph.utils.time.monotonic", return_value=61):
+            self._log_missing(1)
+        self.assertEqual(self.handler.messages[-1], "Exercise '0' does not exist. (2 similar messages suppressed)")
+
+
+class TestGetLogger(unittest.TestCase):
+    def tearDown(self):
+        for name in ("test_level", "test_queue", "test_root_handlers"):
+            logger = logging.getLogger(name)
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+            logger.filters.clear()
+            logger.setLevel(logging.NOTSET)
+
+    def test_level_from_environment_and_argument(self):
+        with patch.dict(os.environ, {LOG_LEVEL_ENV: "warning"}):
+            logger = get_logger("test_level")
+        self.assertEqual(logger.level, logging.WARNING)
+        # Later calls keep the configured level unless one is given
+        self.assertEqual(get_logger("test_level").level, logging.WARNING)
+        self.assertEqual(get_logger("test_level", level="debug").level, logging.DEBUG)
+
+    def test_queue_handler(self):
+        logging_root = logging.getLogger()
+        with patch.dict(os.environ, {LOG_QUEUE_ENV: "1"}), patch.object(logging_root, "handlers", []):
+            logger = get_logger("test_queue")
+        self.assertIsInstance(logger.handlers[0], QueueHandler)
+        self.assertIsInstance(logger.filters[0], RateLimitFilter)
+
+    def test_rate_limit_with_handlers_on_the_root(self):
+        logging_root = logging.getLogger()
+        with patch.object(logging_root, "handlers", [_ListHandler()]):
+            logger = get_logger("test_root_handlers")
+            get_logger("test_root_handlers")
+        self.assertEqual(logger.handlers, [])
+        self.assertEqual([type(existing) for existing in logger.filters], [RateLimitFilter])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+from exercise_sheet_to_graph.infosaver import InfoSaver
+from exercise_sheet_to_graph.models import SheetPerson, Exercise, Volume
+from exercise_sheet_to_graph.write_behind import WriteBehindStorage, JOURNAL_NAME, QUARANTINE_SUFFIX
+
+
+def _person(weight: float) -> SheetPerson:
+    return SheetPerson(name="Lorenzo", exercises=[
+        Exercise(name="Squat", volumes=[Volume(ts=f"2024-01-01 10:00:{int(weight) % 60:02d}", weight=weight, reps=5)])
+    ])
+
+
+class TestWriteBehindStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.base_dir = Path(self.tmp_dir.name)
+        self.saver = InfoSaver(self.base_dir / "db")
+        self.saves = []
+        self.saver.add_listener(lambda name, exercises: self.saves.append(name))
+        # A long interval keeps the background thread out of the way, the tests flush explicitly
+        self.storage = WriteBehindStorage(self.saver, self.base_dir / "journal", flush_interval=3600)
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp_dir.cleanup()
+
+    def test_saves_are_journaled_and_coalesced(self):
+        for weight in (100, 105, 110):
+            self.storage.save_person(_person(weight))
+
+        self.assertIsNone(self.saver.load_person("Lorenzo"))
+        self.assertEqual(self.storage.queue_depth(), 3)
+
+        self.assertEqual(self.storage.flush(), 3)
+        self.assertEqual(self.saves, ["Lorenzo"])
+        person = self.saver.load_person("Lorenzo")
+        self.assertEqual([volume.weight for volume in person.exercises[0].volumes], [100, 105, 110])
+        stats = self.storage.stats()
+        self.assertEqual((stats["queue_depth"], stats["flushes"], stats["flushed_submissions"]), (0, 1, 3))
+        self.assertGreater(stats["max_flush_seconds"], 0)
+
+    def test_reads_see_own_writes(self):
+        self.storage.save_person(_person(100))
+        person = self.storage.load_person("Lorenzo")
+        self.assertEqual([volume.weight for volume in person.exercises[0].volumes], [100])
+
+    def test_journal_is_replayed_on_startup(self):
+        self.storage.save_person(_person(100))
+        self.storage.save_person(_person(105))
+        # A crash: the journal stays on disk and a segment was being flushed twice
+        journal = self.base_dir / "journal" / JOURNAL_NAME
+        (journal.parent / f"{JOURNAL_NAME}.0-0.flushing").write_text(journal.read_text())
+
+        restarted = WriteBehindStorage(InfoSaver(self.base_dir / "db"), self.base_dir / "journal",
+                                       flush_interval=3600)
+        restarted.close()
+
+        person = self.saver.load_person("Lorenzo")
+        self.assertEqual([volume.weight for volume in person.exercises[0].volumes], [100, 105])
+        self.assertEqual(list((self.base_dir / "journal").glob("*.flushing")), [])
+
+    def _failing_saves(self, failures):
+        save_person = self.saver.save_person
+
+        def failing_save(person):
+            if person.name == "Broken" and failures:
+                failures.pop()
+                raise OSError("database is locked")
+            save_person(person)
+
+        return mock.patch.object(self.saver, "save_person", side_effect=failing_save)
+
+    def _journal_broken_segment(self):
+        broken = _person(100).model_copy(update={"name": "Broken"})
+        segment = self.base_dir / "journal" / f"{JOURNAL_NAME}.0-0.flushing"
+        segment.write_text(broken.model_dump_json() + "\n")
+        return segment
+
+    def test_failing_segment_is_retried(self):
+        segment = self._journal_broken_segment()
+        self.storage.save_person(_person(105))
+        storage = self.storage
+        storage.retry_delay = 0
+
+        with self._failing_saves([True]):
+            # The other segments are flushed anyway
+            self.assertEqual(storage.flush(), 1)
+            self.assertTrue(segment.exists())
+            self.assertEqual(storage.stats()["retrying_segments"], 1)
+            self.assertEqual(storage.flush(), 1)
+
+        self.assertIsNotNone(self.saver.load_person("Broken"))
+        self.assertEqual(self.saver.load_person("Lorenzo").exercises[0].volumes[0].weight, 105)
+        self.assertEqual(list((self.base_dir / "journal").glob("*.flushing")), [])
+        self.assertEqual(storage.stats()["retrying_segments"], 0)
+
+    def test_retries_back_off(self):
+        segment = self._journal_broken_segment()
+        storage = self.storage
+        storage.retry_delay = 60
+
+        with self._failing_saves([True, True]):
+            storage.flush()
+            with mock.patch("exercise_sheet_to_graph.write_behind.time.monotonic", return_value=time.monotonic() + 30):
+                storage.flush()
+        # Not due yet, the second failure has not been used
+        self.assertTrue(segment.exists())
+        self.assertIsNone(self.saver.load_person("Broken"))
+
+    def test_segment_is_quarantined_after_max_attempts(self):
+        self._journal_broken_segment()
+        journal_dir = self.base_dir / "journal"
+        storage = self.storage
+        storage.max_attempts, storage.retry_delay = 2, 0
+
+        with self._failing_saves([True, True, True]):
+            self.assertEqual(storage.flush(), 0)
+            self.assertEqual(storage.flush(), 0)
+            # Quarantined segments are not retried
+            self.assertEqual(storage.flush(), 0)
+
+        self.assertEqual([path.name for path in journal_dir.glob(f"*{QUARANTINE_SUFFIX}")],
+                         [f"{JOURNAL_NAME}.0-0{QUARANTINE_SUFFIX}"])
+        self.assertEqual(list(journal_dir.glob("*.flushing")), [])
+        self.assertEqual(storage.stats()["quarantined_segments"], 1)
+
+    def test_undecodable_segment_is_quarantined_at_once(self):
+        journal_dir = self.base_dir / "journal"
+        (journal_dir / f"{JOURNAL_NAME}.0-0.flushing").write_bytes(b"\xff\xfe not utf-8\n")
+        self.storage.flush()
+        self.assertEqual(len(list(journal_dir.glob(f"*{QUARANTINE_SUFFIX}"))), 1)
+
+    def test_reads_survive_a_failing_flush(self):
+        self.saver.save_person(_person(100))
+        self.storage.save_person(_person(105))
+        with mock.patch.object(self.storage, "flush", side_effect=OSError("disk full")):
+            person = self.storage.load_person("Lorenzo")
+            self.assertIsNotNone(self.storage.data_version("Lorenzo"))
+        self.assertEqual([volume.weight for volume in person.exercises[0].volumes], [100])
+
+    def test_close_flushes(self):
+        self.storage.save_person(_person(100))
+        self.storage.close()
+        self.assertIsNotNone(self.saver.load_person("Lorenzo"))
+
+
+if __name__ == "__main__":
+    unittest.main()